@@ -0,0 +1,68 @@
+"""
+Cost of an autosave of the edits to the journal on a long notebook, compared to
+saving it, and time to recover the edits when opening it again:
+
+    python benchmarks/bench_autosave.py [CELL_NB]
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+from nbterm import Notebook
+from utils import Timer, make_notebook
+
+
+def edit_source(nb: Notebook):
+    nb.focus(1000)
+    nb.enter_cell()
+    nb.current_cell.input_buffer.insert_text("y = 1\n")
+    nb.exit_cell()
+
+
+def append_output(nb: Notebook):
+    cell = nb.cells[2000]
+    cell.json["outputs"][-1]["text"].append("more\n")
+    cell.set_dirty()
+
+
+def move_cells(nb: Notebook):
+    nb.focus(3000)
+    nb.cut_cell()
+    nb.paste_cell(below=True)
+    nb.move_up()
+
+
+EDITS = (
+    ("no change", lambda nb: None),
+    ("source edited", edit_source),
+    ("output appended", append_output),
+    ("cells moved", move_cells),
+)
+
+
+def main(cell_nb):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        nb_path = make_notebook(Path(tmp_dir) / "nb.ipynb", cell_nb, output_lines=20)
+        nb = Notebook(nb_path, kernel_cwd=nb_path.parent, no_kernel=True)
+        nb.autosave_interval = 5
+        print(f"{cell_nb} cells")
+        print(f"{'':>18} {'ms':>8} {'bytes':>8}")
+        path = nb.autosave_journal.path
+        for name, edit in EDITS:
+            edit(nb)
+            size = path.stat().st_size if path.exists() else 0
+            with Timer() as t:
+                nb.flush_autosave()
+            size = (path.stat().st_size if path.exists() else 0) - size
+            print(f"{name:>18} {t.elapsed * 1000:>8.2f} {size:>8}")
+        with Timer() as t:
+            Notebook(nb_path, kernel_cwd=nb_path.parent, no_kernel=True, recover=True)
+        print(f"{'open and recover':>18} {t.elapsed * 1000:>8.2f}")
+        with Timer() as t:
+            nb.save()
+        print(f"{'save':>18} {t.elapsed * 1000:>8.2f} {nb_path.stat().st_size:>8}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 30000)
@@ -0,0 +1,49 @@
+"""
+Import time of nbterm, as measured by "python -X importtime" in a new interpreter:
+the command line (enough for --version, or --test), and the notebook (to open or
+run one). Exits with an error if the median import time of the command line is
+above MAX_MS:
+
+    python benchmarks/bench_import.py [RUN_NB [MAX_MS]]
+"""
+
+import statistics
+import subprocess
+import sys
+
+MODULES = ("nbterm.nbterm", "nbterm.notebook")
+
+
+def import_time(module: str) -> float:
+    """The cumulative import time of a module in a new interpreter, in ms."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        stderr=subprocess.PIPE,
+        check=True,
+        text=True,
+    ).stderr
+    for line in reversed(stderr.splitlines()):
+        _, _, cumulative, name = (
+            part.strip() for part in line.replace(":", "|").split("|")
+        )
+        if name == module:
+            return int(cumulative) / 1000
+    raise RuntimeError(f"{module} was not imported")
+
+
+def main(run_nb: int, max_ms: float) -> int:
+    print(f"{'module':>16} {'median (ms)':>12} {'min (ms)':>9}")
+    medians = {}
+    for module in MODULES:
+        times = [import_time(module) for _ in range(run_nb)]
+        medians[module] = statistics.median(times)
+        print(f"{module:>16} {medians[module]:>12.0f} {min(times):>9.0f}")
+    if medians[MODULES[0]] > max_ms:
+        print(f"{MODULES[0]} takes more than {max_ms:.0f} ms to import")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    sys.exit(main(int(args[0]) if args else 5, float(args[1]) if args[1:] else 150))
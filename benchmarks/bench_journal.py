@@ -0,0 +1,89 @@
+"""
+Memory taken by the undo journal on a notebook with large outputs, after a series
+of edits (moves, cuts and pastes, outputs cleared, cell types and sources changed),
+compared to a copy of the notebook per edit, and time to undo them all:
+
+    python benchmarks/bench_journal.py [CELL_NB [EDIT_NB]]
+"""
+
+import copy
+import gc
+import random
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from nbterm import Notebook
+from utils import Timer, make_notebook
+
+
+def get_allocated(func) -> int:
+    """The memory allocated by func and kept after it returns, in bytes."""
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    result = func()
+    gc.collect()
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    del result
+    return allocated
+
+
+def edit(nb: Notebook, i: int):
+    nb.focus(random.randrange(len(nb.cells)))
+    change = i % 6
+    if change == 0:
+        nb.move_down()
+    elif change == 1:
+        nb.cut_cell()
+    elif change == 2:
+        nb.paste_cell()
+    elif change == 3:
+        nb.clear_output()
+    elif change == 4:
+        nb.markdown_cell() if i % 12 < 6 else nb.code_cell()
+    else:
+        nb.enter_cell()
+        nb.current_cell.input_buffer.insert_text(f"y = {i}\n")
+        nb.exit_cell()
+
+
+def run_edits(nb_path: Path, edit_nb: int, recording: bool) -> Notebook:
+    random.seed(0)
+    nb = Notebook(nb_path, kernel_cwd=nb_path.parent, no_kernel=True)
+    nb.recording = recording
+    nb.copy_cell()
+    for i in range(edit_nb):
+        edit(nb, i)
+    return nb
+
+
+def main(cell_nb, edit_nb):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        nb_path = make_notebook(Path(tmp_dir) / "nb.ipynb", cell_nb, output_lines=500)
+        tracemalloc.start()
+        nb = Notebook(nb_path, kernel_cwd=nb_path.parent, no_kernel=True)
+        snapshot = get_allocated(
+            lambda: copy.deepcopy([cell.json for cell in nb.cells])
+        )
+        nb = None
+        # the memory taken by the edits themselves (e.g. the pasted cells) is
+        # measured without recording them, once the caches are warm
+        run_edits(nb_path, edit_nb, False)
+        edits = get_allocated(lambda: run_edits(nb_path, edit_nb, False))
+        total = get_allocated(lambda: run_edits(nb_path, edit_nb, True))
+        tracemalloc.stop()
+        nb = run_edits(nb_path, edit_nb, True)
+        with Timer() as t:
+            while nb.undo():
+                pass
+    print(f"{cell_nb} cells, {edit_nb} edits")
+    print(f"{'notebook copies (MB)':>28} {snapshot * edit_nb / 1e6:>8.1f}")
+    print(f"{'journal, measured (MB)':>28} {(total - edits) / 1e6:>8.1f}")
+    print(f"{'journal, estimated (MB)':>28} {nb.journal.peak_size / 1e6:>8.1f}")
+    print(f"{'undo all (ms)':>28} {t.elapsed * 1000:>8.0f}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 1000, int(args[1]) if args[1:] else 600)
@@ -0,0 +1,55 @@
+"""
+Time to the first result of a notebook, from the start of its kernel to the end of
+the execution of its first cell, with a cold start and with a kernel from the pool
+(started ahead of time, as by a previous nbterm launch):
+
+    python benchmarks/bench_kernel.py [RUN_NB]
+"""
+
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from nbterm import Notebook
+from nbterm.kernel_pool import KernelPool
+from utils import Timer, make_notebook
+
+
+async def first_result(nb_path, kernel_pool=None):
+    nb = Notebook(nb_path, kernel_cwd=nb_path.parent, kernel_pool=kernel_pool)
+    try:
+        with Timer() as t:
+            await nb.start_kernel()
+            await nb.run_cell(0)
+    finally:
+        await nb.stop_kernel()
+    return t.elapsed
+
+
+async def main(run_nb):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        nb_path = make_notebook(Path(tmp_dir) / "nb.ipynb", 1)
+        pool = KernelPool(1, Path(tmp_dir) / "kernels")
+        colds, warms = [], []
+        try:
+            for _ in range(run_nb):
+                colds.append(await first_result(nb_path))
+                pool.refill("python3", nb_path.parent)
+                # let the kernel of the pool start, as it would between two launches
+                time.sleep(3)
+                warms.append(await first_result(nb_path, pool))
+        finally:
+            pool.stop_all()
+    print(f"{'':>6} {'median (ms)':>12} {'min (ms)':>9}")
+    for name, times in (("cold", colds), ("pool", warms)):
+        print(
+            f"{name:>6} {statistics.median(times) * 1000:>12.0f} "
+            f"{min(times) * 1000:>9.0f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if sys.argv[1:] else 5))
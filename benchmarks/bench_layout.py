@@ -0,0 +1,73 @@
+"""
+Keystroke-to-render latency on a large notebook.
+
+Key presses go through the application's key processor, then the screen is
+rendered, as it happens in the application's event loop:
+
+    python benchmarks/bench_layout.py [CELL_NB]
+"""
+
+import asyncio
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+
+from prompt_toolkit.key_binding.key_processor import KeyPress
+from prompt_toolkit.keys import Keys
+
+from nbterm import Notebook
+from utils import Timer, headless, make_notebook, render
+
+
+def press(app, key):
+    app.key_processor.feed(KeyPress(key))
+    app.key_processor.process_keys()
+
+
+def stream_msg(text):
+    return {
+        "parent_header": {"msg_id": "bench"},
+        "header": {"msg_type": "stream"},
+        "content": {"name": "stdout", "text": text},
+    }
+
+
+async def main(cell_nb):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        nb_path = make_notebook(Path(tmp_dir) / "nb.ipynb", cell_nb)
+        nb = Notebook(nb_path, kernel_cwd=nb_path.parent, no_kernel=True)
+        with headless(nb) as app:
+            render(app)
+
+            def output():
+                nb.output_hook(stream_msg("line\n"))
+
+            actions = {
+                "j (down)": lambda: press(app, "j"),
+                "k (up)": lambda: press(app, "k"),
+                "b (insert)": lambda: press(app, "b"),
+                "ctrl-down (move)": lambda: press(app, Keys.ControlDown),
+                "x (cut)": lambda: press(app, "x"),
+                "v (paste)": lambda: press(app, "v"),
+                "output line": output,
+            }
+            print(f"{cell_nb} cells")
+            print(f"{'action':>18} {'median (ms)':>12} {'max (ms)':>9}")
+            for name, action in actions.items():
+                nb.focus(len(nb.cells) // 2)
+                nb.executing_cells = {1: nb.current_cell}
+                nb.msg_id_2_execution_count = {"bench": 1}
+                times = []
+                for _ in range(50):
+                    with Timer() as t:
+                        action()
+                        render(app)
+                    times.append(t.elapsed * 1000)
+                print(
+                    f"{name:>18} {statistics.median(times):>12.2f} {max(times):>9.2f}"
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
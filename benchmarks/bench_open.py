@@ -0,0 +1,78 @@
+"""
+Time-to-first-paint and peak memory when opening notebooks of increasing size.
+
+Each size is measured in a fresh process, so that the peak RSS is not polluted by
+previous runs. With --image-kb, code cells have an image output of that size.
+Notebooks are read fully, and progressively (the first screen only, the rest
+being loaded in the background):
+
+    python benchmarks/bench_open.py [--image-kb KB] [CELL_NB ...]
+"""
+
+import resource
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from utils import Timer, headless, make_notebook, render
+
+
+def get_peak_rss() -> int:
+    """Peak RSS in MB (ru_maxrss may be inherited from the parent process)."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) // 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+
+
+def child(nb_path: Path, progressive: bool):
+    from nbterm import Notebook
+
+    with Timer() as t:
+        kwargs = {"progressive": True} if progressive else {}
+        nb = Notebook(nb_path, kernel_cwd=nb_path.parent, no_kernel=True, **kwargs)
+        with headless(nb) as app:
+            render(app)
+    built = sum(cell.built for cell in nb.cells)
+    rss = get_peak_rss()
+    print(f"{t.elapsed * 1000:.0f} {rss} {built}")
+
+
+def main(sizes, image_kb):
+    print(
+        f"{'cells':>8} {'size (MB)':>10} {'mode':>12} {'first paint (ms)':>17} "
+        f"{'peak RSS (MB)':>14} {'built':>6}"
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for cell_nb in sizes:
+            nb_path = make_notebook(
+                Path(tmp_dir) / f"nb{cell_nb}.ipynb",
+                cell_nb,
+                image_size=image_kb * 1024,
+            )
+            size = nb_path.stat().st_size / 1e6
+            for mode in ("full", "progressive"):
+                out = subprocess.check_output(
+                    [sys.executable, __file__, "--child", str(nb_path), mode], text=True
+                )
+                elapsed, rss, built = out.split()
+                print(
+                    f"{cell_nb:>8} {size:>10.1f} {mode:>12} {elapsed:>17} {rss:>14} "
+                    f"{built:>6}"
+                )
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args[:1] == ["--make"]:
+        make_notebook(Path(args[1]), int(args[2]), image_size=int(args[3]) * 1024)
+    elif args[:1] == ["--child"]:
+        child(Path(args[1]), args[2] == "progressive")
+    else:
+        image_kb = 0
+        if args[:1] == ["--image-kb"]:
+            image_kb = int(args[1])
+            args = args[2:]
+        main([int(arg) for arg in args] or [100, 1000, 3000, 10000], image_kb)
@@ -0,0 +1,76 @@
+"""
+CPU cost of a chatty cell: a stream of one-line output messages is fed to the
+output hook of a displayed cell, one message per event loop iteration, as they
+would arrive from the kernel:
+
+    python benchmarks/bench_output.py [LINE_NB ...]
+"""
+
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from nbterm import Notebook
+from utils import headless, make_notebook
+
+
+def stream_msg(name, text):
+    return {
+        "parent_header": {"msg_id": "bench"},
+        "header": {"msg_type": "stream"},
+        "content": {"name": name, "text": text},
+    }
+
+
+async def main(line_nbs):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        nb_path = make_notebook(Path(tmp_dir) / "nb.ipynb", 10)
+        print(f"{'lines':>8} {'stream':>7} {'CPU (s)':>8} {'us/line':>8} {'kept':>8}")
+        for line_nb in line_nbs:
+            for name in ("stdout", "stderr"):
+                nb = Notebook(nb_path, kernel_cwd=nb_path.parent, no_kernel=True)
+                with headless(nb):
+                    cell = nb.current_cell
+                    cell.clear_output()
+                    if hasattr(nb, "engine"):
+                        from nbterm.engine import Execution
+                        from nbterm.output_buffer import OutputBuffer
+
+                        nb.engine.executions["bench"] = Execution(
+                            cell.json,
+                            1,
+                            "bench",
+                            OutputBuffer(
+                                cell.json, nb.max_output_lines, nb.max_output_bytes
+                            ),
+                        )
+                        nb.executing_cells = {id(cell.json): cell}
+                        output_hook = nb.engine.output_hook
+                    else:
+                        if hasattr(cell, "output_buffer"):
+                            from nbterm.output_buffer import OutputBuffer
+
+                            cell.output_buffer = OutputBuffer(
+                                cell.json, nb.max_output_lines, nb.max_output_bytes
+                            )
+                        nb.executing_cells = {1: cell}
+                        nb.msg_id_2_execution_count = {"bench": 1}
+                        output_hook = nb.output_hook
+                    t0 = time.process_time()
+                    for i in range(line_nb):
+                        output_hook(stream_msg(name, f"line {i}\n"))
+                        await asyncio.sleep(0)
+                    if hasattr(nb, "flush_outputs"):
+                        nb.flush_outputs()
+                    elapsed = time.process_time() - t0
+                    kept_nb = cell.output_height
+                print(
+                    f"{line_nb:>8} {name:>7} {elapsed:>8.2f} "
+                    f"{elapsed / line_nb * 1e6:>8.1f} {kept_nb:>8}"
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(main([int(arg) for arg in sys.argv[1:]] or [1000, 5000, 20000]))
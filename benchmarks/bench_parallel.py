@@ -0,0 +1,92 @@
+"""
+Wall time of running a fan-out notebook (a shared setup cell, then independent
+sections each waiting for I/O, or computing with "cpu", for a while) on one kernel,
+and on several kernels with the dependency-aware parallel execution:
+
+    python benchmarks/bench_parallel.py [BRANCH_NB [SECONDS [io|cpu]]]
+
+Computing sections only run faster on several kernels with as many CPU cores.
+"""
+
+import asyncio
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+from nbterm import Notebook
+from utils import Timer
+
+
+def make_fanout_notebook(
+    path: Path, branch_nb: int, seconds: float, mode: str = "io"
+) -> Path:
+    def code_cell(source):
+        return {
+            "cell_type": "code",
+            "execution_count": None,
+            "metadata": {},
+            "outputs": [],
+            "source": [source],
+        }
+
+    cells = [code_cell("import time")]
+    for i in range(branch_nb):
+        if mode == "cpu":
+            cells.append(
+                code_cell(
+                    f"end_{i} = time.process_time() + {seconds}\n"
+                    f"n_{i} = 0\n"
+                    f"while time.process_time() < end_{i}:\n"
+                    f"    n_{i} += 1"
+                )
+            )
+        else:
+            cells.append(code_cell(f"time.sleep({seconds})\nn_{i} = 1"))
+        cells.append(code_cell(f"n_{i} > 0"))
+    nb_json = {
+        "cells": cells,
+        "metadata": {
+            "kernelspec": {
+                "display_name": "Python 3",
+                "language": "python",
+                "name": "python3",
+            }
+        },
+        "nbformat": 4,
+        "nbformat_minor": 4,
+    }
+    path.write_text(json.dumps(nb_json))
+    return path
+
+
+async def run(nb_path, kernel_nb):
+    nb = Notebook(nb_path, kernel_cwd=nb_path.parent)
+    try:
+        with Timer() as t:
+            await nb.run_all(kernel_nb)
+    finally:
+        await nb.stop_kernel()
+    return t.elapsed
+
+
+async def main(branch_nb, seconds, mode):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        nb_path = make_fanout_notebook(
+            Path(tmp_dir) / "fanout.ipynb", branch_nb, seconds, mode
+        )
+        print(f"{branch_nb} branches of {seconds}s ({mode})")
+        print(f"{'kernels':>8} {'wall time (s)':>14}")
+        for kernel_nb in sorted({1, 2, branch_nb}):
+            print(f"{kernel_nb:>8} {await run(nb_path, kernel_nb):>14.2f}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    asyncio.run(
+        main(
+            int(args[0]) if args else 4,
+            float(args[1]) if args[1:] else 2,
+            args[2] if args[2:] else "io",
+        )
+    )
@@ -0,0 +1,58 @@
+"""
+Time-to-first-paint when opening a notebook progressively, with no saved renders and
+when opening it again with the renders saved by the previous session, each in a
+fresh process (so that rich's and pygments' imports are measured):
+
+    python benchmarks/bench_reopen.py [CELL_NB ...]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from utils import Timer, headless, make_notebook, render
+
+
+def child(nb_path: Path, save_renders: bool):
+    from nbterm import Notebook
+
+    with Timer() as t:
+        nb = Notebook(
+            nb_path,
+            kernel_cwd=nb_path.parent,
+            no_kernel=True,
+            progressive=True,
+            save_renders=save_renders,
+        )
+        with headless(nb) as app:
+            render(app)
+    with Timer() as t_save:
+        nb.load_cells()
+        saved = nb.save_renders()
+    print(f"{t.elapsed * 1000:.0f} {t_save.elapsed * 1000:.0f} {saved}")
+
+
+def main(sizes):
+    print(f"{'cells':>8} {'mode':>12} {'first paint (ms)':>17} {'save (ms)':>10}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = dict(os.environ, XDG_CACHE_HOME=tmp_dir)
+        for cell_nb in sizes:
+            nb_path = make_notebook(Path(tmp_dir) / f"nb{cell_nb}.ipynb", cell_nb)
+            for mode in ("not saved", "first", "again"):
+                out = subprocess.check_output(
+                    [sys.executable, __file__, "--child", str(nb_path), mode],
+                    text=True,
+                    env=env,
+                )
+                elapsed, save_elapsed, _ = out.split()
+                print(f"{cell_nb:>8} {mode:>12} {elapsed:>17} {save_elapsed:>10}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args[:1] == ["--child"]:
+        child(Path(args[1]), args[2] != "not saved")
+    else:
+        main([int(arg) for arg in args] or [100, 3000, 30000])
@@ -0,0 +1,71 @@
+"""
+CPU cost per output message of a headless run (as with --run): the kernel is
+replaced with a fake one, which sends one-line stream messages (and a result) for
+each cell, so that only nbterm's handling of the messages is measured:
+
+    python benchmarks/bench_run.py [LINE_NB ...]
+"""
+
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import kernel_driver
+
+from nbterm import Notebook
+from utils import make_notebook
+
+
+def msg(msg_id, msg_type, content):
+    return {
+        "parent_header": {"msg_id": msg_id},
+        "header": {"msg_type": msg_type},
+        "content": content,
+    }
+
+
+class FakeKernelDriver:
+    """A kernel printing line_nb lines for each cell."""
+
+    def __init__(self, line_nb):
+        self.line_nb = line_nb
+
+    async def start(self):
+        pass
+
+    async def execute(self, code, msg_id="", **kwargs):
+        # looked up at each message, as kernel_driver does
+        for i in range(self.line_nb):
+            kernel_driver.driver._output_hook_default(
+                msg(msg_id, "stream", {"name": "stdout", "text": f"line {i}\n"})
+            )
+            if i % 100 == 0:
+                await asyncio.sleep(0)
+        kernel_driver.driver._output_hook_default(
+            msg(msg_id, "execute_result", {"data": {"text/plain": "42"}})
+        )
+
+
+async def main(line_nbs):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        nb_path = make_notebook(Path(tmp_dir) / "nb.ipynb", 30)
+        print(f"{'lines/cell':>10} {'messages':>9} {'CPU (s)':>8} {'us/message':>11}")
+        for line_nb in line_nbs:
+            nb = Notebook(nb_path, kernel_cwd=nb_path.parent)
+            nb.kd = FakeKernelDriver(line_nb)
+            t0 = time.process_time()
+            await nb.run_all()
+            elapsed = time.process_time() - t0
+            msg_nb = (line_nb + 1) * sum(
+                cell.json["cell_type"] == "code" for cell in nb.cells
+            )
+            print(
+                f"{line_nb:>10} {msg_nb:>9} {elapsed:>8.2f} "
+                f"{elapsed / msg_nb * 1e6:>11.1f}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main([int(arg) for arg in sys.argv[1:]] or [100, 1000, 10000]))
@@ -0,0 +1,57 @@
+"""
+Saving a long notebook after editing one cell: only the edited cell is serialized
+again, the other cells reuse their serialization from the previous save:
+
+    python benchmarks/bench_save.py [CELL_NB ...]
+"""
+
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+
+from nbterm import Notebook
+from utils import Timer, make_notebook
+
+
+def edit(nb, idx, text):
+    cell = nb.cells[idx]
+    cell.json["source"] = [text]
+    if hasattr(cell, "set_dirty"):
+        cell.set_dirty()
+
+
+def main(sizes):
+    print(
+        f"{'cells':>8} {'first save (ms)':>16} {'edit + save (ms)':>17} "
+        f"{'serialize (ms)':>15}"
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for cell_nb in sizes:
+            nb_path = make_notebook(
+                Path(tmp_dir) / f"nb{cell_nb}.ipynb", cell_nb, output_lines=20
+            )
+            save_path = nb_path.with_name("saved.ipynb")
+            nb = Notebook(nb_path, kernel_cwd=nb_path.parent, no_kernel=True)
+            with Timer() as t:
+                nb.save(save_path)
+            first = t.elapsed
+            saves, serializations = [], []
+            for i in range(10):
+                edit(nb, (i * 97) % cell_nb, f"x = {i}")
+                with Timer() as t:
+                    nb.save(save_path)
+                saves.append(t.elapsed)
+                edit(nb, (i * 89) % cell_nb, f"y = {i}")
+                with Timer() as t:
+                    "".join(nb.iter_json())
+                serializations.append(t.elapsed)
+            print(
+                f"{cell_nb:>8} {first * 1000:>16.1f} "
+                f"{statistics.median(saves) * 1000:>17.1f} "
+                f"{statistics.median(serializations) * 1000:>15.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [500, 5000, 20000])
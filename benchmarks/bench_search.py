@@ -0,0 +1,48 @@
+"""
+Search latency on a long notebook: the first search indexes the cells, the next
+ones only verify the cells having the words of the query, or go through all the
+cells for a regular expression without required words:
+
+    python benchmarks/bench_search.py [CELL_NB]
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+from nbterm import Notebook
+from utils import Timer, make_notebook
+
+QUERIES = (
+    ("first search (indexing)", "math.sqrt(1235)", {}),
+    ("plain text", "math.sqrt(1235)", {}),
+    ("plain text, common words", "print(x + i)", {}),
+    ("regex with words", r"sqrt\(12\d+\)", {"regex": True}),
+    ("regex without words", r"sqrt\((7|8)\)", {"regex": True}),
+    ("in the outputs", "1235", {"outputs": True}),
+)
+
+
+def main(cell_nb):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        nb_path = make_notebook(Path(tmp_dir) / "nb.ipynb", cell_nb)
+        nb = Notebook(nb_path, kernel_cwd=nb_path.parent, no_kernel=True)
+        print(f"{cell_nb} cells")
+        print(f"{'':>25} {'ms':>8} {'matches':>8}")
+        for name, query, kwargs in QUERIES:
+            with Timer() as t:
+                matches = nb.search_index.find(
+                    nb.cells, nb.heights.positions, query, **kwargs
+                )
+            print(f"{name:>25} {t.elapsed * 1000:>8.2f} {len(matches):>8}")
+        nb.cells[1234].json["source"] = ["x = math.sqrt(1235)"]
+        nb.search_index.add(nb.cells[1234])
+        with Timer() as t:
+            matches = nb.search_index.find(
+                nb.cells, nb.heights.positions, "math.sqrt(1235)"
+            )
+        print(f"{'after an edit':>25} {t.elapsed * 1000:>8.2f} {len(matches):>8}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 30000)
@@ -0,0 +1,61 @@
+"""
+Latency of typing in a cell, as a function of its size: a cell of LINE_NB lines of
+code is edited in the middle, and the notebook is rendered after each keystroke
+(to a dummy output, so that only nbterm and prompt_toolkit are measured):
+
+    python benchmarks/bench_typing.py [LINE_NB ...]
+"""
+
+import asyncio
+import json
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+
+from nbterm import Notebook
+from utils import Timer, headless, make_notebook, render
+
+KEYS = "value = [1, 2]\n" * 4
+
+
+def make_big_cell(nb_path: Path, line_nb: int) -> None:
+    """The first cell of the notebook is made of line_nb lines."""
+    nb_json = json.loads(nb_path.read_text())
+    source = [
+        f"data_{i} = {{'id': {i}, 'name': \"row {i}\"}}  # row\n"
+        for i in range(line_nb)
+    ]
+    nb_json["cells"][0]["source"] = source
+    nb_path.write_text(json.dumps(nb_json))
+
+
+async def main(line_nbs):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print(f"{'lines':>7} {'median (ms)':>12} {'max (ms)':>9}")
+        for line_nb in line_nbs:
+            nb_path = make_notebook(Path(tmp_dir) / "nb.ipynb", 10)
+            make_big_cell(nb_path, line_nb)
+            nb = Notebook(nb_path, kernel_cwd=nb_path.parent, no_kernel=True)
+            with headless(nb) as app:
+                nb.enter_cell()
+                buffer = nb.current_cell.input_buffer
+                buffer.cursor_position = len(buffer.text) // 2
+                render(app)
+                elapsed = []
+                for key in KEYS:
+                    with Timer() as t:
+                        if key == "\n":
+                            buffer.newline(copy_margin=False)
+                        else:
+                            buffer.insert_text(key)
+                        render(app)
+                    elapsed.append(t.elapsed * 1000)
+                print(
+                    f"{line_nb:>7} {statistics.median(elapsed):>12.2f} "
+                    f"{max(elapsed):>9.2f}"
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(main([int(arg) for arg in sys.argv[1:]] or [100, 1000, 10000, 20000]))
@@ -0,0 +1,99 @@
+"""
+Viewport calculation on long notebooks, with the height index against walking the
+list of cells:
+
+    python benchmarks/bench_viewport.py [CELL_NB]
+"""
+
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+from nbterm import Notebook
+from utils import Timer, headless, make_notebook
+
+
+def walk_from_top(cells, idx, available_height):
+    cell_nb = -1
+    for cell in cells[idx:]:
+        available_height -= cell.get_height()
+        cell_nb += 1
+        if available_height <= 0:
+            break
+    return idx, idx + cell_nb
+
+
+def walk_from_bottom(cells, idx, available_height):
+    cell_nb = -1
+    for cell in cells[idx::-1]:
+        available_height -= cell.get_height()
+        cell_nb += 1
+        if available_height <= 0:
+            break
+    return idx - cell_nb, idx
+
+
+def walk_to_visible(cells, idx, available_height):
+    # find the top cell by stepping one cell at a time
+    top = 0
+    while True:
+        top, bottom = walk_from_top(cells, top, available_height)
+        if top <= idx <= bottom:
+            return top, bottom
+        top += 1
+
+
+def main(cell_nb):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        nb_path = make_notebook(Path(tmp_dir) / "nb.ipynb", cell_nb)
+        nb = Notebook(nb_path, kernel_cwd=nb_path.parent, no_kernel=True)
+        with headless(nb) as app:
+            available_height = app.renderer.output.get_size().rows - 2
+            random.seed(0)
+            indices = [random.randrange(cell_nb) for _ in range(100)]
+            cells = nb.cells
+            heights = nb.heights
+
+            def index_to_visible(idx):
+                # what update_visible_cells does when the cells changed
+                total = heights.prefix_sum(idx) - available_height
+                top = heights.find(total) + 1 if total >= 0 else 0
+                return nb.get_visible_cell_idx_from_top(top, available_height)
+
+            print(f"{cell_nb} cells, mean time per call (us)")
+            print(f"{'':>22} {'walk':>10} {'index':>10}")
+            for name, walk, index in (
+                (
+                    "from top",
+                    lambda idx: walk_from_top(cells, idx, available_height),
+                    lambda idx: nb.get_visible_cell_idx_from_top(idx, available_height),
+                ),
+                (
+                    "from bottom",
+                    lambda idx: walk_from_bottom(cells, idx, available_height),
+                    lambda idx: nb.get_visible_cell_idx_from_bottom(
+                        idx, available_height
+                    ),
+                ),
+                (
+                    "top for visible cell",
+                    lambda idx: walk_to_visible(cells, idx, available_height),
+                    index_to_visible,
+                ),
+            ):
+                for idx in indices:
+                    # the index builds the visible cells first, so that both
+                    # see the same heights
+                    assert index(idx) == walk(idx)
+                elapsed = []
+                for f in (walk, index):
+                    with Timer() as t:
+                        for idx in indices:
+                            f(idx)
+                    elapsed.append(t.elapsed / len(indices) * 1e6)
+                print(f"{name:>22} {elapsed[0]:>10.1f} {elapsed[1]:>10.1f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,95 @@
+import json
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from prompt_toolkit.application.current import set_app
+from prompt_toolkit.input import create_pipe_input
+from prompt_toolkit.output import DummyOutput
+
+
+def make_notebook(
+    path: Path, cell_nb: int, output_lines: int = 2, image_size: int = 0
+) -> Path:
+    """Code cells have an image output of image_size bytes (base64) if not 0."""
+    cells = []
+    for i in range(cell_nb):
+        if i % 3 == 1:
+            cells.append(
+                {
+                    "cell_type": "markdown",
+                    "metadata": {},
+                    "source": [f"## Section {i}\n", "Some *Markdown* text."],
+                }
+            )
+        else:
+            cells.append(
+                {
+                    "cell_type": "code",
+                    "execution_count": i,
+                    "metadata": {},
+                    "outputs": [
+                        {
+                            "name": "stdout",
+                            "output_type": "stream",
+                            "text": [f"{i + j}\n" for j in range(output_lines)],
+                        }
+                    ]
+                    + (
+                        [
+                            {
+                                "data": {"image/png": "A" * image_size},
+                                "metadata": {},
+                                "output_type": "display_data",
+                            }
+                        ]
+                        if image_size
+                        else []
+                    ),
+                    "source": [
+                        "import math\n",
+                        f"x = math.sqrt({i})\n",
+                        "for i in range(2):\n",
+                        "    print(x + i)",
+                    ],
+                }
+            )
+    nb_json = {
+        "cells": cells,
+        "metadata": {
+            "kernelspec": {
+                "display_name": "Python 3",
+                "language": "python",
+                "name": "python3",
+            }
+        },
+        "nbformat": 4,
+        "nbformat_minor": 4,
+    }
+    with open(path, "wt") as f:
+        json.dump(nb_json, f, indent=1)
+        f.write("\n")
+    return path
+
+
+@contextmanager
+def headless(nb):
+    """Attach an application to the notebook, rendering to a dummy output."""
+    with create_pipe_input() as pipe_input:
+        nb.create_app(input=pipe_input, output=DummyOutput())
+        with set_app(nb.app):
+            yield nb.app
+        nb.app = None
+
+
+def render(app):
+    app.renderer.render(app, app.layout)
+
+
+class Timer:
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.elapsed = time.perf_counter() - self.t0
@@ -1,2 +1,10 @@
-from .notebook import Notebook  # noqa
 from ._version import __version__  # noqa
+
+
+def __getattr__(name):
+    # the notebook (and its UI) is only imported when used, for a fast startup
+    if name == "Notebook":
+        from .notebook import Notebook
+
+        return Notebook
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
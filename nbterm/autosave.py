@@ -0,0 +1,247 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .cell import Cell, get_source_lines
+from .payload import json_default
+
+Record = Dict[str, Any]
+# what was journaled of a cell: its JSON but its source and outputs, its source,
+# its outputs, their number and the length of the text of the last one
+CellState = Tuple[Dict[str, Any], List[str], Optional[list], int, int]
+
+
+def get_autosave_path(nb_path: Path) -> Path:
+    return nb_path.parent / f".{nb_path.name}.autosave"
+
+
+def get_base(nb_path: Path) -> Record:
+    """The notebook file the journal applies to, as its first record."""
+    try:
+        stat = os.stat(nb_path)
+    except FileNotFoundError:
+        return {"op": "base", "size": None, "mtime_ns": None}
+    return {"op": "base", "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def read_autosave(nb_path: Path) -> Optional[List[Record]]:
+    """
+    The records of the autosave journal of a notebook, None if there is none, or if
+    the notebook file changed since the journal was started.
+    """
+    try:
+        with open(get_autosave_path(nb_path)) as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return None
+    records = []
+    for line in lines:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            # the last line was being written
+            break
+    if not records or records[0] != get_base(nb_path):
+        return None
+    return records[1:]
+
+
+def get_text_len(output: Dict[str, Any]) -> int:
+    return len(output.get("text", ""))
+
+
+def get_common_length(cells0: List[Cell], cells1: List[Cell], block: int = 256) -> int:
+    """The number of first cells two lists of cells have in common."""
+    max_length = min(len(cells0), len(cells1))
+    length = 0
+    # by blocks, compared in C (the cells are equal if they are the same)
+    while (
+        length + block <= max_length
+        and cells0[length : length + block] == cells1[length : length + block]  # noqa
+    ):
+        length += block
+    while length < max_length and cells0[length] is cells1[length]:
+        length += 1
+    return length
+
+
+def remove_autosave(nb_path: Path) -> None:
+    try:
+        os.unlink(get_autosave_path(nb_path))
+    except FileNotFoundError:
+        pass
+
+
+def replay_autosave(
+    cell_jsons: List[Dict[str, Any]], records: List[Record]
+) -> Tuple[List[Dict[str, Any]], List[int]]:
+    """
+    The cells of a notebook once the records of its journal are replayed, and their
+    IDs in the journal.
+    """
+    cells = dict(enumerate(cell_jsons))
+    ids = list(cells)
+    for record in records:
+        if record["op"] == "splice":
+            ids[record["start"] : record["end"]] = record["ids"]  # noqa
+        elif record["op"] == "cell":
+            cell_json = dict(cells.get(record["id"], {"source": []}))
+            if "json" in record:
+                keys = ("source", "outputs")
+                cell_json = dict(
+                    record["json"], **{k: cell_json[k] for k in keys if k in cell_json}
+                )
+            if "source" in record:
+                cell_json["source"] = record["source"]
+            if "outputs" in record:
+                if record["outputs"] is None:
+                    cell_json.pop("outputs", None)
+                else:
+                    start, outputs = record["outputs"]
+                    cell_json["outputs"] = (
+                        cell_json.get("outputs", [])[:start] + outputs
+                    )
+            cells[record["id"]] = dict(sorted(cell_json.items()))
+    return [cells[i] for i in ids], ids
+
+
+class AutosaveJournal:
+    """
+    A journal of the edits of a notebook since it was last saved, appended to a
+    file next to it (see get_autosave_path), from which they can be recovered: the
+    cells inserted, removed or moved (as splices of the IDs of the cells), and the
+    cells changed (only the parts of them which changed, and the outputs appended).
+
+    Finding the edits only goes through the cells marked as changed, and compares
+    the list of the cells with the one last journaled.
+    """
+
+    nb_path: Path
+    path: Path
+    started: bool
+    ids: Dict[Cell, int]
+    next_id: int
+    cells: List[Cell]
+    states: Dict[Cell, CellState]
+    changed: Set[Cell]
+
+    def __init__(self, nb_path: Path):
+        self.nb_path = nb_path
+        self.path = get_autosave_path(nb_path)
+        self.changed = set()
+        self.reset([])
+
+    def reset(self, cells: List[Cell], ids: Optional[List[int]] = None) -> None:
+        """
+        Start again from cells, as in the notebook file (with their IDs in the
+        journal, if it is continued). The cells marked as changed stay so.
+        """
+        self.started = ids is not None
+        if ids is None:
+            ids = list(range(len(cells)))
+        self.ids = dict(zip(cells, ids))
+        self.next_id = max(ids, default=-1) + 1
+        self.cells = list(cells)
+        self.states = {}
+
+    def append(self, cell: Cell) -> None:
+        """Take into account that a cell was read from the notebook file."""
+        self.ids[cell] = self.next_id
+        self.next_id += 1
+        self.cells.append(cell)
+
+    def mark(self, cell: Cell) -> None:
+        """Take into account that a cell changed."""
+        self.changed.add(cell)
+
+    def get_records(
+        self, cells: List[Cell], editing: Optional[Cell] = None
+    ) -> List[Record]:
+        """
+        The records of the edits since the last ones, editing being the cell whose
+        source is being edited (not in its JSON yet).
+        """
+        records = []
+        if cells != self.cells:
+            records.append(self.get_splice(cells))
+        if editing is not None:
+            self.changed.add(editing)
+        for cell in self.changed:
+            if cell in self.ids:
+                record = self.get_cell_record(cell, cell is editing)
+                if record is not None:
+                    records.append(record)
+        self.changed.clear()
+        return records
+
+    def get_splice(self, cells: List[Cell]) -> Record:
+        # the cells between the common head and tail
+        start = get_common_length(cells, self.cells)
+        end = get_common_length(cells[::-1], self.cells[::-1])
+        end = min(end, min(len(cells), len(self.cells)) - start)
+        new_cells = cells[start : len(cells) - end]  # noqa
+        old_cells = self.cells[start : len(self.cells) - end]  # noqa
+        for cell in set(old_cells) - set(new_cells):
+            del self.ids[cell]
+            self.states.pop(cell, None)
+        for cell in new_cells:
+            if cell not in self.ids:
+                self.ids[cell] = self.next_id
+                self.next_id += 1
+                self.changed.add(cell)
+        self.cells = list(cells)
+        return {
+            "op": "splice",
+            "start": start,
+            "end": start + len(old_cells),
+            "ids": [self.ids[cell] for cell in new_cells],
+        }
+
+    def get_cell_record(self, cell: Cell, editing: bool) -> Optional[Record]:
+        cell_json = cell.json
+        keys = {k: v for k, v in cell_json.items() if k not in ("source", "outputs")}
+        source = get_source_lines(cell.source) if editing else cell_json["source"]
+        outputs: Optional[list] = cell_json.get("outputs")
+        record: Record = {"op": "cell", "id": self.ids[cell]}
+        state = self.states.get(cell)
+        if state is None:
+            record.update(json=keys, source=source)
+            record["outputs"] = None if outputs is None else [0, outputs]
+        else:
+            old_keys, old_source, old_outputs, output_nb, text_len = state
+            if keys != old_keys:
+                record["json"] = keys
+            if source is not old_source and source != old_source:
+                record["source"] = source
+            if outputs is None:
+                if old_outputs is not None:
+                    record["outputs"] = None
+            elif outputs is not old_outputs:
+                record["outputs"] = [0, outputs]
+            else:
+                # appended to, the last output journaled may have grown (a stream)
+                start = output_nb
+                if output_nb and get_text_len(outputs[output_nb - 1]) != text_len:
+                    start -= 1
+                if start < len(outputs):
+                    record["outputs"] = [start, outputs[start:]]
+        text_len = get_text_len(outputs[-1]) if outputs else 0
+        self.states[cell] = (keys, source, outputs, len(outputs or []), text_len)
+        return record if len(record) > 2 else None
+
+    def write(self, text: str) -> None:
+        """Append records (see dumps_records) to the journal, started if it was not."""
+        if not self.started:
+            text = json.dumps(get_base(self.nb_path)) + "\n" + text
+        with open(self.path, "at" if self.started else "wt") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        self.started = True
+
+
+def dumps_records(records: List[Record]) -> str:
+    return "".join(
+        json.dumps(record, default=json_default) + "\n" for record in records
+    )
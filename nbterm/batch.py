@@ -0,0 +1,160 @@
+import asyncio
+import glob
+import os
+import time
+from pathlib import Path
+from typing import Callable, Iterator, List, Any, Optional, Set
+
+from .notebook import Notebook
+
+
+class RunResult:
+    """
+    The result of running a notebook in a batch. The status is "ok", "failed" if
+    a cell raised an error, or "error" if the notebook could not be run.
+    """
+
+    nb_path: Path
+    save_path: Path
+    status: str
+    elapsed: float
+    cell_nb: int
+    error: str
+
+    def __init__(
+        self,
+        nb_path: Path,
+        save_path: Path,
+        status: str,
+        elapsed: float,
+        cell_nb: int = 0,
+        error: str = "",
+    ):
+        self.nb_path = nb_path
+        self.save_path = save_path
+        self.status = status
+        self.elapsed = elapsed
+        self.cell_nb = cell_nb
+        self.error = error
+
+
+def expand_paths(patterns: List[str]) -> List[Path]:
+    """Notebook paths, from paths or glob patterns (which can use **)."""
+    paths = []
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            paths += [Path(path) for path in sorted(glob.glob(pattern, recursive=True))]
+        else:
+            paths.append(Path(pattern))
+    return paths
+
+
+def find_save_path(
+    nb_path: Path, directory: Optional[Path] = None, taken: Optional[Set[Path]] = None
+) -> Path:
+    """
+    An available path for a run notebook, next to it or in directory, and not
+    taken by another one.
+    """
+    directory = directory or nb_path.parent
+    taken = taken or set()
+    save_path = directory / f"{nb_path.stem}_run.ipynb"
+    i = 0
+    while save_path.exists() or save_path in taken:
+        i += 1
+        save_path = directory / f"{nb_path.stem}_run{i}.ipynb"
+    return save_path
+
+
+async def run_notebook(
+    nb_path: Path,
+    save_path: Path,
+    kernel_cwd: Optional[Path] = None,
+    kernel_nb: int = 1,
+    **kwargs: Any,
+) -> RunResult:
+    """
+    Run a notebook in a new kernel (or one from the kernel pool) and save it,
+    without any UI. Its independent cells may be run on up to kernel_nb kernels.
+    """
+    t0 = time.perf_counter()
+    cell_nb = 0
+    try:
+        nb = Notebook(nb_path, kernel_cwd=kernel_cwd or nb_path.parent, **kwargs)
+        cell_nb = len(nb.cells)
+        if nb.kd is None:
+            raise RuntimeError(f"No kernel found for {nb.kernel_name}")
+        try:
+            await nb.run_all(kernel_nb)
+        finally:
+            await nb.stop_kernel()
+        nb.save(save_path)
+    except Exception as e:
+        return RunResult(
+            nb_path, save_path, "error", time.perf_counter() - t0, cell_nb, str(e)
+        )
+    failed = any(
+        output["output_type"] == "error"
+        for cell in nb.cells
+        for output in cell.json.get("outputs", [])
+    )
+    status = "failed" if failed else "ok"
+    return RunResult(nb_path, save_path, status, time.perf_counter() - t0, cell_nb)
+
+
+async def run_notebooks(
+    nb_paths: List[Path],
+    jobs: int,
+    save_dir: Optional[Path] = None,
+    kernel_cwd: Optional[Path] = None,
+    kernel_nb: int = 1,
+    on_result: Optional[Callable[[RunResult], None]] = None,
+    **kwargs: Any,
+) -> List[RunResult]:
+    """
+    Run notebooks concurrently on the event loop, at most jobs at a time (each in
+    its own kernel). The results are in the order of the notebooks, on_result is
+    called with each of them as soon as it is available.
+    """
+    # relative paths would change with the working directory of the kernels
+    nb_paths = [nb_path.resolve() for nb_path in nb_paths]
+    save_dir = save_dir and save_dir.resolve()
+    kernel_cwd = kernel_cwd and kernel_cwd.resolve()
+    save_paths: List[Path] = []
+    for nb_path in nb_paths:
+        save_paths.append(find_save_path(nb_path, save_dir, set(save_paths)))
+    cwd = os.getcwd()
+    semaphore = asyncio.Semaphore(jobs)
+
+    async def run(nb_path: Path, save_path: Path) -> RunResult:
+        async with semaphore:
+            result = await run_notebook(
+                nb_path, save_path, kernel_cwd, kernel_nb, **kwargs
+            )
+        if on_result is not None:
+            on_result(result)
+        return result
+
+    try:
+        return await asyncio.gather(
+            *(
+                run(nb_path, save_path)
+                for nb_path, save_path in zip(nb_paths, save_paths)
+            )
+        )
+    finally:
+        os.chdir(cwd)
+
+
+def iter_report(results: List[RunResult], elapsed: float) -> Iterator[str]:
+    ok_nb = sum(result.status == "ok" for result in results)
+    cell_nb = sum(result.cell_nb for result in results)
+    yield (
+        f"{len(results)} notebooks ({ok_nb} ok, {len(results) - ok_nb} not ok) "
+        f"in {elapsed:.1f}s"
+    )
+    if elapsed:
+        yield (
+            f"Throughput: {len(results) / elapsed:.2f} notebooks/s, "
+            f"{cell_nb / elapsed:.1f} cells/s"
+        )
@@ -1,20 +1,28 @@
 import copy
-import uuid
-from typing import Dict, List, Any, Optional, Union, cast
+import re
+import time
+from typing import Dict, List, Any, Optional, Tuple, Union
 
 from prompt_toolkit import ANSI
 from prompt_toolkit.buffer import Buffer
 from prompt_toolkit.widgets import Frame
 from prompt_toolkit.layout.containers import Window, HSplit, VSplit
 from prompt_toolkit.layout.controls import BufferControl, FormattedTextControl
-from rich.syntax import Syntax
-from rich.markdown import Markdown
-from rich.console import Console
+from prompt_toolkit.utils import get_cwidth
+from rich.console import Console, RenderableType
 
+from .journal import SourceDiff
+from .output_buffer import OutputBuffer, get_raw_output_text
+from .lexers import get_syntax_lexer
+from .profile import Timing, get_run_time
+from .render_cache import RenderCache, SavedRenders, get_input_key
 
 ONE_COL: Window = Window(width=1)
 ONE_ROW: Window = Window(height=1)
 CONSOLE: Optional[Console] = None
+INPUT_CACHE: RenderCache = RenderCache()
+# the renders of the previous sessions, if they are saved
+SAVED_RENDERS: Optional[SavedRenders] = None
 
 
 def set_console(console: Console):
@@ -22,8 +30,29 @@ def set_console(console: Console):
     CONSOLE = console
 
 
+def set_saved_renders(saved_renders: Optional[SavedRenders]):
+    global SAVED_RENDERS
+    SAVED_RENDERS = saved_renders
+
+
+def get_render_key(
+    source: str, cell_type: str, language: str, width: Optional[int] = None
+) -> Tuple[str, str, str, int]:
+    """The key of the render of an input, at width (the console's by default)."""
+    if width is None:
+        assert CONSOLE is not None
+        width = CONSOLE.width
+    # markdown does not depend on the language of the notebook
+    if cell_type == "markdown":
+        language = ""
+    return get_input_key(source, cell_type, language, width)
+
+
 def rich_print(
-    string: str, console: Optional[Console] = None, style: str = "", end: str = ""
+    string: RenderableType,
+    console: Optional[Console] = None,
+    style: str = "",
+    end: str = "",
 ):
     console = console or CONSOLE
     assert console is not None
@@ -32,32 +61,273 @@ def rich_print(
     return capture.get()
 
 
-def get_output_text_and_height(outputs: List[Dict[str, Any]]):
-    text_list = []
-    height = 0
-    for output in outputs:
-        if output["output_type"] == "stream":
-            text = "".join(output["text"])
-            height += text.count("\n")
-            if output["name"] == "stderr":
-                # TODO: take terminal width into account
-                lines = text.splitlines()
-                lines = [line + " " * (200 - len(line)) for line in lines]
-                text = "\n".join(lines)
-                text = rich_print(text, style="white on red", end="\n")
-        elif output["output_type"] == "error":
-            text = "\n".join(output["traceback"])
-            height += text.count("\n")
-        elif output["output_type"] == "execute_result":
-            text = "\n".join(output["data"].get("text/plain", ""))
-            height += text.count("\n")
+def render_input(source: str, cell_type: str, language: str) -> str:
+    """
+    Render a markdown or code cell input, cached on its content (and saved for the
+    next sessions, if the renders are saved).
+    """
+    key = get_render_key(source, cell_type, language)
+    text = INPUT_CACHE.get(key)
+    if text is None and SAVED_RENDERS is not None:
+        text = SAVED_RENDERS.get(key)
+        if text is not None:
+            INPUT_CACHE.set(key, text)
+    if text is None:
+        # rich's Markdown and Syntax are slow to import
+        if cell_type == "markdown":
+            from rich.markdown import Markdown
+
+            text = rich_print(Markdown(source or "Type *Markdown*"))
         else:
-            continue
-        text_list.append(text)
-    text_ansi = ANSI("".join(text_list))
-    if text_ansi and not height:
+            from rich.syntax import Syntax
+
+            text = rich_print(Syntax(source, get_syntax_lexer(language) or "text"))
+        text = text[:-1]  # remove trailing "\n"
+        INPUT_CACHE.set(key, text)
+    if SAVED_RENDERS is not None:
+        SAVED_RENDERS.set(key, text)
+    return text
+
+
+def get_unbuilt_input_height(source: str, cell_type: str) -> int:
+    """
+    The height of the input of a cell which is not built: the one of its source, but
+    for a markdown cell whose render was saved.
+    """
+    if cell_type == "markdown" and SAVED_RENDERS is not None:
+        # the console's width is slow to get
+        key = get_render_key(source, cell_type, "", SAVED_RENDERS.width)
+        text = SAVED_RENDERS.get(key)
+        if text is not None:
+            return text.count("\n") + 1
+    return source.count("\n") + 1
+
+
+ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+STDERR_STYLE = "\x1b[37;41m"  # white on red
+RESET_STYLE = "\x1b[0m"
+
+
+def get_line_width(line: str) -> int:
+    """The number of columns a line of (ANSI) text takes on the terminal."""
+    if "\x1b" in line:
+        line = ANSI_ESCAPE.sub("", line)
+    if line.isascii():
+        return len(line)
+    return get_cwidth(line)
+
+
+def get_row_nb(line_width: int, width: int) -> int:
+    """The number of rows a line takes when wrapped at width (if not 0)."""
+    if not width or not line_width:
+        return 1
+    return -(-line_width // width)
+
+
+class RowCounter:
+    """
+    The number of rows a text takes on the terminal, as it is appended to, with its
+    lines wrapped at width (if not 0).
+    """
+
+    width: int
+    rows: int  # of the complete lines
+    line_width: int  # of the last line, not terminated yet
+
+    def __init__(self, width: int = 0, rows: int = 0, line_width: int = 0):
+        self.width = width
+        self.rows = rows
+        self.line_width = line_width
+
+    def copy(self) -> "RowCounter":
+        return RowCounter(self.width, self.rows, self.line_width)
+
+    def append(self, text: str) -> None:
+        lines = text.split("\n")
+        for line in lines[:-1]:
+            self.line_width += get_line_width(line)
+            self.rows += get_row_nb(self.line_width, self.width)
+            self.line_width = 0
+        self.line_width += get_line_width(lines[-1])
+
+    @property
+    def height(self) -> int:
+        if self.line_width:
+            return self.rows + get_row_nb(self.line_width, self.width)
+        return self.rows
+
+
+def get_output_height(outputs: List[Dict[str, Any]], width: int = 0) -> int:
+    counter = RowCounter(width)
+    for output in outputs:
+        text = get_raw_output_text(output)
+        if text is not None:
+            counter.append(text)
+    height = counter.height
+    if outputs and not height:
         height = 1
-    return text_ansi, height
+    return height
+
+
+def render_stderr(text: str, width: int = 0) -> str:
+    """
+    Render stderr lines in red, filling the rows they take when wrapped at width
+    (if not 0).
+    """
+    rendered = []
+    for line in text.splitlines():
+        line_width = get_line_width(line)
+        padding = get_row_nb(line_width, width) * width - line_width if width else 0
+        rendered.append(f"{STDERR_STYLE}{line}{' ' * padding}{RESET_STYLE}\n")
+    return "".join(rendered)
+
+
+class OutputRenderer:
+    """
+    Render the outputs of a cell incrementally: the outputs that were already
+    rendered are kept, and only the text appended to the last stream since the
+    previous call is rendered. The lines are wrapped at width (if not 0), the
+    outputs are rendered again if it changes.
+    """
+
+    outputs: Optional[List[Dict[str, Any]]]
+    width: int
+    texts: List[str]
+    counters: List[RowCounter]
+    counter: RowCounter
+    chunk_nb: int
+    partial: str
+
+    def __init__(self):
+        self.width = 0
+        self.reset()
+
+    def reset(self, outputs: Optional[List[Dict[str, Any]]] = None, keep: int = 0):
+        self.outputs = outputs
+        # rendered text of each output, and the rows before it, the first ones
+        # (which are the same in the new outputs) may be kept
+        self.texts = self.texts[:keep] if keep else []
+        # the rows of the outputs rendered so far
+        if keep:
+            self.counter = self.counters[keep].copy()
+            self.counters = self.counters[:keep]
+        else:
+            self.counter = RowCounter(self.width)
+            self.counters = []
+        # number of text chunks of the last output rendered
+        self.chunk_nb = (
+            len(outputs[keep - 1].get("text", [])) if outputs and keep else 0
+        )
+        self.partial = ""  # unterminated last line of the last stderr output
+
+    def render(self, outputs: List[Dict[str, Any]], width: int = 0) -> Tuple[ANSI, int]:
+        if width != self.width:
+            self.width = width
+            self.reset()
+        if outputs is not self.outputs or len(outputs) < len(self.texts):
+            # not the same outputs anymore, but they may start with the same ones
+            # (e.g. when outputs are elided), except the last one which may have grown
+            keep = 0
+            if self.outputs is not None:
+                keep_max = min(len(self.texts) - 1, len(outputs))
+                while keep < keep_max and outputs[keep] is self.outputs[keep]:
+                    keep += 1
+            self.reset(outputs, keep)
+        # the last output rendered may be a stream that has grown
+        for i in range(max(len(self.texts) - 1, 0), len(outputs)):
+            output = outputs[i]
+            if i == len(self.texts):
+                if self.partial:
+                    self.texts[-1] += render_stderr(self.partial, self.width)
+                    self.partial = ""
+                self.texts.append("")
+                self.counters.append(self.counter.copy())
+                self.chunk_nb = 0
+                if output["output_type"] != "stream":
+                    text = get_raw_output_text(output)
+                    if text is not None:
+                        self.counter.append(text)
+                        self.texts[i] = text
+            if output["output_type"] == "stream":
+                text = "".join(output["text"][self.chunk_nb :])  # noqa
+                self.chunk_nb = len(output["text"])
+                self.counter.append(text)
+                if output["name"] == "stderr":
+                    # render complete lines only, they can't change anymore
+                    text = self.partial + text
+                    end = text.rfind("\n") + 1
+                    if end:
+                        self.texts[i] += render_stderr(text[:end], self.width)
+                    self.partial = text[end:]
+                else:
+                    self.texts[i] += text
+        text = "".join(self.texts)
+        if self.partial:
+            text += render_stderr(self.partial, self.width)
+        height = self.counter.height
+        if outputs and not height:
+            height = 1
+        return ANSI(text), height
+
+
+def get_output_text_and_height(
+    outputs: List[Dict[str, Any]], width: int = 0
+) -> Tuple[ANSI, int]:
+    return OutputRenderer().render(outputs, width)
+
+
+class InputBuffer(Buffer):
+    """
+    A buffer keeping its number of lines up to date from the edits at the cursor
+    (typing, deleting), without counting them in the whole text at each keystroke.
+    The other changes (e.g. pasting, undoing) count them again.
+    """
+
+    line_nb: int
+    _line_delta: Optional[int]
+
+    def __init__(self, *args, **kwargs):
+        self._line_delta = None
+        super().__init__(*args, **kwargs)
+        self.line_nb = self.text.count("\n") + 1
+        # first handler, so that the others see the new number of lines
+        self.on_text_changed += self._update_line_nb
+
+    def _update_line_nb(self, _=None):
+        if self._line_delta is None:
+            self.line_nb = self.text.count("\n") + 1
+        else:
+            self.line_nb += self._line_delta
+            self._line_delta = None
+
+    def _edit(self, line_delta: int, method, *args, **kwargs):
+        self._line_delta = line_delta
+        try:
+            return method(*args, **kwargs)
+        finally:
+            self._line_delta = None
+
+    def insert_text(self, data: str, *args, **kwargs) -> None:
+        # an overwrite doesn't overwrite new lines
+        self._edit(data.count("\n"), super().insert_text, data, *args, **kwargs)
+
+    def delete_before_cursor(self, count: int = 1) -> str:
+        position = self.cursor_position
+        deleted = self.text[position - count : position] if position else ""  # noqa
+        return self._edit(-deleted.count("\n"), super().delete_before_cursor, count)
+
+    def delete(self, count: int = 1) -> str:
+        position = self.cursor_position
+        deleted = self.text[position : position + count]  # noqa
+        return self._edit(-deleted.count("\n"), super().delete, count)
+
+
+def get_source_lines(source: str) -> List[str]:
+    """The lines of a source, as in the JSON of a cell."""
+    lines = [line + "\n" for line in source.splitlines()]
+    if lines:
+        lines[-1] = lines[-1][:-1]
+    return lines
 
 
 def empty_cell_json():
@@ -78,129 +348,295 @@ class Cell:
     input_prefix: Window
     output_prefix: Window
     input_window: Window
-    input_buffer: Buffer
+    input_buffer: InputBuffer
+    _input_height: int
+    _output_height: int
+    built: bool
+    containers: Optional[Tuple[VSplit, VSplit]]
+    output_renderer: OutputRenderer
+    output_buffer: Optional[OutputBuffer]
+    timing: Optional[Timing]
+    json_parts: Optional[list]
 
     def __init__(self, notebook, cell_json: Optional[Dict[str, Any]] = None):
+        # widgets are only built when the cell is displayed (see build), until
+        # then the cell is just its JSON and an estimate of its height
         self.notebook = notebook
         self.json = cell_json or empty_cell_json()
-        self.input_prefix = Window(width=10)
-        self.output_prefix = Window(width=10, height=0)
-        input_text = "".join(self.json["source"])
-        if self.json["cell_type"] == "code":
-            execution_count = self.json["execution_count"] or " "
-            text = rich_print(
-                f"\nIn [{execution_count}]:",
-                style="green",
-            )
-            self.input_prefix.content = FormattedTextControl(text=ANSI(text))
-            outputs = self.json["outputs"]
-            for output in outputs:
-                if "execution_count" in output:
-                    text = rich_print(
-                        f"Out[{output['execution_count']}]:",
-                        style="red",
+        self.built = False
+        self.output_buffer = None
+        # of the last execution in this session
+        self.timing = None
+        # serialization of the JSON, kept until it changes (see Format.save)
+        self.json_parts = None
+        self._input_height = get_unbuilt_input_height(
+            self.source, self.json["cell_type"]
+        )
+        self._output_height = self.get_json_output_height()
+
+    @property
+    def input_height(self) -> int:
+        return self._input_height
+
+    @input_height.setter
+    def input_height(self, height: int):
+        self._input_height = height
+        self.notebook.heights.update(self)
+
+    @property
+    def output_height(self) -> int:
+        return self._output_height
+
+    @output_height.setter
+    def output_height(self, height: int):
+        self._output_height = height
+        self.notebook.heights.update(self)
+
+    @property
+    def source(self) -> str:
+        if self.built:
+            return self.input_buffer.text
+        return "".join(self.json["source"])
+
+    def build(self):
+        if not self.built:
+            self.input_prefix = Window(width=10)
+            self.output_prefix = Window(width=10, height=0)
+            self.output_renderer = OutputRenderer()
+            if self.json["cell_type"] == "code":
+                outputs = self.json["outputs"]
+                for output in outputs:
+                    if "execution_count" in output:
+                        text = rich_print(
+                            f"Out[{output['execution_count']}]:",
+                            style="red",
+                        )
+                        self.output_prefix.content = FormattedTextControl(
+                            text=ANSI(text)
+                        )
+                        break
+                if outputs:
+                    output_text, output_height = self.output_renderer.render(
+                        outputs, self.get_output_width()
                     )
-                    self.output_prefix.content = FormattedTextControl(text=ANSI(text))
-                    break
-            if outputs:
-                output_text, output_height = get_output_text_and_height(outputs)
+                else:
+                    output_text, output_height = "", 0
             else:
                 output_text, output_height = "", 0
-        else:
-            outputs = []
-            output_text, output_height = "", 0
-        self.input_window = Window()
-        self.input_buffer = Buffer(on_text_changed=self.input_text_changed)
-        self.input_buffer.text = input_text
-        self.set_input_readonly()
-        if self.json["cell_type"] == "markdown":
-            self.input = HSplit(
-                [ONE_ROW, VSplit([ONE_COL, self.input_window]), ONE_ROW]
+            self.input_window = Window()
+            self.input_buffer = InputBuffer()
+            self.input_buffer.text = "".join(self.json["source"])
+            self.input_buffer.on_text_changed += self.input_text_changed
+            if self.json["cell_type"] == "markdown":
+                self.input = HSplit(
+                    [ONE_ROW, VSplit([ONE_COL, self.input_window]), ONE_ROW],
+                    width=self.get_input_width,
+                )
+            else:
+                self.input = Frame(self.input_window, width=self.get_input_width)
+            self.output = Window(
+                content=FormattedTextControl(text=output_text),
+                width=self.get_output_width,
+                wrap_lines=True,
             )
-        else:
-            self.input = Frame(self.input_window)
-        self.output = Window(content=FormattedTextControl(text=output_text))
-        self.output.height = output_height
+            self.output.height = self.output_height = output_height
+            self.containers = None
+            self.built = True
+            if self.json["cell_type"] == "code":
+                if (
+                    id(self.json) in self.notebook.executing_cells
+                    or self in self.notebook.run_queue
+                ):
+                    self.set_input_prefix("*")
+                else:
+                    self.set_input_prefix(self.json["execution_count"] or " ")
+            self.set_input_readonly()
+        self.notebook.touch_cell(self)
+
+    def release(self):
+        if self.built:
+            if self.input_buffer.text != "".join(self.json["source"]):
+                self.update_json()
+            self.built = False
+            del self.input_prefix
+            del self.output_prefix
+            del self.input_window
+            del self.input_buffer
+            del self.input
+            del self.output
+            del self.containers
+            del self.output_renderer
+
+    def get_containers(self) -> Tuple[VSplit, VSplit]:
+        # the rows of the cell in the notebook layout, reused across layout updates
+        if self.containers is None:
+            self.containers = (
+                VSplit([self.input_prefix, self.input]),
+                VSplit([self.output_prefix, ONE_COL, self.output, ONE_COL]),
+            )
+        return self.containers
+
+    # giving the exact widths spares prompt_toolkit from growing the rows of the
+    # cell column by column at each render
+    def get_input_width(self) -> int:
+        return max(self.notebook.get_width() - 10, 0)  # input prefix
+
+    def get_output_width(self) -> int:
+        return self.notebook.get_output_width()
 
     def get_height(self) -> int:
-        input_height = cast(int, self.input_window.height) + 2  # include frame
-        output_height = cast(int, self.output.height)
-        return input_height + output_height
+        return self.input_height + 2 + self.output_height  # include frame
+
+    def get_json_output_height(self) -> int:
+        if self.json["cell_type"] == "code":
+            return get_output_height(self.json["outputs"], self.get_output_width())
+        return 0
+
+    def reload(self):
+        """
+        Take into account that the JSON of the released cell was changed, e.g. by
+        undoing an edit.
+        """
+        self.set_dirty()
+        self.output_buffer = None
+        self.input_height = self.source.count("\n") + 1
+        self.output_height = self.get_json_output_height()
+        self.notebook.search_index.add(self)
 
     def copy(self):
-        cell_json = copy.deepcopy(self.json)
+        # the outputs are only replaced, never modified in place, except for the
+        # keys of an output (see Notebook.number_executions): they are shared
+        cell_json = dict(self.json)
+        if "metadata" in cell_json:
+            cell_json["metadata"] = copy.deepcopy(cell_json["metadata"])
+        if "outputs" in cell_json:
+            cell_json["outputs"] = [dict(output) for output in cell_json["outputs"]]
         cell = Cell(self.notebook, cell_json=cell_json)
+        cell.json_parts = self.json_parts
         return cell
 
+    def get_run_time(self) -> Optional[float]:
+        """The wall time of the last execution, if known."""
+        if self.timing is not None and self.timing.run_time is not None:
+            return self.timing.run_time
+        return get_run_time(self.json)
+
+    def set_dirty(self):
+        """The JSON of the cell changed."""
+        self.json_parts = None
+        self.notebook.dirty = True
+        self.notebook.autosave_journal.mark(self)
+
     def input_text_changed(self, _=None):
         self.notebook.dirty = True
         self.notebook.quitting = False
-        line_nb = self.input_buffer.text.count("\n") + 1
-        height_keep = self.input_window.height
-        self.input_window.height = line_nb
-        if height_keep is not None and line_nb != height_keep:
-            # height has changed
-            self.notebook.focus(self.notebook.current_cell_idx, update_layout=True)
+        height = self.get_edit_height()
+        if height != self.input_height:
+            self.input_window.height = self.input_height = height
+            # once for a burst of keystrokes
+            self.notebook.schedule_layout_update()
+
+    def get_edit_height(self) -> int:
+        """
+        The height of the input in edit mode: a cell taller than the screen scrolls
+        in its window, so that only its visible lines are rendered.
+        """
+        return min(self.input_buffer.line_nb, self.notebook.get_max_input_height())
+
+    def set_input_prefix(self, execution_count: Union[int, str]):
+        if self.built:
+            text = rich_print(f"\nIn [{execution_count}]:", style="green")
+            self.input_prefix.content = FormattedTextControl(text=ANSI(text))
+
+    def update_output(self) -> bool:
+        """
+        Update the output of the cell from its JSON, return True if its height
+        changed.
+        """
+        outputs = self.json.get("outputs", [])
+        height_keep = self.output_height
+        if self.built:
+            text, height = self.output_renderer.render(outputs, self.get_output_width())
+            self.output.content = FormattedTextControl(text=text)
+            self.output.height = height
+        else:
+            # will be rendered when the cell is built
+            height = get_output_height(outputs, self.get_output_width())
+        self.output_height = height
+        return height != height_keep
 
     def set_as_markdown(self):
         prev_cell_type = self.json["cell_type"]
         if prev_cell_type != "markdown":
-            self.notebook.dirty = True
+            self.set_dirty()
             self.json["cell_type"] = "markdown"
             if "outputs" in self.json:
                 del self.json["outputs"]
             if "execution_count" in self.json:
                 del self.json["execution_count"]
-            self.input_prefix.content = FormattedTextControl(text="")
+            if self.built:
+                self.input_prefix.content = FormattedTextControl(text="")
             self.clear_output()
             self.set_input_readonly()
-            self.input = HSplit(
-                [ONE_ROW, VSplit([ONE_COL, self.input_window]), ONE_ROW]
-            )
+            if self.built:
+                self.input = HSplit(
+                    [ONE_ROW, VSplit([ONE_COL, self.input_window]), ONE_ROW],
+                    width=self.get_input_width,
+                )
+                self.containers = None
             self.notebook.focus(self.notebook.current_cell_idx, update_layout=True)
 
     def set_as_code(self):
         prev_cell_type = self.json["cell_type"]
         if prev_cell_type != "code":
-            self.notebook.dirty = True
+            self.set_dirty()
             self.json["cell_type"] = "code"
             self.json["outputs"] = []
             self.json["execution_count"] = None
-            text = rich_print("\nIn [ ]:", style="green")
-            self.input_prefix.content = FormattedTextControl(text=ANSI(text))
+            self.set_input_prefix(" ")
             self.set_input_readonly()
-            self.input = Frame(self.input_window)
+            if self.built:
+                self.input = Frame(self.input_window, width=self.get_input_width)
+                self.containers = None
             self.notebook.focus(self.notebook.current_cell_idx, update_layout=True)
 
     def set_as_raw(self):
         prev_cell_type = self.json["cell_type"]
         if prev_cell_type != "raw":
-            self.notebook.dirty = True
+            self.set_dirty()
             self.json["cell_type"] = "raw"
             if "outputs" in self.json:
                 del self.json["outputs"]
             if "execution_count" in self.json:
                 del self.json["execution_count"]
-            self.input_prefix.content = FormattedTextControl(text="")
+            if self.built:
+                self.input_prefix.content = FormattedTextControl(text="")
             self.clear_output()
             self.set_input_readonly()
-            self.input = Frame(self.input_window)
+            if self.built:
+                self.input = Frame(self.input_window, width=self.get_input_width)
+                self.containers = None
             self.notebook.focus(self.notebook.current_cell_idx, update_layout=True)
 
     def set_input_readonly(self):
-        if self.json["cell_type"] == "markdown":
-            text = self.input_buffer.text or "Type *Markdown*"
-            md = Markdown(text)
-            text = rich_print(md)[:-1]  # remove trailing "\n"
-        elif self.json["cell_type"] == "code":
-            code = Syntax(self.input_buffer.text, self.notebook.language)
-            text = rich_print(code)[:-1]  # remove trailing "\n"
+        if not self.built:
+            # will be rendered when the cell is built
+            self.input_height = get_unbuilt_input_height(
+                self.source, self.json["cell_type"]
+            )
+            return
+        if self.json["cell_type"] in ("markdown", "code"):
+            text = render_input(
+                self.input_buffer.text,
+                self.json["cell_type"],
+                self.notebook.lexer_language,
+            )
         elif self.json["cell_type"] == "raw":
             text = self.input_buffer.text or " "
         line_nb = text.count("\n") + 1
         self.input_window.content = FormattedTextControl(text=ANSI(text))
         height_keep = self.input_window.height
-        self.input_window.height = line_nb
+        self.input_window.height = self.input_height = line_nb
         if (
             self.notebook.app is not None
             and height_keep is not None
@@ -210,60 +646,63 @@ class Cell:
             self.notebook.focus(self.notebook.current_cell_idx, update_layout=True)
 
     def set_input_editable(self):
+        self.build()
         if self.json["cell_type"] == "code":
             self.input_window.content = BufferControl(
                 buffer=self.input_buffer, lexer=self.notebook.lexer
             )
         else:
             self.input_window.content = BufferControl(buffer=self.input_buffer)
-        self.input_window.height = self.input_buffer.text.count("\n") + 1
+        height_keep = self.input_height
+        self.input_window.height = self.input_height = self.get_edit_height()
+        if self.notebook.app is not None and self.input_height != height_keep:
+            self.notebook.focus(self.notebook.current_cell_idx, update_layout=True)
 
     def clear_output(self):
-        if self.output.height > 0:
-            self.notebook.dirty = True
-            self.output.height = 0
-            self.output.content = FormattedTextControl(text="")
-            self.output_prefix.content = FormattedTextControl(text="")
-            self.output_prefix.height = 0
+        if self.output_height > 0:
+            self.set_dirty()
+            self.output_height = 0
+            if self.built:
+                self.output.height = 0
+                self.output.content = FormattedTextControl(text="")
+                self.output_prefix.content = FormattedTextControl(text="")
+                self.output_prefix.height = 0
             if self.json["cell_type"] == "code":
                 self.json["outputs"] = []
+                self.output_buffer = None
+            self.notebook.search_index.outputs.add(self)
             if self.notebook.app:
                 self.notebook.focus(self.notebook.current_cell_idx, update_layout=True)
 
     def update_json(self):
-        src_list = [line + "\n" for line in self.input_buffer.text.splitlines()]
-        if src_list:
-            src_list[-1] = src_list[-1][:-1]
-        self.json["source"] = src_list
+        src_list = get_source_lines(self.source)
+        if src_list != self.json["source"]:
+            self.notebook.record(SourceDiff(self, self.json["source"], src_list))
+            self.json["source"] = src_list
+            self.json_parts = None
+            self.notebook.autosave_journal.mark(self)
+            self.notebook.search_index.sources.add(self)
 
-    async def run(self):
+    async def run(self, queued: Optional[float] = None):
+        """Run the cell, queued is when its execution was requested (now if None)."""
+        queued = queued or time.time()
         self.clear_output()
         if self.json["cell_type"] == "code":
-            code = self.input_buffer.text.strip()
+            code = self.source.strip()
             if code:
-                if self not in self.notebook.executing_cells.values():
-                    self.notebook.dirty = True
-                    executing_text = rich_print("\nIn [*]:", style="green")
-                    self.input_prefix.content = FormattedTextControl(
-                        text=ANSI(executing_text)
-                    )
-                    self.notebook.execution_count += 1
-                    execution_count = self.notebook.execution_count
-                    msg_id = uuid.uuid4().hex
-                    self.notebook.msg_id_2_execution_count[msg_id] = execution_count
-                    self.notebook.executing_cells[execution_count] = self
-                    await self.notebook.kd.execute(
-                        self.input_buffer.text, msg_id=msg_id
-                    )
-                    del self.notebook.executing_cells[execution_count]
-                    text = rich_print(
-                        f"\nIn [{execution_count}]:",
-                        style="green",
-                    )
-                    self.input_prefix.content = FormattedTextControl(text=ANSI(text))
-                    self.json["execution_count"] = execution_count
-                    if self.notebook.app:
-                        self.notebook.app.invalidate()
+                if id(self.json) not in self.notebook.executing_cells:
+                    self.set_dirty()
+                    # the notebook UI is notified of the execution by the engine
+                    self.notebook.executing_cells[id(self.json)] = self
+                    try:
+                        execution = await self.notebook.engine.execute(
+                            self.json, self.source, queued
+                        )
+                    finally:
+                        del self.notebook.executing_cells[id(self.json)]
+                    self.output_buffer = execution.outputs
+                    self.timing = execution.timing
+                    self.set_dirty()
             else:
                 self.clear_output()
         else:
@@ -0,0 +1,274 @@
+import ast
+from typing import Dict, List, Any, Optional, Sequence, Set, Tuple
+
+BRANCH_TAG = "branch:"
+
+
+def get_arg_names(args: ast.arguments) -> Set[str]:
+    arg_list = getattr(args, "posonlyargs", []) + args.args + args.kwonlyargs
+    arg_list += [arg for arg in (args.vararg, args.kwarg) if arg is not None]
+    return {arg.arg for arg in arg_list}
+
+
+class NameCollector(ast.NodeVisitor):
+    """
+    The names a statement loads and stores. A name whose attribute or item is
+    assigned is considered stored too (the object is mutated).
+    """
+
+    loads: Set[str]
+    stores: Set[str]
+    globals: Set[str]
+    star_import: bool
+
+    def __init__(self):
+        self.loads = set()
+        self.stores = set()
+        self.globals = set()
+        self.star_import = False
+
+    def visit_Name(self, node: ast.Name):
+        if isinstance(node.ctx, ast.Load):
+            self.loads.add(node.id)
+        else:
+            self.stores.add(node.id)
+
+    def visit_mutated(self, node):
+        if not isinstance(node.ctx, ast.Load):
+            base = node.value
+            while isinstance(base, (ast.Attribute, ast.Subscript)):
+                base = base.value
+            if isinstance(base, ast.Name):
+                self.loads.add(base.id)
+                self.stores.add(base.id)
+        self.generic_visit(node)
+
+    visit_Attribute = visit_mutated
+    visit_Subscript = visit_mutated
+
+    def visit_AugAssign(self, node: ast.AugAssign):
+        if isinstance(node.target, ast.Name):
+            self.loads.add(node.target.id)
+        self.generic_visit(node)
+
+    def visit_Import(self, node: ast.Import):
+        for alias in node.names:
+            self.stores.add(alias.asname or alias.name.split(".")[0])
+
+    def visit_ImportFrom(self, node: ast.ImportFrom):
+        for alias in node.names:
+            if alias.name == "*":
+                self.star_import = True
+            else:
+                self.stores.add(alias.asname or alias.name)
+
+    def visit_scope(self, names: Set[str], body: Sequence[ast.AST]):
+        """
+        A function, class or comprehension: the names it loads are free (they are
+        looked up when it runs), except its own ones.
+        """
+        scope = NameCollector()
+        for child in body:
+            scope.visit(child)
+        self.loads |= scope.loads - (scope.stores - scope.globals) - names
+        self.stores |= scope.globals
+        self.star_import |= scope.star_import
+
+    def visit_FunctionDef(self, node):
+        for child in node.decorator_list + node.args.defaults + node.args.kw_defaults:
+            if child is not None:
+                self.visit(child)
+        self.visit_scope(get_arg_names(node.args), node.body)
+        self.stores.add(node.name)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node: ast.ClassDef):
+        for child in node.decorator_list + node.bases + node.keywords:
+            self.visit(child)
+        self.visit_scope(set(), node.body)
+        self.stores.add(node.name)
+
+    def visit_Lambda(self, node: ast.Lambda):
+        for child in node.args.defaults + node.args.kw_defaults:
+            if child is not None:
+                self.visit(child)
+        self.visit_scope(get_arg_names(node.args), [node.body])
+
+    def visit_comprehension_scope(self, node):
+        # the first iterable is evaluated in the enclosing scope
+        self.visit(node.generators[0].iter)
+        targets = NameCollector()
+        for generator in node.generators:
+            targets.visit(generator.target)
+        body = [generator.iter for generator in node.generators[1:]]
+        body += [cond for generator in node.generators for cond in generator.ifs]
+        body += [node.key, node.value] if isinstance(node, ast.DictComp) else [node.elt]
+        self.visit_scope(targets.stores, body)
+
+    visit_ListComp = visit_comprehension_scope
+    visit_SetComp = visit_comprehension_scope
+    visit_GeneratorExp = visit_comprehension_scope
+    visit_DictComp = visit_comprehension_scope
+
+    def visit_Global(self, node: ast.Global):
+        self.globals.update(node.names)
+
+
+def get_names(source: str) -> Optional[Tuple[Set[str], Set[str]]]:
+    """
+    The names a cell uses (before defining them) and defines, or None if they
+    can't be known (e.g. the cell has IPython magics).
+    """
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return None
+    uses: Set[str] = set()
+    defines: Set[str] = set()
+    for statement in tree.body:
+        collector = NameCollector()
+        collector.visit(statement)
+        if collector.star_import:
+            return None
+        uses |= collector.loads - defines
+        defines |= collector.stores
+    return uses, defines
+
+
+def get_branch(cell_json: Dict[str, Any]) -> Optional[str]:
+    for tag in cell_json.get("metadata", {}).get("tags", []):
+        if tag.startswith(BRANCH_TAG):
+            return tag[len(BRANCH_TAG) :]  # noqa
+    return None
+
+
+def get_dependencies(
+    cell_jsons: List[Dict[str, Any]], language: str = "python"
+) -> List[Set[int]]:
+    """
+    The cells each cell depends on, by index: for each name a cell uses, the last
+    cell defining it before. A cell whose names can't be known (or in another
+    language than Python) depends on all the previous cells, and all the next
+    cells depend on it.
+    """
+    dependencies: List[Set[int]] = []
+    definers: Dict[str, int] = {}
+    barrier: Optional[int] = None
+    for i, cell_json in enumerate(cell_jsons):
+        names = None
+        if language == "python":
+            names = get_names("".join(cell_json["source"]))
+        if names is None:
+            dependencies.append(set(range(i)))
+            barrier = i
+            continue
+        uses, defines = names
+        deps = {definers[name] for name in uses if name in definers}
+        if barrier is not None:
+            deps.add(barrier)
+        dependencies.append(deps)
+        for name in defines:
+            definers[name] = i
+    return dependencies
+
+
+def get_tagged_dependencies(cell_jsons: List[Dict[str, Any]]) -> List[Set[int]]:
+    """
+    The dependencies given by the "branch:NAME" tags of the cells: a cell is in the
+    branch of the closest tagged cell above it, and depends on the previous cells
+    of its branch, and on the cells before the first tagged cell.
+    """
+    dependencies: List[Set[int]] = []
+    branches: Dict[str, List[int]] = {}
+    branch = None
+    shared: List[int] = []
+    for i, cell_json in enumerate(cell_jsons):
+        branch = get_branch(cell_json) or branch
+        if branch is None:
+            dependencies.append(set(shared))
+            shared.append(i)
+        else:
+            cells = branches.setdefault(branch, [])
+            dependencies.append(set(shared + cells))
+            cells.append(i)
+    return dependencies
+
+
+def get_cell_dependencies(
+    cell_jsons: List[Dict[str, Any]], language: str = "python"
+) -> List[Set[int]]:
+    """The dependencies given by the tags if there are any, or by the names."""
+    if any(get_branch(cell_json) for cell_json in cell_jsons):
+        return get_tagged_dependencies(cell_jsons)
+    return get_dependencies(cell_jsons, language)
+
+
+def find(parents: List[int], i: int) -> int:
+    while parents[i] != i:
+        parents[i] = parents[parents[i]]
+        i = parents[i]
+    return i
+
+
+def get_branches(dependencies: List[Set[int]], start: int) -> List[List[int]]:
+    """
+    The groups of cells from start that don't depend on each other, i.e. the
+    connected components of the dependency graph without the cells before start.
+    """
+    cell_nb = len(dependencies)
+    parents = list(range(cell_nb))
+    for i in range(start, cell_nb):
+        for j in dependencies[i]:
+            if j >= start:
+                parents[find(parents, i)] = find(parents, j)
+    branches: Dict[int, List[int]] = {}
+    for i in range(start, cell_nb):
+        branches.setdefault(find(parents, i), []).append(i)
+    return list(branches.values())
+
+
+def get_ancestors(dependencies: List[Set[int]], cells: List[int]) -> Set[int]:
+    ancestors: Set[int] = set()
+    todo = list(cells)
+    while todo:
+        for j in dependencies[todo.pop()]:
+            if j not in ancestors:
+                ancestors.add(j)
+                todo.append(j)
+    return ancestors
+
+
+def schedule(
+    cell_jsons: List[Dict[str, Any]], kernel_nb: int, language: str = "python"
+) -> List[List[int]]:
+    """
+    Split the code cells of a notebook between at most kernel_nb kernels, by index.
+    The cells that the branches share (the first ones, e.g. imports) are executed
+    on each kernel that needs them, and by the first kernel in any case. Each kernel
+    executes its cells in document order.
+    """
+    cell_idxs = [i for i, cell in enumerate(cell_jsons) if cell["cell_type"] == "code"]
+    code_cells = [cell_jsons[i] for i in cell_idxs]
+    dependencies = get_cell_dependencies(code_cells, language)
+    # the shortest shared prefix that splits the most the other cells
+    start, branches = 0, [list(range(len(code_cells)))]
+    for i in range(len(code_cells)):
+        i_branches = get_branches(dependencies, i)
+        if len(i_branches) > len(branches):
+            start, branches = i, i_branches
+    if not code_cells:
+        return [[]]
+    kernel_nb = max(1, min(kernel_nb, len(branches)))
+    kernels: List[List[int]] = [[] for _ in range(kernel_nb)]
+    # the largest branches first, to the least loaded kernel
+    for branch in sorted(branches, key=len, reverse=True):
+        min(kernels, key=len).extend(branch)
+    schedules = []
+    for k, cells in enumerate(kernels):
+        if k == 0:
+            shared = set(range(start))
+        else:
+            shared = {i for i in get_ancestors(dependencies, cells) if i < start}
+        schedules.append([cell_idxs[i] for i in sorted(shared | set(cells))])
+    return schedules
@@ -0,0 +1,175 @@
+import time
+import uuid
+from typing import TYPE_CHECKING, Callable, Dict, List, Any, Optional
+
+from .kernel import output_hooks
+from .output_buffer import OutputBuffer
+from .profile import Timing
+
+if TYPE_CHECKING:
+    from kernel_driver import KernelDriver  # type: ignore
+
+
+class Execution:
+    """
+    The execution of a code cell. Its outputs are in the JSON of the cell, bounded
+    by an OutputBuffer.
+    """
+
+    cell_json: Dict[str, Any]
+    execution_count: int
+    msg_id: str
+    outputs: OutputBuffer
+    timing: Timing
+
+    def __init__(
+        self,
+        cell_json: Dict[str, Any],
+        execution_count: int,
+        msg_id: str,
+        outputs: OutputBuffer,
+        timing: Optional[Timing] = None,
+    ):
+        self.cell_json = cell_json
+        self.execution_count = execution_count
+        self.msg_id = msg_id
+        self.outputs = outputs
+        self.timing = timing or Timing()
+
+
+class Engine:
+    """
+    Execute code cells in a kernel, independently of any UI: it only works on the
+    JSON of the cells, and emits events to its subscribers as they are executed:
+
+    - "start": the execution started, the outputs of the cell were cleared.
+    - "output": an output was added to the cell (or a stream output has grown).
+    - "done": the execution is finished, the cell has its execution count.
+
+    The timing of the executions is measured, and recorded in the "execution"
+    metadata of the cells if record_timing is True.
+    """
+
+    kd: "Optional[KernelDriver]"
+    execution_count: int
+    executions: Dict[str, Execution]
+    subscribers: List[Callable[[str, Execution], None]]
+    max_output_lines: int
+    max_output_bytes: int
+    spill_outputs: bool
+    record_timing: bool
+
+    def __init__(
+        self,
+        kd: "Optional[KernelDriver]" = None,
+        max_output_lines: int = 10000,
+        max_output_bytes: int = 10_000_000,
+        spill_outputs: bool = False,
+        record_timing: bool = False,
+    ):
+        self.kd = kd
+        self.execution_count = 0
+        self.executions = {}
+        self.subscribers = []
+        self.max_output_lines = max_output_lines
+        self.max_output_bytes = max_output_bytes
+        self.spill_outputs = spill_outputs
+        self.record_timing = record_timing
+
+    def subscribe(self, callback: Callable[[str, Execution], None]) -> None:
+        self.subscribers.append(callback)
+
+    def emit(self, event: str, execution: Execution) -> None:
+        for callback in self.subscribers:
+            callback(event, execution)
+
+    async def execute(
+        self, cell_json: Dict[str, Any], source: str, queued: Optional[float] = None
+    ) -> Execution:
+        """
+        Execute a cell, queued is when its execution was requested (time.time(),
+        now by default).
+        """
+        assert self.kd is not None
+        self.execution_count += 1
+        cell_json["outputs"] = []
+        execution = Execution(
+            cell_json,
+            self.execution_count,
+            uuid.uuid4().hex,
+            OutputBuffer(
+                cell_json,
+                self.max_output_lines,
+                self.max_output_bytes,
+                spill=self.spill_outputs,
+            ),
+            Timing(queued),
+        )
+        self.executions[execution.msg_id] = execution
+        output_hooks[execution.msg_id] = self.output_hook
+        self.emit("start", execution)
+        try:
+            await self.kd.execute(source, msg_id=execution.msg_id)
+        finally:
+            del output_hooks[execution.msg_id]
+            del self.executions[execution.msg_id]
+        execution.timing.reply = time.time()
+        cell_json["execution_count"] = execution.execution_count
+        if self.record_timing:
+            # a new metadata dict, the cell may be a shallow copy (see
+            # Notebook.run_all_parallel)
+            cell_json["metadata"] = dict(
+                cell_json.get("metadata", {}), execution=execution.timing.to_metadata()
+            )
+        self.emit("done", execution)
+        return execution
+
+    def output_hook(self, msg: Dict[str, Any]) -> None:
+        t0 = time.perf_counter()
+        execution = self.executions[msg["parent_header"]["msg_id"]]
+        try:
+            self.handle_message(execution, msg)
+        finally:
+            timing = execution.timing
+            timing.message_nb += 1
+            timing.handling_time += time.perf_counter() - t0
+
+    def handle_message(self, execution: Execution, msg: Dict[str, Any]) -> None:
+        msg_type = msg["header"]["msg_type"]
+        content = msg["content"]
+        timing = execution.timing
+        if msg_type == "status":
+            if content["execution_state"] == "busy":
+                timing.busy = time.time()
+            elif content["execution_state"] == "idle":
+                timing.idle = time.time()
+            return
+        elif msg_type == "execute_input":
+            timing.execute_input = time.time()
+            return
+        elif msg_type == "stream":
+            timing.message_bytes += len(content["text"])
+            execution.outputs.append_stream(content["name"], content["text"])
+        elif msg_type in ("display_data", "execute_result"):
+            timing.message_bytes += sum(len(str(v)) for v in content["data"].values())
+            execution.outputs.append(
+                {
+                    "data": {"text/plain": [content["data"].get("text/plain", "")]},
+                    "execution_count": execution.execution_count,
+                    "metadata": {},
+                    "output_type": msg_type,
+                }
+            )
+        elif msg_type == "error":
+            timing.message_bytes += sum(len(line) for line in content["traceback"])
+            execution.outputs.append(
+                {
+                    "ename": content["ename"],
+                    "evalue": content["evalue"],
+                    "output_type": "error",
+                    "traceback": content["traceback"],
+                }
+            )
+        else:
+            return
+        self.emit("output", execution)
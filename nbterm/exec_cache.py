@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+from .payload import json_default
+
+NO_CACHE_TAG = "no-cache"
+
+
+def get_cache_directory() -> Path:
+    cache_dir = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_dir) / "nbterm" / "executions"
+
+
+def get_keys(sources: List[str], kernel_name: str) -> List[str]:
+    """
+    The keys of the executions of cells, from their sources and the sources of all
+    the cells executed before them in the same kernel.
+    """
+    keys = []
+    chain = hashlib.sha256(kernel_name.encode()).digest()
+    for source in sources:
+        source_hash = hashlib.sha256(source.encode()).digest()
+        chain = hashlib.sha256(chain + source_hash).digest()
+        keys.append(chain.hex())
+    return keys
+
+
+def is_cacheable(cell_json: Dict[str, Any]) -> bool:
+    # errors are often transient (e.g. a network failure)
+    return NO_CACHE_TAG not in cell_json.get("metadata", {}).get("tags", []) and all(
+        output["output_type"] != "error" for output in cell_json["outputs"]
+    )
+
+
+class ExecutionCache:
+    """
+    The outputs and execution counts of executed cells, on disk (one JSON file per
+    execution), keyed on their sources and the sources of the cells executed
+    before them (see get_keys). Past max_size bytes, the least recently used
+    executions are evicted.
+    """
+
+    directory: Path
+    max_size: int
+
+    def __init__(self, directory: Optional[Path] = None, max_size: int = 1 << 30):
+        self.directory = directory or get_cache_directory()
+        self.max_size = max_size
+
+    def get_path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self.get_path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            # for the eviction
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def set(self, key: str, cell_json: Dict[str, Any]) -> None:
+        path = self.get_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {
+            "outputs": cell_json["outputs"],
+            "execution_count": cell_json["execution_count"],
+        }
+        # never leave an entry half-written
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+        try:
+            with os.fdopen(fd, "wt") as f:
+                json.dump(entry, f, default=json_default)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def evict(self) -> int:
+        """Evict the least recently used executions, return how many."""
+        entries = []
+        size = 0
+        for path in self.directory.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            size += stat.st_size
+        entries.sort()
+        evicted = 0
+        for _, entry_size, path in entries:
+            if size <= self.max_size:
+                break
+            path.unlink()
+            size -= entry_size
+            evicted += 1
+        return evicted
+
+    def clear(self) -> int:
+        """Remove all the executions, return how many there were."""
+        evicted = 0
+        for path in self.directory.glob("*/*.json"):
+            path.unlink()
+            evicted += 1
+        return evicted
@@ -1,32 +1,298 @@
+import asyncio
 import json
+import os
+import tempfile
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Iterator, List, Any, Optional, Tuple, Union
 
+from .autosave import (
+    AutosaveJournal,
+    dumps_records,
+    read_autosave,
+    remove_autosave,
+    replay_autosave,
+)
 from .cell import Cell
+from .height_index import HeightIndex
+from .nb_reader import NotebookReader
+from .payload import LazyPayload, PayloadSpool, json_default
+from .profile import Profile
+from .search import SearchIndex
+
+if TYPE_CHECKING:
+    from kernel_driver import KernelDriver  # type: ignore
+
+# a placeholder for the lazy payloads while serializing a cell
+PAYLOAD_MARKER = "\0nbterm-payload\0"
+
+JsonParts = List[Union[str, Tuple[LazyPayload, int]]]
+
+
+def dumps(value: Any, level: int) -> str:
+    """Serialize a value as json.dump(indent=1) would at a nesting level."""
+    text = json.dumps(value, indent=1, default=json_default)
+    # newlines in strings are escaped, these are only indentation
+    return text.replace("\n", "\n" + " " * level)
+
+
+def dumps_parts(value: Any, level: int) -> JsonParts:
+    """
+    Serialize a value as dumps does, as parts: text and the lazy payloads (with
+    their indentation), which are only loaded when the parts are joined. This way
+    the parts can be kept without keeping the payloads in memory.
+    """
+    payloads = []
+
+    def default(obj: Any) -> Any:
+        if isinstance(obj, LazyPayload):
+            payloads.append(obj)
+            return PAYLOAD_MARKER
+        return json_default(obj)
+
+    text = json.dumps(value, indent=1, default=default)
+    text = text.replace("\n", "\n" + " " * level)
+    texts = text.split(json.dumps(PAYLOAD_MARKER))
+    if len(texts) != len(payloads) + 1:
+        # some string looks like the placeholder
+        return [dumps(value, level)]
+    parts: JsonParts = [texts[0]]
+    for payload, text in zip(payloads, texts[1:]):
+        line = texts[len(parts) // 2]
+        line = line[line.rfind("\n") + 1 :]  # noqa
+        parts.append((payload, len(line) - len(line.lstrip(" "))))
+        parts.append(text)
+    return parts
+
+
+def join_parts(parts: JsonParts) -> str:
+    if len(parts) == 1:
+        return parts[0]  # type: ignore
+    return "".join(
+        part if isinstance(part, str) else dumps(part[0].load(), part[1])
+        for part in parts
+    )
+
+
+def write_atomic(path: Path, text: str) -> None:
+    """
+    Write a file through a temporary file in the same directory, renamed over it
+    once written, so that it is never left half-written.
+    """
+    path = Path(os.path.realpath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wt") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            mode = os.stat(path).st_mode & 0o7777
+        except FileNotFoundError:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
 
 
 class Format:
 
     nb_path: Path
     save_path: Optional[Path]
+    cells: List[Cell]
+    current_cell_idx: int
+    heights: HeightIndex
+    search_index: SearchIndex
+    autosave_journal: AutosaveJournal
+    autosave_interval: float
+    dirty: bool
+    nb_reader: Optional[NotebookReader]
+    payloads: PayloadSpool
+    profile: Profile
+    language: str
+    lexer_language: str
+    kd: "Optional[KernelDriver]"
+    edit_mode: bool
+    save_full_outputs: bool
+    save_lock: Optional[asyncio.Lock] = None
+    save_batch_size: int = 100
 
-    def read_nb(self) -> None:
-        with open(self.nb_path) as f:
-            self.json = json.load(f)
-        self.set_language()  # type: ignore
-        self.cells = [
-            Cell(self, cell_json=cell_json) for cell_json in self.json["cells"]
-        ]
-        del self.json["cells"]
+    def read_nb(self, height: Optional[int] = None) -> None:
+        """
+        Read the notebook, or only its first cells filling height, the other ones
+        being loaded by load_cells.
+        """
+        self.nb_reader = NotebookReader(self.nb_path)
+        self.cells = []
+        self.heights.reset(self.cells)
+        self.search_index.reset(self.cells)
+        self.autosave_journal.reset(self.cells)
+        if height is None:
+            self.load_cells()
+        else:
+            # the language is only known once all the cells are read
+            self.language = self.lexer_language = "python"
+            self.kd = None
+            while (
+                self.nb_reader is not None
+                and self.heights.prefix_sum(len(self.cells)) < height
+            ):
+                self.load_cells(1)
+
+    def load_cells(self, cell_nb: Optional[int] = None) -> None:
+        """Load the next cell_nb cells (all the remaining cells if None)."""
+        if self.nb_reader is None:
+            return
+        for cell_json in self.nb_reader.read_cells(cell_nb):
+            self.payloads.store_outputs(cell_json)
+            cell = Cell(self, cell_json=cell_json)
+            self.cells.append(cell)
+            self.heights.append(cell)
+            self.search_index.add(cell)
+            self.autosave_journal.append(cell)
+        if cell_nb is None or self.nb_reader.done:
+            self.json = self.nb_reader.json
+            self.nb_reader = None
+            language = getattr(self, "lexer_language", None)
+            self.set_language()  # type: ignore
+            if self.lexer_language != language:
+                for cell in self.cells:
+                    if cell.built and not (
+                        self.edit_mode and cell is self.cells[self.current_cell_idx]
+                    ):
+                        cell.set_input_readonly()
 
     def save(self, path: Optional[Path] = None) -> None:
-        self.dirty = False
-        path = path or self.save_path or self.nb_path
-        nb_json = {"cells": [cell.json for cell in self.cells]}
-        nb_json.update(self.json)
-        with open(path, "wt") as f:
-            json.dump(nb_json, f, indent=1)
-            f.write("\n")
+        with self.profile.phase("saving"):
+            self.load_cells()
+            self.dirty = False
+            path = path or self.save_path or self.nb_path
+            with self.compact_autosave(path):
+                write_atomic(path, "".join(self.iter_json()))
+
+    async def save_async(self, path: Optional[Path] = None) -> None:
+        """
+        Save without blocking the event loop for long: the cells are serialized a
+        few at a time, and the file is written in a thread.
+        """
+        if self.save_lock is None:
+            self.save_lock = asyncio.Lock()
+        async with self.save_lock:
+            self.load_cells()
+            self.dirty = False
+            path = path or self.save_path or self.nb_path
+            with self.compact_autosave(path):
+                chunks = []
+                for i, chunk in enumerate(self.iter_json()):
+                    chunks.append(chunk)
+                    if i % self.save_batch_size == 0:
+                        await asyncio.sleep(0)
+                loop = asyncio.get_event_loop()
+                await loop.run_in_executor(None, write_atomic, path, "".join(chunks))
+
+    @contextmanager
+    def compact_autosave(self, path: Path) -> Iterator[None]:
+        """
+        Saving the cells to path: if it is the notebook file, the autosave journal
+        is no longer needed, it is started again from the cells saved (the cells
+        changed while saving are still journaled).
+        """
+        journal = self.autosave_journal
+        if os.path.realpath(path) != os.path.realpath(self.nb_path):
+            yield
+            return
+        cells = list(self.cells)
+        changed = journal.changed
+        journal.changed = set()
+        try:
+            yield
+        except BaseException:
+            journal.changed |= changed
+            raise
+        journal.reset(cells)
+        remove_autosave(self.nb_path)
+
+    def get_autosave_records(self) -> List[dict]:
+        editing = self.cells[self.current_cell_idx] if self.edit_mode else None
+        return self.autosave_journal.get_records(self.cells, editing)
+
+    async def autosave(self) -> None:
+        """Append the edits since the last autosave to the journal."""
+        if self.nb_reader is not None:
+            # the IDs of the cells are only known once they are all read
+            return
+        if self.save_lock is None:
+            self.save_lock = asyncio.Lock()
+        async with self.save_lock:
+            records = self.get_autosave_records()
+            if records:
+                loop = asyncio.get_event_loop()
+                await loop.run_in_executor(
+                    None, self.autosave_journal.write, dumps_records(records)
+                )
+
+    async def autosave_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.autosave_interval)
+            await self.autosave()
+
+    def flush_autosave(self) -> None:
+        """Journal the last edits, e.g. when exiting without saving them."""
+        if self.nb_reader is None:
+            records = self.get_autosave_records()
+            if records:
+                self.autosave_journal.write(dumps_records(records))
+
+    def recover_autosave(self) -> bool:
+        """
+        Replay the autosave journal of the notebook (its edits which were not
+        saved), return True if there was one.
+        """
+        self.load_cells()
+        records = read_autosave(self.nb_path)
+        if records is None:
+            return False
+        cell_jsons, ids = replay_autosave([cell.json for cell in self.cells], records)
+        self.cells = []
+        for cell_json in cell_jsons:
+            self.payloads.store_outputs(cell_json)
+            self.cells.append(Cell(self, cell_json=cell_json))
+        self.heights.reset(self.cells)
+        self.search_index.reset(self.cells)
+        # continued from the replayed cells
+        self.autosave_journal.reset(self.cells, ids)
+        self.dirty = True
+        return True
+
+    def iter_json(self) -> Iterator[str]:
+        """
+        The notebook serialized as json.dump(indent=1) would, chunk by chunk.
+        """
+        cells = list(self.cells)
+        yield '{\n "cells": ['
+        for i, cell in enumerate(cells):
+            yield ",\n  " if i else "\n  "
+            yield join_parts(self.get_cell_parts(cell))
+        yield "\n ]" if cells else "]"
+        for key, value in self.json.items():
+            yield f",\n {json.dumps(key)}: {dumps(value, 1)}"
+        yield "\n}\n"
+
+    def get_cell_parts(self, cell: Cell) -> JsonParts:
+        """
+        A cell serialized (see dumps_parts), with its full outputs if it was asked.
+        The serialization is kept until the cell changes.
+        """
+        if self.save_full_outputs and cell.output_buffer is not None:
+            cell_json = dict(cell.json, outputs=cell.output_buffer.get_full_outputs())
+            return dumps_parts(cell_json, 2)
+        if cell.json_parts is None:
+            cell.json_parts = dumps_parts(cell.json, 2)
+        return cell.json_parts
 
     def create_nb(self) -> None:
         self.json = {
@@ -46,5 +312,9 @@ class Format:
             "nbformat": 4,
             "nbformat_minor": 4,
         }
+        self.nb_reader = None
         self.set_language()  # type: ignore
         self.cells = [Cell(self)]
+        self.heights.reset(self.cells)
+        self.search_index.reset(self.cells)
+        self.autosave_journal.reset(self.cells)
@@ -0,0 +1,97 @@
+from typing import Dict, List, Optional
+
+from .cell import Cell
+
+
+class HeightIndex:
+    """
+    Heights of the cells of a notebook, stored in a Fenwick tree so that the sum of
+    the heights of consecutive cells, and the cell reaching a given height, are
+    found in O(log n).
+
+    The index refers to the notebook's list of cells. Height changes are applied in
+    place, in O(log n). Inserting or removing a cell shifts the positions of the
+    following cells, so the index must then be reset, in O(n), unless the cell is
+    appended.
+    """
+
+    cells: List[Cell]
+    heights: List[int]
+    tree: List[int]
+    positions: Dict[Cell, int]
+
+    def __init__(self, cells: Optional[List[Cell]] = None):
+        self.reset(cells or [])
+
+    def __len__(self) -> int:
+        return len(self.heights)
+
+    def reset(self, cells: List[Cell]) -> None:
+        self.cells = cells
+        self.positions = {cell: i for i, cell in enumerate(self.cells)}
+        self.heights = [cell.get_height() for cell in self.cells]
+        # build the tree in O(n)
+        self.tree = [0] + self.heights
+        for i in range(1, len(self.tree)):
+            j = i + (i & -i)
+            if j < len(self.tree):
+                self.tree[j] += self.tree[i]
+
+    def _add(self, idx: int, delta: int) -> None:
+        i = idx + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def update(self, cell: Cell) -> None:
+        idx = self.positions.get(cell)
+        if idx is not None:
+            height = cell.get_height()
+            delta = height - self.heights[idx]
+            if delta:
+                self.heights[idx] = height
+                self._add(idx, delta)
+
+    def append(self, cell: Cell) -> None:
+        """Take into account that a cell was appended, in O(log n)."""
+        idx = len(self.heights)
+        height = cell.get_height()
+        self.positions[cell] = idx
+        self.heights.append(height)
+        # the new node sums the heights of the cells it covers
+        i = idx + 1
+        self.tree.append(height + self.prefix_sum(idx) - self.prefix_sum(i - (i & -i)))
+
+    def swap(self, idx0: int, idx1: int) -> None:
+        """Take into account that the cells at idx0 and idx1 were swapped."""
+        cells = self.cells
+        self.positions[cells[idx0]] = idx0
+        self.positions[cells[idx1]] = idx1
+        for idx in (idx0, idx1):
+            height = cells[idx].get_height()
+            self._add(idx, height - self.heights[idx])
+            self.heights[idx] = height
+
+    def prefix_sum(self, idx: int) -> int:
+        """Sum of the heights of the cells before the cell at index idx."""
+        total = 0
+        i = idx
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def find(self, total: int) -> int:
+        """
+        Largest number of first cells whose heights sum up to at most total (0 if
+        there is none).
+        """
+        idx = 0
+        step = 1 << len(self.heights).bit_length()
+        while step:
+            i = idx + step
+            if i < len(self.tree) and self.tree[i] <= total:
+                idx = i
+                total -= self.tree[i]
+            step >>= 1
+        return idx
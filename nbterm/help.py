@@ -1,4 +1,3 @@
-from rich.markdown import Markdown
 from prompt_toolkit.layout.containers import Window
 from prompt_toolkit.layout.controls import FormattedTextControl
 from prompt_toolkit.layout.layout import Layout
@@ -6,7 +5,7 @@ from prompt_toolkit import ANSI
 
 from .cell import rich_print
 
-md = Markdown(
+HELP = (
     "## nbterm help\n"
     "There are two modes: edit mode, and command mode.\n"
     "\n"
@@ -29,8 +28,18 @@ md = Markdown(
     "- `r`: set as raw cell.\n"
     "- `m`: set as Markdown cell.\n"
     "- `l`: clear cell outputs.\n"
+    "- `z`: undo the last change of the cells.\n"
+    "- `Z`: redo the last change undone.\n"
     "- `ctrl-e`: run cell.\n"
     "- `ctrl-r`: run cell and select below.\n"
+    "- `R`: run all cells.\n"
+    "- `U`: run all cells above.\n"
+    "- `D`: run cell and all cells below.\n"
+    "- `ctrl-c`: interrupt the kernel, and cancel the queued cells.\n"
+    "- `/`: search the cells (in the prompt, `ctrl-r` toggles regular expressions,\n"
+    "  and `ctrl-o` searching the outputs too).\n"
+    "- `n`: go to the next cell matching the search.\n"
+    "- `N`: go to the previous cell matching the search.\n"
     "- `ctrl-s`: save.\n"
     "- `ctrl-q`: exit.\n"
     "- `ctrl-h`: show help.\n"
@@ -45,8 +54,10 @@ class Help:
     help_line: int
 
     def show_help(self):
+        from rich.markdown import Markdown
+
         self.help_mode = True
-        self.help_text = rich_print(md)
+        self.help_text = rich_print(Markdown(HELP))
         self.help_window = Window(
             content=FormattedTextControl(text=ANSI(self.help_text))
         )
@@ -66,9 +77,6 @@ class Help:
             self.help_window.content = FormattedTextControl(text=ANSI(text))
 
     def quit_help(self):
+        # the help is rendered again when shown
         self.help_mode = False
         self.update_layout()
-        self.help_text = rich_print(md, self.console)
-        self.help_window = Window(
-            content=FormattedTextControl(text=ANSI(self.help_text))
-        )
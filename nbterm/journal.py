@@ -0,0 +1,284 @@
+import sys
+from collections import deque
+from contextlib import contextmanager
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+if TYPE_CHECKING:
+    from .cell import Cell
+
+# the memory taken by an operation itself, in bytes
+OPERATION_SIZE = 100
+# a key absent from the JSON of a cell
+MISSING = object()
+
+
+def get_size(value: Any) -> int:
+    """
+    An estimate of the memory taken by a JSON value, in bytes (its keys, mostly
+    shared, are not counted).
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(get_size(item) for item in value.values())
+    elif isinstance(value, list):
+        size += sum(get_size(item) for item in value)
+    return size
+
+
+class Operation:
+    """
+    An edit of a notebook, which can be undone and redone. Undoing or redoing it
+    returns the index of the cell to focus on.
+    """
+
+    size: int
+
+    def undo(self, notebook) -> int:
+        raise NotImplementedError
+
+    def redo(self, notebook) -> int:
+        raise NotImplementedError
+
+
+class CellInsertion(Operation):
+    """A cell inserted (or removed) at an index, kept for it to be put back."""
+
+    def __init__(self, idx: int, cell: "Cell", inserted: bool = True):
+        self.idx = idx
+        self.cell = cell
+        self.inserted = inserted
+        self.size = OPERATION_SIZE + get_size(cell.json)
+
+    def undo(self, notebook) -> int:
+        return self.apply(notebook, not self.inserted)
+
+    def redo(self, notebook) -> int:
+        return self.apply(notebook, self.inserted)
+
+    def apply(self, notebook, insert: bool) -> int:
+        if insert:
+            notebook.add_cell(self.idx, self.cell)
+            return self.idx
+        notebook.remove_cell(self.idx)
+        return min(self.idx, len(notebook.cells) - 1)
+
+
+class CellSwap(Operation):
+    """The cells at idx and idx + 1 swapped, the one at idx moved down or not."""
+
+    def __init__(self, idx: int, down: bool):
+        self.idx = idx
+        self.down = down
+        self.size = OPERATION_SIZE
+
+    def undo(self, notebook) -> int:
+        notebook.swap_cells(self.idx)
+        return self.idx + (not self.down)
+
+    def redo(self, notebook) -> int:
+        notebook.swap_cells(self.idx)
+        return self.idx + self.down
+
+
+class JsonChange(Operation):
+    """
+    Keys of the JSON of a cell changed (e.g. its type, or its outputs cleared),
+    with their old and new values, which are shared with the cell: they are only
+    replaced, never modified in place. A key which was changed since (e.g. the
+    outputs of a cell run again) is left as is.
+    """
+
+    def __init__(self, cell: "Cell", changes: Dict[str, Tuple[Any, Any]]):
+        self.cell = cell
+        self.changes = changes
+        self.size = OPERATION_SIZE + sum(
+            get_size(old) + get_size(new) for old, new in changes.values()
+        )
+
+    def undo(self, notebook) -> int:
+        return self.apply(notebook, 1, 0)
+
+    def redo(self, notebook) -> int:
+        return self.apply(notebook, 0, 1)
+
+    def apply(self, notebook, current: int, value: int) -> int:
+        self.cell.release()
+        cell_json = self.cell.json
+        for key, values in self.changes.items():
+            if cell_json.get(key, MISSING) is values[current]:
+                if values[value] is MISSING:
+                    del cell_json[key]
+                else:
+                    cell_json[key] = values[value]
+        self.cell.reload()
+        return notebook.heights.positions[self.cell]
+
+
+class SourceDiff(Operation):
+    """
+    The source of a cell edited: the lines from start which were replaced, and
+    the lines which replaced them (between the lines the sources have in common at
+    their start and at their end).
+    """
+
+    def __init__(self, cell: "Cell", old_source: List[str], new_source: List[str]):
+        start = 0
+        max_start = min(len(old_source), len(new_source))
+        while start < max_start and old_source[start] == new_source[start]:
+            start += 1
+        end = 0
+        max_end = max_start - start
+        while end < max_end and old_source[-1 - end] == new_source[-1 - end]:
+            end += 1
+        self.cell = cell
+        self.start = start
+        self.old_lines = old_source[start : len(old_source) - end]  # noqa
+        self.new_lines = new_source[start : len(new_source) - end]  # noqa
+        self.size = OPERATION_SIZE + get_size(self.old_lines) + get_size(self.new_lines)
+
+    def undo(self, notebook) -> int:
+        return self.apply(notebook, self.new_lines, self.old_lines)
+
+    def redo(self, notebook) -> int:
+        return self.apply(notebook, self.old_lines, self.new_lines)
+
+    def apply(self, notebook, lines: List[str], new_lines: List[str]) -> int:
+        self.cell.release()
+        source = self.cell.json["source"]
+        end = self.start + len(lines)
+        self.cell.json["source"] = source[: self.start] + new_lines + source[end:]
+        self.cell.reload()
+        return notebook.heights.positions[self.cell]
+
+
+Step = List[Operation]
+
+
+class Journal:
+    """
+    The history of the edits of a notebook, as steps of operations to undo, and
+    steps undone to redo. The operations keep what it takes to reverse them: diffs
+    of the sources, and references to the cells and outputs which were replaced,
+    instead of copies of the notebook.
+
+    The size of the journal (the memory taken by its operations, see get_size) is
+    at most max_size: past it, the oldest steps are dropped. It is measured for the
+    limit to be tuned: the largest it was, and the number of steps dropped.
+    """
+
+    undo_steps: Deque[Step]
+    redo_steps: List[Step]
+    max_size: int
+    size: int
+    peak_size: int
+    dropped_nb: int
+
+    def __init__(self, max_size: int = 50_000_000):
+        self.max_size = max_size
+        self.peak_size = 0
+        self.dropped_nb = 0
+        self.reset()
+
+    def __len__(self) -> int:
+        return len(self.undo_steps)
+
+    def reset(self) -> None:
+        self.undo_steps = deque()
+        self.redo_steps = []
+        self.size = 0
+
+    def record(self, step: Step) -> None:
+        """Record the step just done, past which nothing can be redone."""
+        for redo_step in self.redo_steps:
+            self.size -= get_step_size(redo_step)
+        self.redo_steps = []
+        self.undo_steps.append(step)
+        self.size += get_step_size(step)
+        while self.size > self.max_size and self.undo_steps:
+            self.size -= get_step_size(self.undo_steps.popleft())
+            self.dropped_nb += 1
+        self.peak_size = max(self.peak_size, self.size)
+
+    def pop_undo(self) -> Optional[Step]:
+        if not self.undo_steps:
+            return None
+        step = self.undo_steps.pop()
+        self.redo_steps.append(step)
+        return step
+
+    def pop_redo(self) -> Optional[Step]:
+        if not self.redo_steps:
+            return None
+        step = self.redo_steps.pop()
+        self.undo_steps.append(step)
+        return step
+
+
+def get_step_size(step: Step) -> int:
+    return sum(operation.size for operation in step)
+
+
+class Undo:
+    """Undoing and redoing the edits of the cells, from a journal."""
+
+    cells: List["Cell"]
+    journal: Journal
+    recording: bool
+    dirty: bool
+
+    def record(self, *operations: Operation) -> None:
+        """Record operations done, as one step."""
+        if self.recording and operations:
+            self.journal.record(list(operations))
+
+    @contextmanager
+    def record_json(self, cell: "Cell") -> Iterator[None]:
+        """Record the changes of the keys of the JSON of a cell."""
+        old_json = dict(cell.json)
+        yield
+        changes = {}
+        for key in old_json.keys() | cell.json.keys():
+            old_value = old_json.get(key, MISSING)
+            new_value = cell.json.get(key, MISSING)
+            if old_value is not new_value:
+                changes[key] = (old_value, new_value)
+        if changes:
+            self.record(JsonChange(cell, changes))
+
+    def undo(self) -> bool:
+        """Undo the last step, return True if there was one."""
+        step = self.journal.pop_undo()
+        if step is None:
+            return False
+        self.replay([operation.undo for operation in reversed(step)])
+        return True
+
+    def redo(self) -> bool:
+        """Redo the last step undone, return True if there was one."""
+        step = self.journal.pop_redo()
+        if step is None:
+            return False
+        self.replay([operation.redo for operation in step])
+        return True
+
+    def replay(self, methods: List[Callable[[Any], int]]) -> None:
+        # e.g. releasing a cell does not record its edits again
+        self.recording = False
+        idx = 0
+        try:
+            for method in methods:
+                idx = method(self)
+        finally:
+            self.recording = True
+        self.dirty = True
+        self.focus(idx, update_layout=True)  # type: ignore
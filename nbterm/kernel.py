@@ -0,0 +1,17 @@
+from typing import Callable, Dict, Any
+
+# kernel_driver calls the same hook for the outputs of all the kernels, they are
+# dispatched to the notebooks by the ID of the execute request they come from
+output_hooks: Dict[str, Callable[[Dict[str, Any]], None]] = {}
+
+
+def dispatch_output(msg: Dict[str, Any]) -> None:
+    hook = output_hooks.get(msg["parent_header"].get("msg_id"))
+    if hook is not None:
+        hook(msg)
+
+
+def install_output_hook() -> None:
+    import kernel_driver  # type: ignore
+
+    kernel_driver.driver._output_hook_default = dispatch_output
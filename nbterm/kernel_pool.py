@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+import json
+import os
+import signal
+import subprocess
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import List, Optional
+
+from kernel_driver import KernelDriver  # type: ignore
+from kernel_driver.connect import write_connection_file  # type: ignore
+from kernel_driver.kernelspec import find_kernelspec  # type: ignore
+
+
+def get_pool_directory() -> Path:
+    # a runtime directory is private, and cleared with the kernels it refers to
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return Path(runtime_dir) / "nbterm" / "kernels"
+    return Path(tempfile.gettempdir()) / f"nbterm-{os.getuid()}" / "kernels"
+
+
+def unlink(path: Path) -> None:
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class KernelProcess:
+    """
+    A kernel process started by a KernelPool, possibly by another nbterm. It can be
+    signaled, killed and waited for like the process of a kernel started by a
+    KernelDriver.
+    """
+
+    pid: int
+
+    def __init__(self, pid: int):
+        self.pid = pid
+
+    def send_signal(self, sig: int) -> None:
+        try:
+            os.kill(self.pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def kill(self) -> None:
+        self.send_signal(signal.SIGKILL)
+
+    def poll(self) -> bool:
+        """Whether the process has exited."""
+        try:
+            pid, _ = os.waitpid(self.pid, os.WNOHANG)
+            return pid != 0
+        except ChildProcessError:
+            # not a child of this process (anymore)
+            pass
+        try:
+            os.kill(self.pid, 0)
+        except ProcessLookupError:
+            return True
+        return False
+
+    async def wait(self, timeout: float = 5) -> None:
+        deadline = time.time() + timeout
+        while not self.poll() and time.time() < deadline:
+            await asyncio.sleep(0.01)
+
+
+class KernelPool:
+    """
+    Kernels started ahead of time, so that a notebook does not wait for its kernel
+    to start. They run detached from nbterm, and are registered in a directory
+    (by connection file and PID), so that the next nbterm launches can use them.
+
+    There are size kernels ready per kernel name and working directory. A kernel is
+    checked out by a notebook (it is then not shared), which starts a new one.
+    """
+
+    size: int
+    directory: Path
+    startup_timeout: float
+
+    def __init__(
+        self, size: int, directory: Optional[Path] = None, startup_timeout: float = 10
+    ):
+        self.size = size
+        self.directory = directory or get_pool_directory()
+        self.startup_timeout = startup_timeout
+
+    def get_directory(self, kernel_name: str, cwd: Path) -> Path:
+        cwd_hash = hashlib.sha1(str(cwd.resolve()).encode()).hexdigest()[:16]
+        directory = self.directory / kernel_name / cwd_hash
+        # the connection files have the keys of the kernels
+        directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+        return directory
+
+    def get_pid_paths(self, kernel_name: str, cwd: Path) -> List[Path]:
+        """The kernels ready for kernel_name and cwd, oldest first."""
+        return sorted(self.get_directory(kernel_name, cwd).glob("*.pid"))
+
+    def start_kernel(self, kernel_name: str, cwd: Path) -> None:
+        kernelspec_path = find_kernelspec(kernel_name)
+        if not kernelspec_path:
+            return
+        # sorted by start time
+        name = f"{int(time.time() * 1000):013d}-{uuid.uuid4().hex[:8]}"
+        directory = self.get_directory(kernel_name, cwd)
+        connection_file_path, _ = write_connection_file(str(directory / f"{name}.json"))
+        with open(kernelspec_path) as f:
+            kernelspec = json.load(f)
+        cmd = [
+            s.format(connection_file=connection_file_path) for s in kernelspec["argv"]
+        ]
+        # in its own session, so that it outlives the terminal of this nbterm
+        process = subprocess.Popen(
+            cmd,
+            cwd=cwd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+        # the PID file makes the kernel available, it must be complete
+        tmp_path = directory / f"{name}.pid.tmp"
+        tmp_path.write_text(str(process.pid))
+        os.replace(tmp_path, directory / f"{name}.pid")
+
+    def refill(self, kernel_name: str, cwd: Path) -> None:
+        """Start kernels so that there are size kernels ready."""
+        for _ in range(self.size - len(self.get_pid_paths(kernel_name, cwd))):
+            self.start_kernel(kernel_name, cwd)
+
+    async def checkout(self, kernel_name: str, cwd: Path) -> Optional[KernelDriver]:
+        """A started kernel, or None if there is no kernel ready."""
+        for pid_path in self.get_pid_paths(kernel_name, cwd):
+            claimed_path = pid_path.with_suffix(".claimed")
+            try:
+                # only one nbterm can claim a kernel
+                os.rename(pid_path, claimed_path)
+            except FileNotFoundError:
+                continue
+            process = KernelProcess(int(claimed_path.read_text()))
+            claimed_path.unlink()
+            connection_file_path = pid_path.with_suffix(".json")
+            if process.poll():
+                unlink(connection_file_path)
+                continue
+            kd = KernelDriver(
+                kernel_name=kernel_name,
+                connection_file=str(connection_file_path),
+                write_connection_file=False,
+                log=False,
+            )
+            kd.kernel_process = process
+            kd.connect_channels()
+            try:
+                await kd._wait_for_ready(self.startup_timeout, None)
+            except RuntimeError:
+                await kd.stop()
+                continue
+            kd.listen_channels()
+            return kd
+        return None
+
+    def stop_all(self) -> int:
+        """Stop all the kernels ready in the pool, return how many there were."""
+        kernel_nb = 0
+        for pid_path in self.directory.glob("*/*/*.pid"):
+            claimed_path = pid_path.with_suffix(".claimed")
+            try:
+                os.rename(pid_path, claimed_path)
+            except FileNotFoundError:
+                continue
+            KernelProcess(int(claimed_path.read_text())).kill()
+            claimed_path.unlink()
+            unlink(pid_path.with_suffix(".json"))
+            kernel_nb += 1
+        return kernel_nb
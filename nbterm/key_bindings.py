@@ -5,6 +5,7 @@ class KeyBindings:
 
     edit_mode: bool
     help_mode: bool
+    search_mode: bool
 
     def bind_keys(self):
         @Condition
@@ -13,7 +14,7 @@ class KeyBindings:
 
         @Condition
         def command_mode() -> bool:
-            return not self.edit_mode and not self.help_mode
+            return not self.edit_mode and not self.help_mode and not self.search_mode
 
         @Condition
         def help_mode() -> bool:
@@ -23,6 +24,10 @@ class KeyBindings:
         def not_help_mode() -> bool:
             return not self.help_mode
 
+        @Condition
+        def search_mode() -> bool:
+            return self.search_mode
+
         @self.key_bindings.add("enter", filter=help_mode)
         @self.key_bindings.add("c-q", filter=help_mode)
         @self.key_bindings.add("escape", filter=help_mode)
@@ -38,6 +43,38 @@ class KeyBindings:
         def scroll_help_down(event):
             self.scroll_help_down()
 
+        @self.key_bindings.add("enter", filter=search_mode)
+        def search(event):
+            self.quit_search()
+            self.search(self.search_buffer.text)
+
+        @self.key_bindings.add("escape", filter=search_mode, eager=True)
+        def quit_search(event):
+            self.quit_search()
+
+        @self.key_bindings.add("c-r", filter=search_mode)
+        def toggle_search_regex(event):
+            self.toggle_search_regex()
+
+        @self.key_bindings.add("c-o", filter=search_mode)
+        def toggle_search_outputs(event):
+            self.toggle_search_outputs()
+
+        @self.key_bindings.add("/", filter=command_mode)
+        def show_search(event):
+            self.quitting = False
+            self.show_search()
+
+        @self.key_bindings.add("n", filter=command_mode)
+        def search_next(event):
+            self.quitting = False
+            self.search()
+
+        @self.key_bindings.add("N", filter=command_mode)
+        def search_previous(event):
+            self.quitting = False
+            self.search(backwards=True)
+
         @self.key_bindings.add("c-h", filter=command_mode)
         def c_h(event):
             self.quitting = False
@@ -48,9 +85,9 @@ class KeyBindings:
             await self.exit()
 
         @self.key_bindings.add("c-s", filter=command_mode)
-        def c_s(event):
+        async def c_s(event):
             self.quitting = False
-            self.save()
+            await self.save_async()
 
         @self.key_bindings.add("enter", filter=command_mode)
         def enter_cell(event):
@@ -113,14 +150,34 @@ class KeyBindings:
             self.raw_cell()
 
         @self.key_bindings.add("c-e", filter=command_mode)
-        async def c_e(event):
+        def c_e(event):
             self.quitting = False
-            await self.queue_run_cell()
+            self.queue_run_cell()
 
         @self.key_bindings.add("c-r", filter=command_mode)
-        async def c_r(event):
+        def c_r(event):
             self.quitting = False
-            await self.queue_run_cell(and_select_below=True)
+            self.queue_run_cell(and_select_below=True)
+
+        @self.key_bindings.add("R", filter=command_mode)
+        def run_all(event):
+            self.quitting = False
+            self.queue_run_all()
+
+        @self.key_bindings.add("U", filter=command_mode)
+        def run_above(event):
+            self.quitting = False
+            self.queue_run_above()
+
+        @self.key_bindings.add("D", filter=command_mode)
+        def run_below(event):
+            self.quitting = False
+            self.queue_run_below()
+
+        @self.key_bindings.add("c-c", filter=not_help_mode)
+        def c_c(event):
+            self.quitting = False
+            self.interrupt_kernel()
 
         @self.key_bindings.add("x", filter=command_mode)
         def x(event):
@@ -142,6 +199,16 @@ class KeyBindings:
             self.quitting = False
             self.paste_cell(below=True)
 
+        @self.key_bindings.add("z", filter=command_mode)
+        def z(event):
+            self.quitting = False
+            self.undo()
+
+        @self.key_bindings.add("Z", filter=command_mode)
+        def redo(event):
+            self.quitting = False
+            self.redo()
+
         @self.key_bindings.add("a", filter=command_mode)
         def a(event):
             self.quitting = False
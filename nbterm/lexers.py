@@ -0,0 +1,261 @@
+import importlib
+from collections import OrderedDict
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Any,
+    Optional,
+    Tuple,
+    Type,
+)
+
+from prompt_toolkit.document import Document
+from prompt_toolkit.formatted_text import StyleAndTextTuples
+from prompt_toolkit.lexers import Lexer as PtLexer
+
+if TYPE_CHECKING:
+    from pygments.lexer import Lexer  # type: ignore
+
+# explicit pygments lexers of languages, by module and class name, the other
+# languages are looked up in pygments by name or alias
+LEXERS: Dict[str, Tuple[str, str]] = {}
+TOKEN_CACHE_SIZE = 1024
+# lexing in edit mode, see LineLexer
+BLOCK_LINES = 100
+MAX_BACKWARDS = 200
+Tokens = List[Tuple[int, Any, str]]
+
+_lexer_classes: Dict[str, Optional[Type["Lexer"]]] = {}
+_lexers: Dict[str, Optional["LineLexer"]] = {}
+_syntax_lexers: Dict[str, Optional["Lexer"]] = {}
+_tokens: "OrderedDict[Tuple[type, str], Tokens]" = OrderedDict()
+
+
+def register_lexer(language: str, module_name: str, class_name: str) -> None:
+    LEXERS[language] = (module_name, class_name)
+    _lexer_classes.pop(language, None)
+    _lexers.pop(language, None)
+    _syntax_lexers.pop(language, None)
+
+
+def get_language_names(metadata: Dict[str, Any]) -> List[str]:
+    """The names of the language of a notebook, by preference, from its metadata."""
+    language_info = metadata.get("language_info", {})
+    kernelspec = metadata.get("kernelspec", {})
+    names: List[str] = []
+    for name in (
+        language_info.get("name"),
+        kernelspec.get("language"),
+        language_info.get("pygments_lexer"),
+    ):
+        if name and name.lower() not in names:
+            names.append(name.lower())
+    return names
+
+
+def get_lexer_language(metadata: Dict[str, Any]) -> str:
+    """The first language of a notebook that has a lexer ("text" if none has)."""
+    for name in get_language_names(metadata):
+        if get_lexer_class(name) is not None:
+            return name
+    return "text"
+
+
+def get_lexer_class(language: str) -> Optional[Type["Lexer"]]:
+    """
+    The pygments lexer class of a language, sharing its tokens across instances
+    (see share_tokens), None if there is no lexer for the language.
+    """
+    if language not in _lexer_classes:
+        from pygments.lexers import find_lexer_class_by_name  # type: ignore
+        from pygments.util import ClassNotFound  # type: ignore
+
+        lexer_cls = None
+        if language in LEXERS:
+            module_name, class_name = LEXERS[language]
+            lexer_cls = getattr(importlib.import_module(module_name), class_name)
+        else:
+            try:
+                lexer_cls = find_lexer_class_by_name(language)
+            except ClassNotFound:
+                pass
+        if lexer_cls is not None:
+            lexer_cls = share_tokens(lexer_cls)
+        _lexer_classes[language] = lexer_cls
+    return _lexer_classes[language]
+
+
+def share_tokens(lexer_cls: Type["Lexer"]) -> Type["Lexer"]:
+    """
+    A subclass of a pygments lexer class, whose instances share their tokens: a
+    cell highlighted in edit mode (by prompt_toolkit) and in command mode (by rich)
+    is only lexed once.
+    """
+
+    def get_tokens_unprocessed(self, text, *args, **kwargs):
+        if args or kwargs:
+            # lexing a part of a text, e.g. from another state
+            return lexer_cls.get_tokens_unprocessed(self, text, *args, **kwargs)
+        # lexed with a final new line, as rich does
+        key = (lexer_cls, text if text.endswith("\n") else text + "\n")
+        tokens = _tokens.get(key)
+        if tokens is None:
+            tokens = list(lexer_cls.get_tokens_unprocessed(self, key[1]))
+            _tokens[key] = tokens
+            while len(_tokens) > TOKEN_CACHE_SIZE:
+                _tokens.popitem(last=False)
+        else:
+            _tokens.move_to_end(key)
+        if len(text) == len(key[1]):
+            # not to be modified
+            return tokens
+        return trim_tokens(tokens, len(text))
+
+    return type(
+        lexer_cls.__name__,
+        (lexer_cls,),
+        {"get_tokens_unprocessed": get_tokens_unprocessed},
+    )
+
+
+def trim_tokens(tokens: Tokens, length: int) -> Iterator[Tuple[int, Any, str]]:
+    """The tokens of the length first characters of a text."""
+    for index, token_type, value in tokens:
+        if index >= length:
+            return
+        yield index, token_type, value[: length - index]
+
+
+class LineLexer(PtLexer):
+    """
+    A lexer for prompt_toolkit, lexing a document by blocks of lines, so that an
+    edit only lexes its block again, and only the blocks around the lines displayed
+    are lexed (prompt_toolkit's PygmentsLexer lexes from the start of the document).
+
+    The blocks of a document of more than BLOCK_LINES lines start at resync points,
+    where the lexer is assumed to be in its initial state: the unindented lines, and
+    every BLOCK_LINES lines. A block ending in a string or a multi-line comment is
+    extended to the next resync points. The blocks of a line are found from
+    MAX_BACKWARDS lines above it, and their tokens are cached on their text (see
+    share_tokens): a smaller document is one block, shared with command mode.
+    """
+
+    pygments_lexer_cls: Type["Lexer"]
+    pygments_lexer: "Lexer"
+    _styles: Dict[Any, str]
+
+    def __init__(self, pygments_lexer_cls: Type["Lexer"]):
+        self.pygments_lexer_cls = pygments_lexer_cls
+        self.pygments_lexer = pygments_lexer_cls(stripnl=False, ensurenl=True)
+        self._styles = {}
+
+    def lex_document(self, document: Document) -> Callable[[int], StyleAndTextTuples]:
+        lines = document.lines
+        blocks: Dict[int, int] = {}  # end of the blocks lexed, by start
+        fragments: Dict[int, StyleAndTextTuples] = {}
+        last_start = -1
+
+        def get_line(lineno: int) -> StyleAndTextTuples:
+            nonlocal last_start
+            if lineno not in fragments and 0 <= lineno < len(lines):
+                if 0 <= last_start <= lineno:
+                    # the lines are mostly displayed in order, from the same blocks
+                    start = last_start
+                else:
+                    # the same for all the lines of BLOCK_LINES lines, so that they
+                    # find the same blocks
+                    start = lineno - MAX_BACKWARDS
+                    start = max(start // BLOCK_LINES * BLOCK_LINES, 0)
+                start, tokens = self.get_block(lines, lineno, start, blocks)
+                for i, line_fragments in enumerate(self.get_fragments(tokens)):
+                    fragments[start + i] = line_fragments
+                last_start = start
+            return fragments.get(lineno, [])
+
+        return get_line
+
+    def is_resync_point(self, lines: List[str], lineno: int) -> bool:
+        if lineno % BLOCK_LINES == 0:
+            return True
+        if len(lines) <= BLOCK_LINES:
+            return False
+        return lines[lineno][:1] not in ("", " ", "\t")
+
+    def get_next_resync_point(self, lines: List[str], lineno: int) -> int:
+        lineno += 1
+        while lineno < len(lines) and not self.is_resync_point(lines, lineno):
+            lineno += 1
+        return min(lineno, len(lines))
+
+    def get_block(
+        self, lines: List[str], lineno: int, start: int, blocks: Dict[int, int]
+    ) -> Tuple[int, Tokens]:
+        """
+        The start and the tokens of the block of a line, from the blocks from a
+        resync point before it.
+        """
+        from pygments.token import Comment, String  # type: ignore
+
+        while True:
+            end = blocks.get(start)
+            if end is None:
+                end = self.get_next_resync_point(lines, start)
+                while True:
+                    tokens = self.get_tokens(lines[start:end])
+                    token_type = tokens[-1][1] if tokens else None
+                    if end == len(lines) or not (
+                        token_type in String or token_type in Comment.Multiline
+                    ):
+                        break
+                    # in a string, ended further, by doubling the block
+                    end = self.get_next_resync_point(lines, 2 * end - start - 1)
+                blocks[start] = end
+            if lineno < end:
+                return start, self.get_tokens(lines[start:end])
+            start = end
+
+    def get_tokens(self, lines: List[str]) -> Tokens:
+        # the shared tokens themselves, the text ending with a new line
+        return self.pygments_lexer.get_tokens_unprocessed("\n".join(lines) + "\n")
+
+    def get_fragments(self, tokens: Tokens) -> List[StyleAndTextTuples]:
+        from prompt_toolkit.styles.pygments import pygments_token_to_classname
+
+        fragments: List[StyleAndTextTuples] = [[]]
+        for _, token_type, value in tokens:
+            style = self._styles.get(token_type)
+            if style is None:
+                style = "class:" + pygments_token_to_classname(token_type)
+                self._styles[token_type] = style
+            for i, text in enumerate(value.split("\n")):
+                if i:
+                    fragments.append([])
+                if text:
+                    fragments[-1].append((style, text))
+        return fragments[:-1]  # after the final new line
+
+
+def get_lexer(language: str) -> Optional[LineLexer]:
+    """The lexer of the cells of a language in edit mode, None if it has none."""
+    if language not in _lexers:
+        lexer = None
+        lexer_cls = get_lexer_class(language)
+        if lexer_cls is not None:
+            lexer = LineLexer(lexer_cls)
+        _lexers[language] = lexer
+    return _lexers[language]
+
+
+def get_syntax_lexer(language: str) -> Optional["Lexer"]:
+    """The lexer of the cells of a language for rich's Syntax, None if it has none."""
+    if language not in _syntax_lexers:
+        lexer = None
+        lexer_cls = get_lexer_class(language)
+        if lexer_cls is not None:
+            # the options of rich
+            lexer = lexer_cls(stripnl=False, ensurenl=True)
+        _syntax_lexers[language] = lexer
+    return _syntax_lexers[language]
@@ -0,0 +1,108 @@
+import codecs
+import itertools
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, Any, Optional
+
+
+class NotebookReader:
+    """
+    Read a notebook file incrementally: its cells are parsed one at a time, as the
+    file is read. The rest of the notebook (metadata, format version) is in json
+    once all the cells are read.
+    """
+
+    chunk_size: int = 1 << 20
+    size: int
+    read_size: int
+    buffer: str
+    pos: int
+    eof: bool
+    done: bool
+    json: Dict[str, Any]
+
+    def __init__(self, path: Path):
+        self.file = open(path, "rb")
+        self.size = os.path.getsize(path)
+        self.read_size = 0
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.done = False
+        self.json = {}
+        self.cells = self.parse()
+
+    @property
+    def progress(self) -> float:
+        return self.read_size / self.size if self.size else 1.0
+
+    def read_cells(self, cell_nb: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Read the next cell_nb cells (all the remaining cells if None)."""
+        return itertools.islice(self.cells, cell_nb)
+
+    def read(self, size: int = 0) -> None:
+        data = self.file.read(max(size, self.chunk_size))
+        self.read_size += len(data)
+        self.eof = not data
+        # drop what was parsed
+        self.buffer = self.buffer[self.pos :] + self.text_decoder.decode(  # noqa
+            data, final=self.eof
+        )
+        self.pos = 0
+
+    def peek(self) -> str:
+        """Skip whitespaces and return the next character."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if self.eof:
+                raise json.JSONDecodeError(
+                    "Unexpected end of notebook", self.buffer, self.pos
+                )
+            self.read()
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self.buffer, self.pos)
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            else:
+                # a number at the end of the buffer may not be complete
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            # at least double the buffer, so that a large value is parsed a
+            # logarithmic number of times
+            self.read(len(self.buffer) - self.pos)
+
+    def parse(self) -> Iterator[Dict[str, Any]]:
+        self.expect("{")
+        while self.peek() != "}":
+            key = self.value()
+            self.expect(":")
+            if key == "cells":
+                self.expect("[")
+                while self.peek() != "]":
+                    yield self.value()
+                    if self.peek() == ",":
+                        self.pos += 1
+                self.pos += 1
+            else:
+                self.json[key] = self.value()
+            if self.peek() == ",":
+                self.pos += 1
+        self.file.close()
+        self.done = True
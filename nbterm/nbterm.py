@@ -1,12 +1,18 @@
+import os
 import sys
+import glob
+import time
 from pathlib import Path
-import asyncio
-from typing import Optional
+from typing import TYPE_CHECKING, Any, List, Optional
 
 import typer
 
 from nbterm import __version__
-from .notebook import Notebook
+
+# the other modules are imported when needed, so that e.g. --version is fast
+if TYPE_CHECKING:
+    from .notebook import Notebook
+    from .batch import RunResult
 
 
 def version_callback(value: bool):
@@ -27,8 +33,63 @@ def find_available_name(directory: Path, prefix: str):
     return notebook_path
 
 
+def run_batch(
+    patterns: List[str],
+    jobs: int,
+    save_dir: Optional[Path],
+    kernel_cwd: Optional[Path],
+    kernel_nb: int,
+    **kwargs: Any,
+):
+    import asyncio
+    from .batch import expand_paths, iter_report, run_notebooks
+
+    nb_paths = expand_paths(patterns)
+    if not nb_paths:
+        typer.echo("No notebook found")
+        sys.exit(1)
+    if save_dir is not None and not save_dir.is_dir():
+        typer.echo(f"Not a directory: {save_dir}")
+        sys.exit(1)
+
+    def on_result(result: "RunResult"):
+        line = f"{result.status:>6} {result.elapsed:7.1f}s {result.nb_path}"
+        if result.status == "error":
+            line += f": {result.error}"
+        else:
+            line += f" -> {result.save_path}"
+        typer.echo(line)
+
+    t0 = time.perf_counter()
+    results = asyncio.run(
+        run_notebooks(
+            nb_paths,
+            jobs or os.cpu_count() or 1,
+            save_dir=save_dir,
+            kernel_cwd=kernel_cwd,
+            kernel_nb=kernel_nb,
+            on_result=on_result,
+            **kwargs,
+        )
+    )
+    for line in iter_report(results, time.perf_counter() - t0):
+        typer.echo(line)
+    if any(result.status != "ok" for result in results):
+        sys.exit(1)
+
+
+async def run_all(nb: "Notebook", kernel_nb: int):
+    try:
+        await nb.run_all(kernel_nb)
+    finally:
+        await nb.stop_kernel()
+
+
 def main(
-    notebook_path: Optional[Path] = typer.Argument(None, help="Path to the notebook."),
+    notebook_paths: Optional[List[Path]] = typer.Argument(
+        None,
+        help="Path to the notebook (with --run, several paths or glob patterns).",
+    ),
     kernel_cwd: Optional[Path] = typer.Option(
         None, help="Working directory of the kernel."
     ),
@@ -37,13 +98,148 @@ def main(
     ),
     run: Optional[bool] = typer.Option(None, "--run", help="Run the notebook."),
     save_path: Optional[Path] = typer.Option(
-        None, "--save-path", help="Path to save the notebook."
+        None,
+        "--save-path",
+        help="Path to save the notebook (a directory when running several notebooks).",
+    ),
+    jobs: int = typer.Option(
+        0,
+        "--jobs",
+        "-j",
+        min=0,
+        help="Number of notebooks run concurrently (0 for the number of CPUs).",
+    ),
+    kernel_pool: int = typer.Option(
+        0,
+        "--kernel-pool",
+        min=0,
+        help="Number of kernels kept started in the background, ready for the next "
+        "notebooks (per kernel and working directory).",
+    ),
+    stop_kernel_pool: bool = typer.Option(
+        False, "--stop-kernel-pool", help="Stop the kernels of the pool and exit."
+    ),
+    parallel: int = typer.Option(
+        1,
+        "--parallel",
+        min=1,
+        help="Number of kernels to run the independent cells of a notebook "
+        "concurrently (with --run). Cells are independent if they don't use each "
+        'other\'s names, or if they are in different "branch:NAME" tagged sections.',
+    ),
+    cache: bool = typer.Option(
+        False,
+        "--cache",
+        help="Replay the outputs of the cells that didn't change since a previous "
+        'run (with --run). Cells tagged "no-cache" are always run.',
+    ),
+    cache_size: int = typer.Option(
+        1024,
+        "--cache-size",
+        min=0,
+        help="Maximum size of the execution cache (in MB), the least recently used "
+        "executions are evicted.",
+    ),
+    clear_cache: bool = typer.Option(
+        False, "--clear-cache", help="Clear the execution cache and exit."
+    ),
+    record_timing: bool = typer.Option(
+        False,
+        "--record-timing",
+        help='Record the timing of the executions in the "execution" metadata of '
+        "the cells.",
+    ),
+    profile: bool = typer.Option(
+        False,
+        "--profile",
+        help="Show the slowest cells and where nbterm spent time (with --run, for "
+        "one notebook).",
+    ),
+    output_rate: float = typer.Option(
+        30, "--output-rate", min=1, help="Maximum output refresh rate (in Hz)."
+    ),
+    max_output_lines: int = typer.Option(
+        10000,
+        "--max-output-lines",
+        min=2,
+        help="Maximum number of output lines kept per cell.",
+    ),
+    max_output_bytes: int = typer.Option(
+        10_000_000,
+        "--max-output-bytes",
+        min=2,
+        help="Maximum output size kept per cell (in bytes).",
+    ),
+    autosave: float = typer.Option(
+        5,
+        "--autosave",
+        min=0,
+        help="Interval of the autosave of the changes, to a journal next to the "
+        "notebook from which they can be recovered if nbterm exits without saving "
+        "them (in seconds, 0 not to autosave).",
+    ),
+    save_renders: bool = typer.Option(
+        True,
+        "--save-renders/--no-save-renders",
+        help="Save the rendered cells in ~/.cache/nbterm, for the notebook to open "
+        "faster the next time.",
+    ),
+    spill_outputs: bool = typer.Option(
+        False, "--spill-outputs", help="Save the elided outputs to temporary files."
+    ),
+    save_full_outputs: bool = typer.Option(
+        False,
+        "--save-full-outputs",
+        help="Save the full outputs, including the elided ones (implies --spill-outputs).",
     ),
     version: Optional[bool] = typer.Option(
         None, "--version", callback=version_callback, help="Show the version and exit."
     ),
     test: Optional[str] = typer.Option(None, "--test", help="N/A (for testing)."),
 ):
+    from .exec_cache import ExecutionCache
+
+    if stop_kernel_pool:
+        from .kernel_pool import KernelPool
+
+        kernel_nb = KernelPool(0).stop_all()
+        typer.echo(f"Stopped {kernel_nb} kernel(s)")
+        sys.exit(0)
+    if clear_cache:
+        entry_nb = ExecutionCache().clear()
+        typer.echo(f"Removed {entry_nb} cached execution(s)")
+        sys.exit(0)
+    pool = None
+    if kernel_pool:
+        from .kernel_pool import KernelPool
+
+        pool = KernelPool(kernel_pool)
+    execution_cache = ExecutionCache(max_size=cache_size << 20) if cache else None
+    notebook_paths = notebook_paths or []
+    patterns = [str(path) for path in notebook_paths]
+    if run and (len(patterns) > 1 or any(glob.has_magic(p) for p in patterns)):
+        if profile:
+            typer.echo("Only one notebook can be profiled")
+            sys.exit(1)
+        run_batch(
+            patterns,
+            jobs,
+            save_path,
+            kernel_cwd,
+            parallel,
+            max_output_lines=max_output_lines,
+            max_output_bytes=max_output_bytes,
+            spill_outputs=spill_outputs,
+            save_full_outputs=save_full_outputs,
+            kernel_pool=pool,
+            execution_cache=execution_cache,
+            record_timing=record_timing,
+        )
+        return
+    if len(notebook_paths) > 1:
+        typer.echo("Several notebooks can only be run (with --run)")
+        sys.exit(1)
+    notebook_path = notebook_paths[0] if notebook_paths else None
     prefix = "Untitled"
     if notebook_path is None:
         notebook_path = find_available_name(Path("."), prefix)
@@ -62,21 +258,55 @@ def main(
         typer.echo(f"notebook_path={notebook_path}")
         typer.echo(f"kernel_cwd={kernel_cwd}")
         sys.exit(0)
+    import asyncio
+    from .autosave import read_autosave, remove_autosave
+    from .notebook import Notebook
+    from .profile import iter_profile_report
+
+    recover = False
+    if not run and read_autosave(notebook_path) is not None:
+        recover = typer.confirm(
+            f"{notebook_path} has changes from a previous session which were not "
+            "saved, recover them?",
+            default=True,
+        )
+        if not recover:
+            remove_autosave(notebook_path)
     nb = Notebook(
         notebook_path,
         kernel_cwd=kernel_cwd,
         no_kernel=no_kernel or False,
         save_path=save_path,
+        output_rate=output_rate,
+        max_output_lines=max_output_lines,
+        max_output_bytes=max_output_bytes,
+        spill_outputs=spill_outputs,
+        save_full_outputs=save_full_outputs,
+        progressive=not run,
+        kernel_pool=pool,
+        execution_cache=execution_cache,
+        record_timing=record_timing,
+        autosave_interval=0 if run else autosave,
+        recover=recover,
+        save_renders=save_renders and not run,
     )
     if run:
         assert no_kernel is not True
-        asyncio.run(nb.run_all())
+        asyncio.run(run_all(nb, parallel))
         if save_path is None:
             directory = notebook_path.parent
             prefix = str(directory / f"{notebook_path.stem}_run")
             save_path = find_available_name(directory, prefix)
         nb.save(save_path)
         typer.echo(f"Executed notebook has been saved to: {save_path}")
+        if profile:
+            timings = [
+                (i, cell.timing)
+                for i, cell in enumerate(nb.cells)
+                if cell.timing is not None
+            ]
+            for line in iter_profile_report(nb.profile, timings):
+                typer.echo(line)
     else:
         nb.show()
 
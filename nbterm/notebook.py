@@ -1,59 +1,96 @@
 import os
+import signal
+import sys
+import time
 from pathlib import Path
-import itertools
 import asyncio
-from typing import List, Dict, Tuple, Any, Optional, cast
+from collections import OrderedDict
+from typing import TYPE_CHECKING, List, Dict, Set, Tuple, Any, Optional, cast
 
 from prompt_toolkit import ANSI
 from prompt_toolkit.key_binding import KeyBindings as PtKeyBindings
 from prompt_toolkit.layout import ScrollablePane
-from prompt_toolkit.layout.containers import HSplit, VSplit
+from prompt_toolkit.filters import Condition
+from prompt_toolkit.layout.containers import ConditionalContainer, HSplit
 from prompt_toolkit.layout.layout import Layout
 from prompt_toolkit.layout.controls import FormattedTextControl
-from prompt_toolkit.lexers import PygmentsLexer
 from prompt_toolkit.widgets.toolbars import FormattedTextToolbar
-from pygments.lexers.python import PythonLexer  # type: ignore
-from pygments.lexers.c_cpp import CppLexer  # type: ignore
 from prompt_toolkit import Application
 from rich.console import Console
-import kernel_driver  # type: ignore
-from kernel_driver import KernelDriver
 
+from .autosave import AutosaveJournal, remove_autosave
 from .cell import (
     Cell,
-    ONE_COL,
+    get_render_key,
     set_console,
+    set_saved_renders,
     rich_print,
-    get_output_text_and_height,
 )
+from .dag import get_ancestors, get_cell_dependencies, schedule
+from .engine import Engine, Execution
+from .exec_cache import NO_CACHE_TAG, ExecutionCache, get_keys, is_cacheable
+from .height_index import HeightIndex
+from .kernel import install_output_hook
+from .lexers import LineLexer, get_lexer, get_lexer_language
+from .payload import PayloadSpool
+from .profile import Profile, format_duration
+from .render_cache import SavedRenders
 from .help import Help
+from .journal import CellInsertion, CellSwap, Journal, Undo
+from .search import Search, SearchIndex
 from .format import Format
 from .key_bindings import KeyBindings
 
+if TYPE_CHECKING:
+    from kernel_driver import KernelDriver  # type: ignore
+    from .kernel_pool import KernelPool
 
-class Notebook(Help, Format, KeyBindings):
+
+class Notebook(Help, Format, KeyBindings, Search, Undo):
 
     app: Optional[Application]
     layout: Layout
+    cells_container: HSplit
+    nb_window: ScrollablePane
     copied_cell: Optional[Cell]
     console: Console
     _run_notebook_nb_path: str
     cells: List[Cell]
+    built_cells: "OrderedDict[Cell, None]"
+    max_built_cells: int = 100
+    load_batch_size: int = 100
     executing_cells: Dict[int, Cell]
+    run_queue: "OrderedDict[Cell, float]"
+    run_task: Optional[asyncio.Task]
+    engine: Engine
+    output_rate: float
+    max_output_lines: int
+    max_output_bytes: int
+    spill_outputs: bool
+    save_full_outputs: bool
+    pending_output_cells: Set[Cell]
+    output_flush_handle: Optional[asyncio.TimerHandle]
+    layout_delay: float = 0.05
+    layout_update_handle: Optional[asyncio.TimerHandle]
     json: Dict[str, Any]
-    kd: Optional[KernelDriver]
-    execution_count: int
-    msg_id_2_execution_count: Dict[str, int]
     current_cell_idx: int
     top_cell_idx: int
     bottom_cell_idx: int
-    lexer: Optional[PygmentsLexer] = PygmentsLexer(PythonLexer)
     language: str
+    lexer_language: str
+    width: int
     kernel_name: str
     no_kernel: bool
     dirty: bool
     quitting: bool
     kernel_cwd: Path
+    kernel_pool: "Optional[KernelPool]"
+    execution_cache: Optional[ExecutionCache]
+    record_timing: bool
+    profile: Profile
+    autosave_journal: AutosaveJournal
+    autosave_interval: float
+    saved_renders: Optional[SavedRenders]
 
     def __init__(
         self,
@@ -61,6 +98,18 @@ class Notebook(Help, Format, KeyBindings):
         kernel_cwd: Path = Path("."),
         no_kernel: bool = False,
         save_path: Optional[Path] = None,
+        output_rate: float = 30,
+        max_output_lines: int = 10000,
+        max_output_bytes: int = 10_000_000,
+        spill_outputs: bool = False,
+        save_full_outputs: bool = False,
+        progressive: bool = False,
+        kernel_pool: "Optional[KernelPool]" = None,
+        execution_cache: Optional[ExecutionCache] = None,
+        record_timing: bool = False,
+        autosave_interval: float = 0,
+        recover: bool = False,
+        save_renders: bool = False,
     ):
         self.nb_path = nb_path.resolve()
         self.kernel_cwd = kernel_cwd.resolve()
@@ -69,86 +118,367 @@ class Notebook(Help, Format, KeyBindings):
         self.copied_cell = None
         self.console = Console()
         set_console(self.console)
+        # the renders of the inputs are saved for the next sessions
+        if save_renders:
+            self.saved_renders = SavedRenders(
+                self.nb_path, self.console.color_system, self.console.width
+            )
+            self.saved_renders.load()
+        else:
+            self.saved_renders = None
+        set_saved_renders(self.saved_renders)
         self.save_path = save_path
         self.no_kernel = no_kernel
+        self.kernel_pool = kernel_pool
+        self.execution_cache = execution_cache
+        self.record_timing = record_timing
+        self.profile = Profile()
+        # by ID of their JSON
         self.executing_cells = {}
+        # the cells waiting to be run, with the time they were queued
+        self.run_queue = OrderedDict()
+        self.run_task = None
+        self.output_rate = output_rate
+        self.max_output_lines = max_output_lines
+        self.max_output_bytes = max_output_bytes
+        # the full outputs can only be saved if they were spilled
+        self.spill_outputs = spill_outputs or save_full_outputs
+        self.save_full_outputs = save_full_outputs
+        self.engine = Engine(
+            max_output_lines=max_output_lines,
+            max_output_bytes=max_output_bytes,
+            spill_outputs=self.spill_outputs,
+            record_timing=record_timing,
+        )
+        self.pending_output_cells = set()
+        self.output_flush_handle = None
+        self.layout_update_handle = None
+        self.built_cells = OrderedDict()
+        self.heights = HeightIndex()
+        self.search_index = SearchIndex()
+        self.journal = Journal()
+        self.recording = True
+        # 0 not to autosave
+        self.autosave_interval = autosave_interval
+        self.autosave_journal = AutosaveJournal(self.nb_path)
+        self.payloads = PayloadSpool()
         self.top_cell_idx = 0
         self.bottom_cell_idx = -1
         self.current_cell_idx = 0
+        self.edit_mode = False
+        self.width = 0
         if self.nb_path.is_file():
-            self.read_nb()
+            with self.profile.phase("loading"):
+                if progressive and not recover:
+                    # only the first screen, the other cells are loaded in show
+                    self.read_nb(self.console.height)
+                else:
+                    self.read_nb()
         else:
             self.create_nb()
         self.dirty = False
+        if recover:
+            self.recover_autosave()
         self.quitting = False
-        self.execution_count = 0
-        self.msg_id_2_execution_count = {}
-        self.edit_mode = False
         self.help_mode = False
+        self.search_mode = False
+        self.search_regex = False
+        self.search_outputs = False
+        self.search_query = ""
+        self.search_message = ""
 
     def set_language(self):
         self.kernel_name = self.json["metadata"]["kernelspec"]["name"]
         self.language = self.json["metadata"]["kernelspec"]["language"]
-        if self.language == "python":
-            self.lexer = PygmentsLexer(PythonLexer)
-        elif self.language == "cpp":
-            self.lexer = PygmentsLexer(CppLexer)
-        else:
-            self.lexer = None
+        self.lexer_language = get_lexer_language(self.json["metadata"])
         if self.no_kernel:
             self.kd = None
         else:
+            from kernel_driver import KernelDriver  # type: ignore
+
             try:
                 self.kd = KernelDriver(kernel_name=self.kernel_name, log=False)
-                kernel_driver.driver._output_hook_default = self.output_hook
+                install_output_hook()
             except RuntimeError:
                 self.kd = None
 
+    @property
+    def kd(self) -> "Optional[KernelDriver]":
+        return self.engine.kd
+
+    @kd.setter
+    def kd(self, kd: "Optional[KernelDriver]"):
+        self.engine.kd = kd
+
+    @property
+    def lexer(self) -> Optional[LineLexer]:
+        return get_lexer(self.lexer_language)
+
     @property
     def current_cell(self):
         return self.cells[self.current_cell_idx]
 
+    @property
+    def visible_cells(self) -> List[Cell]:
+        return self.cells[self.top_cell_idx : self.bottom_cell_idx + 1]  # noqa
+
     async def run_cell(self, idx: Optional[int] = None):
         if idx is None:
             idx = self.current_cell_idx
         self.focus(idx)
         await self.current_cell.run()
 
-    async def run_all(self):
-        await self.kd.start()
-        for i in range(len(self.cells)):
-            await self.run_cell(i)
+    async def checkout_kernel(self) -> "Optional[KernelDriver]":
+        """A started kernel from the kernel pool, if there is one ready."""
+        if self.kernel_pool is None:
+            return None
+        kd = await self.kernel_pool.checkout(self.kernel_name, self.kernel_cwd)
+        # replace the kernel in the background (for the next notebook)
+        self.kernel_pool.refill(self.kernel_name, self.kernel_cwd)
+        return kd
+
+    async def start_kernel(self):
+        with self.profile.phase("kernel start"):
+            kd = await self.checkout_kernel()
+            if kd is not None:
+                # the kernel driver was not started, only its connection file exists
+                os.remove(self.kd.connection_file_path)
+                self.kd = kd
+                return
+            # the kernel process is launched before anything is awaited, so that
+            # the working directory it inherits is not changed by another notebook
+            os.chdir(self.kernel_cwd)
+            await self.kd.start()
+
+    async def start_extra_kernel(self) -> "KernelDriver":
+        """Another kernel for the notebook, e.g. to run cells in parallel."""
+        kd = await self.checkout_kernel()
+        if kd is None:
+            from kernel_driver import KernelDriver  # type: ignore
+
+            kd = KernelDriver(kernel_name=self.kernel_name, log=False)
+            os.chdir(self.kernel_cwd)
+            await kd.start()
+        return kd
+
+    async def stop_kernel(self):
+        if hasattr(self.kd, "kernel_process"):
+            await self.kd.stop()
+
+    async def run_all(self, kernel_nb: int = 1):
+        self.load_cells()
+        cell_idxs = list(range(len(self.cells)))
+        if self.execution_cache is not None:
+            code_idxs = [
+                i
+                for i, cell in enumerate(self.cells)
+                if cell.json["cell_type"] == "code" and cell.source.strip()
+            ]
+            keys = get_keys([self.cells[i].source for i in code_idxs], self.kernel_name)
+            cell_idxs = self.replay_cached(code_idxs, keys)
+        if not cell_idxs:
+            # everything was replayed, no need for a kernel
+            pass
+        elif kernel_nb > 1:
+            await self.run_all_parallel(kernel_nb, cell_idxs)
+        else:
+            await self.start_kernel()
+            for i in cell_idxs:
+                await self.run_cell(i)
+        if self.execution_cache is not None:
+            self.number_executions(code_idxs)
+            run_idxs = set(cell_idxs)
+            for i, key in zip(code_idxs, keys):
+                if i in run_idxs and is_cacheable(self.cells[i].json):
+                    self.execution_cache.set(key, self.cells[i].json)
+            self.execution_cache.evict()
+
+    def replay_cached(self, code_idxs: List[int], keys: List[str]) -> List[int]:
+        """
+        Replay the outputs of the first code cells from the execution cache, as long
+        as they are in it. Return the cells that must still be run: the next ones,
+        and the replayed ones they depend on (see dag.get_dependencies).
+        """
+        assert self.execution_cache is not None
+        entries = []
+        for i, key in zip(code_idxs, keys):
+            if NO_CACHE_TAG in self.cells[i].json["metadata"].get("tags", []):
+                break
+            entry = self.execution_cache.get(key)
+            if entry is None:
+                break
+            entries.append(entry)
+        to_run = set(range(len(entries), len(code_idxs)))
+        if to_run:
+            dependencies = get_cell_dependencies(
+                [self.cells[i].json for i in code_idxs], self.language
+            )
+            to_run |= get_ancestors(dependencies, list(to_run))
+        for cell in self.cells:
+            cell.clear_output()
+        for j, entry in enumerate(entries):
+            if j not in to_run:
+                cell = self.cells[code_idxs[j]]
+                cell.json["outputs"] = entry["outputs"]
+                self.search_index.outputs.add(cell)
+                cell.json["execution_count"] = entry["execution_count"]
+                cell.set_dirty()
+                cell.update_output()
+        return [code_idxs[j] for j in sorted(to_run)]
+
+    def number_executions(self, cell_idxs: List[int]):
+        """
+        Number the executions of cells in document order, as if they were run one
+        after the other in one kernel.
+        """
+        for execution_count, i in enumerate(sorted(cell_idxs), 1):
+            cell = self.cells[i]
+            cell.json["execution_count"] = execution_count
+            for output in cell.json["outputs"]:
+                if "execution_count" in output:
+                    output["execution_count"] = execution_count
+            cell.set_dirty()
+
+    async def run_all_parallel(self, kernel_nb: int, cell_idxs: List[int]):
+        """
+        Run the independent branches of cells concurrently, on up to kernel_nb
+        kernels (see dag.schedule). Their outputs are merged in the cells, numbered
+        in document order as if they were run on one kernel.
+        """
+        schedules = [
+            [cell_idxs[j] for j in kernel_cell_idxs]
+            for kernel_cell_idxs in schedule(
+                [self.cells[i].json for i in cell_idxs], kernel_nb, self.language
+            )
+        ]
+        engines = [self.engine]
+        first_cell_idxs = set(schedules[0])
+        executions: Dict[int, Execution] = {}
+
+        async def run(engine: Engine, cell_idxs: List[int], owned: bool):
+            for i in cell_idxs:
+                cell = self.cells[i]
+                if not cell.source.strip():
+                    continue
+                if owned or i not in first_cell_idxs:
+                    executions[i] = await engine.execute(cell.json, cell.source)
+                else:
+                    # a cell shared with the first kernel, only run for the state
+                    # of the kernel
+                    await engine.execute(dict(cell.json), cell.source)
+
+        # the kernels are started concurrently
+        starts = await asyncio.gather(
+            self.start_kernel(),
+            *(self.start_extra_kernel() for _ in schedules[1:]),
+            return_exceptions=True,
+        )
+        kds = [kd for kd in starts[1:] if not isinstance(kd, BaseException)]
+        try:
+            for start in starts:
+                if isinstance(start, BaseException):
+                    raise start
+            for kd in kds:
+                engines.append(
+                    Engine(
+                        kd,
+                        self.max_output_lines,
+                        self.max_output_bytes,
+                        self.spill_outputs,
+                        self.record_timing,
+                    )
+                )
+            for i in cell_idxs:
+                self.cells[i].clear_output()
+            await asyncio.gather(
+                *(
+                    run(engine, cell_idxs, k == 0)
+                    for k, (engine, cell_idxs) in enumerate(zip(engines, schedules))
+                )
+            )
+        finally:
+            for kd in kds:
+                await kd.stop()
+        for i, execution in executions.items():
+            self.cells[i].output_buffer = execution.outputs
+            self.cells[i].timing = execution.timing
+        self.number_executions(list(executions))
 
     def show(self):
+        self.create_app()
+        asyncio.run(self._show())
+
+    def create_app(self, **kwargs):
         self.key_bindings = PtKeyBindings()
         self.bind_keys()
         self.create_layout()
         self.app = Application(
-            layout=self.layout, key_bindings=self.key_bindings, full_screen=True
+            layout=self.layout,
+            key_bindings=self.key_bindings,
+            full_screen=True,
+            **kwargs,
         )
+        self.width = self.get_width()
+        self.app.before_render += self.check_width
+        # without an application, the outputs are not rendered
+        if self.on_execution_event not in self.engine.subscribers:
+            self.engine.subscribe(self.on_execution_event)
+        self.flush_outputs()
         self.focus(0)
-        asyncio.run(self._show())
 
     def update_layout(self):
         if self.app:
-            self.create_layout()
-            self.app.layout = self.layout
+            self.update_cells_container()
+            self.nb_window.vertical_scroll = 0
+            if self.app.layout is not self.layout:
+                # e.g. coming back from help
+                self.app.layout = self.layout
+            self.release_cells()
+
+    def touch_cell(self, cell: Cell):
+        self.built_cells[cell] = None
+        self.built_cells.move_to_end(cell)
+
+    def release_cells(self):
+        # free the widgets of the least recently displayed cells
+        visible_cells = set(self.visible_cells)
+        visible_cells.add(self.current_cell)
+        for cell in list(self.built_cells):
+            if len(self.built_cells) <= self.max_built_cells:
+                break
+            if cell not in visible_cells:
+                cell.release()
+                del self.built_cells[cell]
+
+    def update_cells_container(self):
+        """
+        Patch the children of the cells container so that they show the visible
+        cells, only touching the rows that changed.
+        """
+        children = []
+        for cell in self.visible_cells:
+            cell.build()
+            children.extend(cell.get_containers())
+        old_children = self.cells_container.children
+        if children == old_children:
+            return
+        # replace only what is between the common head and tail
+        start = 0
+        max_start = min(len(children), len(old_children))
+        while start < max_start and children[start] is old_children[start]:
+            start += 1
+        end = 0
+        max_end = max_start - start
+        while end < max_end and children[-1 - end] is old_children[-1 - end]:
+            end += 1
+        new_end = len(children) - end
+        old_end = len(old_children) - end
+        old_children[start:old_end] = children[start:new_end]
 
     def create_layout(self):
-        inout_cells = list(
-            itertools.chain.from_iterable(
-                [
-                    (
-                        VSplit([cell.input_prefix, cell.input]),
-                        VSplit([cell.output_prefix, ONE_COL, cell.output, ONE_COL]),
-                    )
-                    for cell in self.cells[
-                        self.top_cell_idx : self.bottom_cell_idx + 1  # noqa
-                    ]
-                ]
-            )
-        )
-        nb_window = ScrollablePane(HSplit(inout_cells), show_scrollbar=False)
+        self.cells_container = HSplit([])
+        self.update_cells_container()
+        self.nb_window = ScrollablePane(self.cells_container, show_scrollbar=False)
 
         def get_top_bar_text():
             text = ""
@@ -164,17 +494,26 @@ class Notebook(Help, Format, KeyBindings):
 
         def get_bottom_bar_text():
             text = ""
-            if self.kd and not self.no_kernel and self.kernel_name:
+            if self.nb_reader is not None:
+                text += f"[LOADING {self.nb_reader.progress:.0%}]"
+            elif self.kd and not self.no_kernel and self.kernel_name:
                 if self.executing_cells:
                     kernel_status = "busy"
                 else:
                     kernel_status = "idle"
+                if self.run_queue:
+                    kernel_status += f", {len(self.run_queue)} queued"
                 text += f"{self.kernel_name} ({kernel_status})"
             else:
                 text += "[NO KERNEL]"
             text += (
                 f" @ {self.kernel_cwd} - {self.current_cell_idx + 1}/{len(self.cells)}"
             )
+            run_time = self.cells and self.current_cell.get_run_time()
+            if run_time:
+                text += f" - ran in {format_duration(run_time)}"
+            if self.search_message:
+                text += f" - {self.search_message}"
             return text
 
         self.top_bar = FormattedTextToolbar(
@@ -183,8 +522,17 @@ class Notebook(Help, Format, KeyBindings):
         self.bottom_bar = FormattedTextToolbar(
             get_bottom_bar_text, style="#ffffff bg:#444444"
         )
-        root_container = HSplit([self.top_bar, nb_window, self.bottom_bar])
+        search_mode = Condition(lambda: self.search_mode)
+        root_container = HSplit(
+            [
+                self.top_bar,
+                self.nb_window,
+                ConditionalContainer(self.bottom_bar, filter=~search_mode),
+                ConditionalContainer(self.create_search_bar(), filter=search_mode),
+            ]
+        )
         self.layout = Layout(root_container)
+        self.release_cells()
 
     def focus(self, idx: int, update_layout: bool = False, no_change: bool = False):
         """
@@ -206,6 +554,73 @@ class Notebook(Help, Format, KeyBindings):
                 self.app.layout.focus(self.cells[idx].input_window)
             self.current_cell_idx = idx
 
+    def get_width(self) -> int:
+        self.app = cast(Application, self.app)
+        return self.app.renderer.output.get_size().columns
+
+    def get_output_width(self) -> int:
+        """The width of the outputs, 0 if unknown (there is no application)."""
+        if self.app is None:
+            return 0
+        return max(self.get_width() - 12, 0)  # output prefix and margins
+
+    def get_max_input_height(self) -> int:
+        """The height of the inputs taller than the screen, in edit mode."""
+        if self.app is None:
+            return sys.maxsize
+        return max(self.app.renderer.output.get_size().rows - 4, 1)  # bars, frame
+
+    def schedule_layout_update(self):
+        """
+        Update the layout after layout_delay, once for all the changes until then
+        (e.g. typing new lines).
+        """
+        if self.app is None or self.layout_update_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # not running, e.g. driven from a test
+            self.update_layout_now()
+        else:
+            self.layout_update_handle = loop.call_later(
+                self.layout_delay, self.update_layout_now
+            )
+
+    def update_layout_now(self):
+        if self.layout_update_handle is not None:
+            self.layout_update_handle.cancel()
+            self.layout_update_handle = None
+        if self.app:
+            self.focus(self.current_cell_idx, update_layout=True)
+            self.app.invalidate()
+
+    def check_width(self, _=None):
+        """Render the built cells again if the terminal was resized."""
+        width = self.get_width()
+        if width == self.width:
+            return
+        self.width = width
+        if self.saved_renders is not None:
+            self.saved_renders.width = self.console.width
+        for cell in self.built_cells:
+            cell.update_output()
+            if not (self.edit_mode and cell is self.current_cell):
+                cell.set_input_readonly()
+        self.focus(self.current_cell_idx, update_layout=True)
+
+    def build_cells(self, start_idx: int, end_idx: int) -> bool:
+        """
+        Build the cells from start_idx to end_idx (included), return True if any was
+        built, i.e. if their heights might have changed.
+        """
+        built = False
+        for cell in self.cells[start_idx : end_idx + 1]:  # noqa
+            if not cell.built:
+                cell.build()
+                built = True
+        return built
+
     def update_visible_cells(self, idx: int, no_change: bool) -> bool:
         self.app = cast(Application, self.app)
         size = self.app.renderer.output.get_size()
@@ -231,14 +646,20 @@ class Notebook(Help, Format, KeyBindings):
             self.top_cell_idx,
             self.bottom_cell_idx,
         )
+        top_cell_idx = self.top_cell_idx
         while True:
             (
                 self.top_cell_idx,
                 self.bottom_cell_idx,
-            ) = self.get_visible_cell_idx_from_top(self.top_cell_idx, available_height)
+            ) = self.get_visible_cell_idx_from_top(top_cell_idx, available_height)
             if self.top_cell_idx <= idx <= self.bottom_cell_idx:
                 break
-            self.top_cell_idx += 1
+            # first top cell from which idx is visible
+            total = self.heights.prefix_sum(idx) - available_height
+            if total >= 0:
+                top_cell_idx = max(top_cell_idx + 1, self.heights.find(total) + 1)
+            else:
+                top_cell_idx += 1
         return not (
             self.top_cell_idx == top_cell_idx_keep
             and self.bottom_cell_idx == bottom_cell_idx_keep
@@ -247,26 +668,28 @@ class Notebook(Help, Format, KeyBindings):
     def get_visible_cell_idx_from_top(
         self, idx: int, available_height: int
     ) -> Tuple[int, int]:
-        cell_nb = -1
-        for cell in self.cells[idx:]:
-            available_height -= cell.get_height()
-            cell_nb += 1
-            if available_height <= 0:
+        while True:
+            # bottom cell is the first one filling the available height
+            total = self.heights.prefix_sum(idx) + available_height
+            bottom_idx = max(
+                idx, min(self.heights.find(total - 1), len(self.cells) - 1)
+            )
+            if not self.build_cells(idx, bottom_idx):
                 break
         # bottom cell may be clipped by ScrollablePane
-        return idx, idx + cell_nb
+        return idx, bottom_idx
 
     def get_visible_cell_idx_from_bottom(
         self, idx: int, available_height: int
     ) -> Tuple[int, int]:
-        cell_nb = -1
-        for cell in self.cells[idx::-1]:
-            available_height -= cell.get_height()
-            cell_nb += 1
-            if available_height <= 0:
+        while True:
+            # top cell is the first one filling the available height
+            total = self.heights.prefix_sum(idx + 1) - available_height
+            top_idx = min(idx, self.heights.find(total))
+            if not self.build_cells(top_idx, idx):
                 break
         # top cell may be clipped by ScrollablePane
-        return idx - cell_nb, idx
+        return top_idx, idx
 
     def exit_cell(self):
         self.edit_mode = False
@@ -281,46 +704,127 @@ class Notebook(Help, Format, KeyBindings):
         idx = self.current_cell_idx
         if idx > 0:
             self.dirty = True
-            self.cells[idx - 1], self.cells[idx] = self.cells[idx], self.cells[idx - 1]
+            self.swap_cells(idx - 1)
+            self.record(CellSwap(idx - 1, down=False))
             self.focus(idx - 1, update_layout=True)
 
     def move_down(self):
         idx = self.current_cell_idx
         if idx < len(self.cells) - 1:
             self.dirty = True
-            self.cells[idx], self.cells[idx + 1] = self.cells[idx + 1], self.cells[idx]
+            self.swap_cells(idx)
+            self.record(CellSwap(idx, down=True))
             self.focus(idx + 1, update_layout=True)
 
     def clear_output(self):
-        self.current_cell.clear_output()
+        with self.record_json(self.current_cell):
+            self.current_cell.clear_output()
 
     def markdown_cell(self):
-        self.current_cell.set_as_markdown()
+        with self.record_json(self.current_cell):
+            self.current_cell.set_as_markdown()
 
     def code_cell(self):
-        self.current_cell.set_as_code()
+        with self.record_json(self.current_cell):
+            self.current_cell.set_as_code()
 
     def raw_cell(self):
-        self.current_cell.set_as_raw()
+        with self.record_json(self.current_cell):
+            self.current_cell.set_as_raw()
 
-    async def queue_run_cell(self, and_select_below: bool = False):
+    def queue_run_cell(self, and_select_below: bool = False):
         if self.kd:
             cell = self.current_cell
             if and_select_below:
                 if self.current_cell_idx == len(self.cells) - 1:
                     self.insert_cell(self.current_cell_idx + 1)
                 self.focus(self.current_cell_idx + 1)
-            await cell.run()
+            self.queue_cells([cell])
+
+    def queue_run_all(self):
+        self.queue_cells(self.cells)
+
+    def queue_run_above(self):
+        self.queue_cells(self.cells[: self.current_cell_idx])  # noqa
+
+    def queue_run_below(self):
+        self.queue_cells(self.cells[self.current_cell_idx :])  # noqa
+
+    def queue_cells(self, cells: List[Cell]):
+        """
+        Queue cells to be run one after the other, without waiting for them. The
+        cells already queued are not queued again.
+        """
+        if not self.kd:
+            return
+        for cell in cells:
+            if cell.json["cell_type"] == "code" and cell not in self.run_queue:
+                self.run_queue[cell] = time.time()
+                cell.set_input_prefix("*")
+        if self.run_task is None and self.run_queue:
+            self.run_task = asyncio.create_task(self.process_run_queue())
+        if self.app:
+            self.app.invalidate()
+
+    async def process_run_queue(self):
+        try:
+            while self.run_queue:
+                cell, queued = self.run_queue.popitem(last=False)
+                await cell.run(queued)
+                # e.g. an empty cell, which is not executed
+                cell.set_input_prefix(cell.json["execution_count"] or " ")
+                outputs = cell.json.get("outputs", [])
+                if any(output["output_type"] == "error" for output in outputs):
+                    # the next cells probably depend on this one
+                    self.cancel_run_queue()
+        finally:
+            self.run_task = None
+
+    def cancel_run_queue(self):
+        """Remove the cells waiting to be run from the queue."""
+        while self.run_queue:
+            cell, _ = self.run_queue.popitem(last=False)
+            cell.set_input_prefix(cell.json["execution_count"] or " ")
+        if self.app:
+            self.app.invalidate()
+
+    def interrupt_kernel(self):
+        """Cancel the cells waiting to be run, and interrupt the executing one."""
+        self.cancel_run_queue()
+        if self.executing_cells and hasattr(self.kd, "kernel_process"):
+            self.kd.kernel_process.send_signal(signal.SIGINT)
+
+    def add_cell(self, idx: int, cell: Cell):
+        self.cells.insert(idx, cell)
+        self.search_index.add(cell)
+        self.heights.reset(self.cells)
+
+    def remove_cell(self, idx: int) -> Cell:
+        cell = self.cells.pop(idx)
+        self.run_queue.pop(cell, None)
+        cell.release()
+        self.built_cells.pop(cell, None)
+        self.search_index.remove(cell)
+        self.heights.reset(self.cells)
+        return cell
+
+    def swap_cells(self, idx: int):
+        """Swap the cells at idx and idx + 1."""
+        self.cells[idx], self.cells[idx + 1] = self.cells[idx + 1], self.cells[idx]
+        self.heights.swap(idx, idx + 1)
 
     def cut_cell(self, idx: Optional[int] = None):
         self.dirty = True
         if idx is None:
             idx = self.current_cell_idx
-        self.copied_cell = self.cells.pop(idx)
+        self.copied_cell = self.remove_cell(idx)
+        operations = [CellInsertion(idx, self.copied_cell, inserted=False)]
         if not self.cells:
-            self.cells = [Cell(self)]
+            self.add_cell(0, Cell(self))
+            operations.append(CellInsertion(0, self.cells[0]))
         elif idx == len(self.cells):
             idx -= 1
+        self.record(*operations)
         self.focus(idx, update_layout=True)
 
     def copy_cell(self, idx: Optional[int] = None):
@@ -335,74 +839,118 @@ class Notebook(Help, Format, KeyBindings):
             if idx is None:
                 idx = self.current_cell_idx + below
             pasted_cell = self.copied_cell.copy()
-            self.cells.insert(idx, pasted_cell)
+            self.add_cell(idx, pasted_cell)
+            self.record(CellInsertion(idx, pasted_cell))
             self.focus(idx, update_layout=True)
 
     def insert_cell(self, idx: Optional[int] = None, below=False):
         self.dirty = True
         if idx is None:
             idx = self.current_cell_idx + below
-        self.cells.insert(idx, Cell(self))
+        self.add_cell(idx, Cell(self))
+        self.record(CellInsertion(idx, self.cells[idx]))
         self.focus(idx, update_layout=True)
 
-    def output_hook(self, msg: Dict[str, Any]):
-        msg_id = msg["parent_header"]["msg_id"]
-        execution_count = self.msg_id_2_execution_count[msg_id]
-        msg_type = msg["header"]["msg_type"]
-        content = msg["content"]
-        outputs = self.executing_cells[execution_count].json["outputs"]
-        if msg_type == "stream":
-            if (not outputs) or (outputs[-1]["name"] != content["name"]):
-                outputs.append(
-                    {"name": content["name"], "output_type": msg_type, "text": []}
-                )
-            outputs[-1]["text"].append(content["text"])
-        elif msg_type in ("display_data", "execute_result"):
-            outputs.append(
-                {
-                    "data": {"text/plain": [content["data"].get("text/plain", "")]},
-                    "execution_count": execution_count,
-                    "metadata": {},
-                    "output_type": msg_type,
-                }
-            )
-            text = rich_print(f"Out[{execution_count}]:", style="red", end="")
-            self.executing_cells[
-                execution_count
-            ].output_prefix.content = FormattedTextControl(text=ANSI(text))
-        elif msg_type == "error":
-            outputs.append(
-                {
-                    "ename": content["ename"],
-                    "evalue": content["evalue"],
-                    "output_type": "error",
-                    "traceback": content["traceback"],
-                }
-            )
-        else:
+    def on_execution_event(self, event: str, execution: Execution):
+        cell = self.executing_cells.get(id(execution.cell_json))
+        if cell is None:
             return
-        text, height = get_output_text_and_height(outputs)
-        self.executing_cells[execution_count].output.content = FormattedTextControl(
-            text=text
-        )
-        height_keep = self.executing_cells[execution_count].output.height
-        self.executing_cells[execution_count].output.height = height
-        if self.app and height_keep != height:
-            # height has changed
-            self.focus(self.current_cell_idx, update_layout=True)
+        if event in ("start", "output"):
+            self.search_index.outputs.add(cell)
+            self.autosave_journal.mark(cell)
+        if event == "start":
+            cell.output_buffer = execution.outputs
+            cell.timing = execution.timing
+            cell.set_input_prefix("*")
+        elif event == "output":
+            cell.json_parts = None
+            if self.app is None:
+                # no need to render the outputs
+                return
+            if cell.built and "execution_count" in cell.json["outputs"][-1]:
+                text = rich_print(
+                    f"Out[{execution.execution_count}]:", style="red", end=""
+                )
+                cell.output_prefix.content = FormattedTextControl(text=ANSI(text))
+            # coalesce the outputs until the next frame
+            self.pending_output_cells.add(cell)
+            if self.output_flush_handle is None:
+                self.output_flush_handle = asyncio.get_event_loop().call_later(
+                    1 / self.output_rate, self.flush_outputs
+                )
+        elif event == "done":
+            cell.set_input_prefix(execution.execution_count)
+            if self.app:
+                # don't wait for the next frame to show the final output
+                self.pending_output_cells.add(cell)
+                self.flush_outputs()
+
+    def flush_outputs(self):
+        """Render the outputs that changed since the last frame."""
+        if self.output_flush_handle is not None:
+            self.output_flush_handle.cancel()
+            self.output_flush_handle = None
+        height_changed = False
+        for cell in self.pending_output_cells:
+            t0 = time.perf_counter()
+            height_changed |= cell.update_output()
+            if cell.timing is not None:
+                cell.timing.render_time += time.perf_counter() - t0
+        self.pending_output_cells.clear()
+        if self.app:
+            if height_changed:
+                self.focus(self.current_cell_idx, update_layout=True)
             self.app.invalidate()
 
     async def _show(self):
-        if self.kd:
-            asyncio.create_task(self.kd.start())
+        asyncio.create_task(self.load_remaining_cells())
+        if self.autosave_interval:
+            asyncio.create_task(self.autosave_loop())
         await self.app.run_async()
 
+    async def load_remaining_cells(self):
+        """Load the cells in the background, then start the kernel."""
+        while self.nb_reader is not None:
+            cell_nb = len(self.cells)
+            self.load_cells(self.load_batch_size)
+            if self.app:
+                if self.bottom_cell_idx >= cell_nb - 1:
+                    # the new cells may be visible
+                    self.focus(self.current_cell_idx, update_layout=True)
+                self.app.invalidate()
+            await asyncio.sleep(0)
+        if self.kd:
+            await self.start_kernel()
+
+    def save_renders(self) -> int:
+        """Save the renders of the inputs of the cells, return how many."""
+        if self.saved_renders is None or self.nb_reader is not None:
+            # not all the cells are read, the saved renders of the others are kept
+            return 0
+        width = self.console.width
+        keys = (
+            get_render_key(
+                cell.source, cell.json["cell_type"], self.lexer_language, width
+            )
+            for cell in self.cells
+            if cell.json["cell_type"] in ("markdown", "code")
+        )
+        return self.saved_renders.save(keys)
+
     async def exit(self):
         if self.dirty and not self.quitting:
             self.quitting = True
             return
-        if self.kd:
-            await self.kd.stop()
+        self.cancel_run_queue()
+        if self.autosave_interval:
+            if self.dirty:
+                # the changes not saved can be recovered
+                self.flush_autosave()
+            else:
+                remove_autosave(self.nb_path)
+        self.save_renders()
+        # the kernel may not be started yet
+        await self.stop_kernel()
         self.app.exit()
 
     def go_up(self):
@@ -0,0 +1,214 @@
+import json
+import tempfile
+from typing import Dict, List, Any, Optional, Tuple
+
+
+def get_raw_output_text(output: Dict[str, Any]) -> Optional[str]:
+    if output["output_type"] == "stream":
+        return "".join(output["text"])
+    if output["output_type"] == "error":
+        return "\n".join(output["traceback"])
+    if output["output_type"] == "execute_result":
+        return "\n".join(output["data"].get("text/plain", ""))
+    return None
+
+
+def get_size(text: str) -> Tuple[int, int]:
+    return text.count("\n"), len(text.encode())
+
+
+def split_outputs(outputs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Split the stream outputs in one output per line."""
+    pieces = []
+    for output in outputs:
+        if output["output_type"] == "stream":
+            for line in "".join(output["text"]).splitlines(keepends=True):
+                pieces.append(
+                    {"name": output["name"], "output_type": "stream", "text": [line]}
+                )
+        else:
+            pieces.append(output)
+    return pieces
+
+
+def merge_outputs(outputs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Merge consecutive stream outputs of the same name."""
+    merged: List[Dict[str, Any]] = []
+    for output in outputs:
+        if (
+            output["output_type"] == "stream"
+            and merged
+            and merged[-1]["output_type"] == "stream"
+            and merged[-1]["name"] == output["name"]
+        ):
+            merged[-1]["text"].extend(output["text"])
+        elif output["output_type"] == "stream":
+            merged.append(dict(output, text=list(output["text"])))
+        else:
+            merged.append(output)
+    return merged
+
+
+def cut_line(text: str, max_bytes: int, last: bool) -> Tuple[str, str]:
+    """Cut a line in its first (or last) max_bytes and the rest."""
+    data = text.encode()
+    if last:
+        kept = data[len(data) - max_bytes :].decode(errors="ignore")  # noqa
+        return kept, data[: len(data) - len(kept.encode())].decode()
+    kept = data[:max_bytes].decode(errors="ignore")
+    return kept, data[len(kept.encode()) :].decode()  # noqa
+
+
+def take_outputs(
+    pieces: List[Dict[str, Any]], max_lines: int, max_bytes: int, last: bool = False
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Take the first (or last) pieces that fit in max_lines and max_bytes, return
+    them and the remaining pieces. A stream line too long to fit is cut.
+    """
+    if last:
+        pieces = pieces[::-1]
+    taken, remaining = pieces, []
+    line_nb = byte_nb = 0
+    for i, piece in enumerate(pieces):
+        lines, bytes_ = get_size(get_raw_output_text(piece) or "")
+        if line_nb + lines > max_lines or byte_nb + bytes_ > max_bytes:
+            taken, remaining = pieces[:i], pieces[i:]
+            if piece["output_type"] == "stream" and line_nb + lines <= max_lines:
+                kept, rest = cut_line(piece["text"][0], max_bytes - byte_nb, last)
+                if kept:
+                    taken = taken + [dict(piece, text=[kept])]
+                    remaining = [dict(piece, text=[rest])] + remaining[1:]
+            break
+        line_nb += lines
+        byte_nb += bytes_
+    if last:
+        return taken[::-1], remaining[::-1]
+    return taken, remaining
+
+
+class OutputBuffer:
+    """
+    Outputs of a cell being executed, bounded in lines and bytes.
+
+    Past the limits, the first and the last outputs are kept (within half of the
+    limits each), and the ones in between are replaced with a marker. They can be
+    spilled to a (JSON lines) file, from which the full outputs can be recovered.
+    """
+
+    cell_json: Dict[str, Any]
+    max_lines: int
+    max_bytes: int
+    spill: bool
+    spill_path: Optional[str]
+    line_nb: int
+    byte_nb: int
+    head: Optional[List[Dict[str, Any]]]
+    marker: Optional[Dict[str, Any]]
+    elided_line_nb: int
+    elided_byte_nb: int
+
+    def __init__(
+        self,
+        cell_json: Dict[str, Any],
+        max_lines: int,
+        max_bytes: int,
+        spill: bool = False,
+    ):
+        self.cell_json = cell_json
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self.spill = spill
+        self.spill_path = None
+        # size of the outputs, or of the last outputs once some are elided
+        self.line_nb = 0
+        self.byte_nb = 0
+        self.head = None
+        self.marker = None
+        self.elided_line_nb = 0
+        self.elided_byte_nb = 0
+
+    @property
+    def outputs(self) -> List[Dict[str, Any]]:
+        return self.cell_json["outputs"]
+
+    @property
+    def truncated(self) -> bool:
+        return self.marker is not None
+
+    def append_stream(self, name: str, text: str) -> None:
+        outputs = self.outputs
+        if not outputs or outputs[-1] is self.marker or outputs[-1].get("name") != name:
+            outputs.append({"name": name, "output_type": "stream", "text": []})
+        outputs[-1]["text"].append(text)
+        self.grow(text)
+
+    def append(self, output: Dict[str, Any]) -> None:
+        self.outputs.append(output)
+        self.grow(get_raw_output_text(output) or "")
+
+    def grow(self, text: str) -> None:
+        lines, bytes_ = get_size(text)
+        self.line_nb += lines
+        self.byte_nb += bytes_
+        if self.marker is None:
+            max_lines, max_bytes = self.max_lines, self.max_bytes
+        else:
+            # let the last outputs grow by half before eliding again, so that the
+            # cost of compacting them is amortized
+            max_lines = (self.max_lines - self.max_lines // 2) * 3 // 2
+            max_bytes = (self.max_bytes - self.max_bytes // 2) * 3 // 2
+        if self.line_nb > max_lines or self.byte_nb > max_bytes:
+            self.compact()
+
+    def compact(self) -> None:
+        if self.head is None:
+            self.head, pieces = take_outputs(
+                split_outputs(self.outputs), self.max_lines // 2, self.max_bytes // 2
+            )
+            self.head = merge_outputs(self.head)
+        else:
+            pieces = split_outputs(self.outputs[len(self.head) + 1 :])  # noqa
+        tail, elided = take_outputs(
+            pieces,
+            self.max_lines - self.max_lines // 2,
+            self.max_bytes - self.max_bytes // 2,
+            last=True,
+        )
+        tail, elided = merge_outputs(tail), merge_outputs(elided)
+        for output in elided:
+            lines, bytes_ = get_size(get_raw_output_text(output) or "")
+            self.elided_line_nb += lines
+            self.elided_byte_nb += bytes_
+        if self.spill:
+            if self.spill_path is None:
+                with tempfile.NamedTemporaryFile(
+                    prefix="nbterm-", suffix=".jsonl", delete=False
+                ) as f:
+                    self.spill_path = f.name
+            with open(self.spill_path, "at") as f:
+                for output in elided:
+                    f.write(json.dumps(output) + "\n")
+        text = f"... {self.elided_line_nb} lines ({self.elided_byte_nb} bytes) elided"
+        if self.spill_path is not None:
+            text += f", full output in {self.spill_path}"
+        text += " ...\n"
+        # a new list, so that it is rendered again
+        self.marker = {"name": "stdout", "output_type": "stream", "text": [text]}
+        self.cell_json["outputs"] = self.head + [self.marker] + tail
+        self.line_nb = self.byte_nb = 0
+        for output in tail:
+            lines, bytes_ = get_size(get_raw_output_text(output) or "")
+            self.line_nb += lines
+            self.byte_nb += bytes_
+
+    def get_full_outputs(self) -> List[Dict[str, Any]]:
+        """The outputs, including the elided ones if they were spilled."""
+        if self.head is None or self.spill_path is None:
+            return self.outputs
+        outputs = list(self.head)
+        with open(self.spill_path) as f:
+            for line in f:
+                outputs.append(json.loads(line))
+        outputs.extend(self.outputs[len(self.head) + 1 :])  # noqa
+        return merge_outputs(outputs)
@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+from typing import Dict, Any
+
+
+class LazyPayload:
+    """
+    An output payload stored out of line, in a PayloadSpool. It is only loaded
+    when needed (e.g. when saved), and it is shared (not duplicated) by copies.
+    """
+
+    def __init__(self, spool: "PayloadSpool", offset: int, size: int, is_str: bool):
+        self.spool = spool
+        self.offset = offset
+        self.size = size
+        self.is_str = is_str
+
+    def load(self) -> Any:
+        data = os.pread(self.spool.file.fileno(), self.size, self.offset)
+        if self.is_str:
+            return data.decode()
+        return json.loads(data)
+
+    def __copy__(self) -> "LazyPayload":
+        return self
+
+    def __deepcopy__(self, memo) -> "LazyPayload":
+        return self
+
+
+def json_default(obj: Any) -> Any:
+    """Load the lazy payloads when serializing them (see json.dump)."""
+    if isinstance(obj, LazyPayload):
+        return obj.load()
+    raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
+
+
+class PayloadSpool:
+    """
+    A temporary file where the large output payloads (e.g. images) of a notebook
+    are stored, instead of in memory.
+    """
+
+    min_size: int
+    size: int
+
+    def __init__(self, min_size: int = 64 * 1024):
+        self.min_size = min_size
+        self.file = tempfile.TemporaryFile()
+        self.size = 0
+
+    def store(self, value: Any) -> LazyPayload:
+        # strings (e.g. base64) are stored as is, other values as JSON
+        is_str = isinstance(value, str)
+        data = value.encode() if is_str else json.dumps(value).encode()
+        os.pwrite(self.file.fileno(), data, self.size)
+        payload = LazyPayload(self, self.size, len(data), is_str)
+        self.size += len(data)
+        return payload
+
+    def store_outputs(self, cell_json: Dict[str, Any]) -> None:
+        """Store the large payloads of the outputs of a cell out of line."""
+        for output in cell_json.get("outputs", []):
+            data = output.get("data", {})
+            for mime_type, value in data.items():
+                # text/plain is what is rendered
+                if mime_type == "text/plain" or isinstance(value, LazyPayload):
+                    continue
+                if isinstance(value, str):
+                    size = len(value)
+                elif isinstance(value, list):
+                    size = sum(len(line) for line in value)
+                else:
+                    continue
+                if size >= self.min_size:
+                    data[mime_type] = self.store(value)
@@ -0,0 +1,149 @@
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Any, Optional, Tuple
+
+
+def to_iso(timestamp: float) -> str:
+    date = datetime.fromtimestamp(timestamp, timezone.utc)
+    return date.isoformat().replace("+00:00", "Z")
+
+
+def from_iso(text: str) -> float:
+    return datetime.fromisoformat(text.replace("Z", "+00:00")).timestamp()
+
+
+def format_duration(seconds: float) -> str:
+    if seconds < 0.01:
+        return f"{seconds * 1000:.1f}ms"
+    if seconds < 1:
+        return f"{seconds * 1000:.0f}ms"
+    if seconds < 60:
+        return f"{seconds:.2f}s"
+    minutes, seconds = divmod(seconds, 60)
+    return f"{minutes:.0f}m{seconds:02.0f}s"
+
+
+def format_size(size: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f}{unit}"
+        size //= 1024
+    return f"{size}GB"
+
+
+class Timing:
+    """
+    The timing of the execution of a cell: when it was queued, when the kernel
+    became busy, received the code and became idle again, and when its reply was
+    received (time.time() in nbterm). Also the IOPub messages of the execution
+    (the size of their content is the size of the text they carry), and the time
+    nbterm spent handling them and rendering the outputs.
+    """
+
+    queued: float
+    busy: Optional[float]
+    execute_input: Optional[float]
+    idle: Optional[float]
+    reply: Optional[float]
+    message_nb: int
+    message_bytes: int
+    handling_time: float
+    render_time: float
+
+    def __init__(self, queued: Optional[float] = None):
+        self.queued = queued or time.time()
+        self.busy = None
+        self.execute_input = None
+        self.idle = None
+        self.reply = None
+        self.message_nb = 0
+        self.message_bytes = 0
+        self.handling_time = 0
+        self.render_time = 0
+
+    @property
+    def queue_time(self) -> float:
+        return (self.busy or self.queued) - self.queued
+
+    @property
+    def run_time(self) -> Optional[float]:
+        """The wall time of the execution in the kernel."""
+        if self.busy is None:
+            return None
+        end = self.idle or self.reply
+        if end is None:
+            return None
+        return end - self.busy
+
+    def to_metadata(self) -> Dict[str, str]:
+        """
+        The "execution" cell metadata, as recorded by JupyterLab with its
+        "recordTiming" setting.
+        """
+        metadata = {}
+        for key, timestamp in (
+            ("iopub.status.busy", self.busy),
+            ("iopub.execute_input", self.execute_input),
+            ("iopub.status.idle", self.idle),
+            ("shell.execute_reply", self.reply),
+        ):
+            if timestamp is not None:
+                metadata[key] = to_iso(timestamp)
+        return metadata
+
+
+def get_run_time(cell_json: Dict[str, Any]) -> Optional[float]:
+    """The wall time of the last execution of a cell, from its metadata."""
+    execution = cell_json.get("metadata", {}).get("execution", {})
+    try:
+        busy = from_iso(execution["iopub.status.busy"])
+        end = execution.get("iopub.status.idle") or execution["shell.execute_reply"]
+        return from_iso(end) - busy
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class Profile:
+    """The time nbterm spent in each phase of its work (loading, saving...)."""
+
+    phases: Dict[str, float]
+
+    def __init__(self):
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            self.phases[name] = self.phases.get(name, 0) + elapsed
+
+
+def iter_profile_report(
+    profile: Profile, timings: List[Tuple[int, Timing]], top: int = 10
+) -> Iterator[str]:
+    """
+    The slowest cells (by index in the notebook), and the time spent by nbterm
+    itself.
+    """
+    ran = [(i, timing) for i, timing in timings if timing.run_time is not None]
+    ran.sort(key=lambda item: item[1].run_time or 0, reverse=True)
+    yield f"Slowest cells ({min(top, len(ran))} of {len(ran)}):"
+    yield f"{'cell':>6} {'run':>9} {'queued':>9} {'messages':>9} {'size':>7}"
+    for i, timing in ran[:top]:
+        yield (
+            f"{i + 1:>6} {format_duration(timing.run_time or 0):>9} "
+            f"{format_duration(timing.queue_time):>9} {timing.message_nb:>9} "
+            f"{format_size(timing.message_bytes):>7}"
+        )
+    phases = dict(profile.phases)
+    phases["message handling"] = sum(timing.handling_time for _, timing in timings)
+    phases["rendering"] = sum(timing.render_time for _, timing in timings)
+    kernel_time = sum(timing.run_time or 0 for _, timing in ran)
+    yield f"Kernel execution: {format_duration(kernel_time)}"
+    yield "nbterm:"
+    for name, elapsed in phases.items():
+        yield f"  {name + ':':<18} {format_duration(elapsed):>9}"
@@ -0,0 +1,214 @@
+import hashlib
+import importlib.util
+import json
+import os
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+from ._version import __version__
+
+# changes when the format of the saved renders changes
+SAVED_RENDERS_VERSION = 1
+
+
+class RenderCache:
+    """
+    Rendered text, keyed on what it was rendered from, evicting the least recently
+    used entries past maxsize. Hits and misses are counted.
+    """
+
+    entries: "OrderedDict[Hashable, str]"
+    maxsize: int
+    hits: int
+    misses: int
+
+    def __init__(self, maxsize: int = 1024):
+        self.entries = OrderedDict()
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: Hashable) -> Optional[str]:
+        text = self.entries.get(key)
+        if text is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return text
+
+    def set(self, key: Hashable, text: str) -> None:
+        self.entries[key] = text
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+def get_input_key(
+    source: str, cell_type: str, language: str, width: int
+) -> Tuple[str, str, str, int]:
+    source_hash = hashlib.sha1(source.encode()).hexdigest()
+    return source_hash, cell_type, language, width
+
+
+def get_saved_renders_directory() -> Path:
+    cache_dir = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_dir) / "nbterm" / "renders"
+
+
+def get_installed_time(package: str) -> Optional[int]:
+    """When a package was installed, without importing it (pygments is imported lazily)."""
+    spec = importlib.util.find_spec(package)
+    if spec is None or spec.origin is None:
+        return None
+    return os.stat(spec.origin).st_mtime_ns
+
+
+def get_render_context(color_system: Optional[str]) -> Dict[str, Any]:
+    """
+    What the rendering depends on but the cells, saved with the renders: they are
+    only valid if it did not change.
+    """
+    return {
+        "version": SAVED_RENDERS_VERSION,
+        "nbterm": __version__,
+        # rather than their versions, slow to get
+        "rich": get_installed_time("rich"),
+        "pygments": get_installed_time("pygments"),
+        "color_system": color_system,
+    }
+
+
+def get_saved_key(key: Tuple[str, str, str, int]) -> str:
+    return ":".join(map(str, key))
+
+
+class SavedRenders:
+    """
+    The rendered inputs of the cells of a notebook, saved between sessions in a file
+    of the cache directory named after the path of the notebook, keyed like the
+    in-memory cache (see get_input_key). They are discarded if the file was written
+    with another rendering context (see get_render_context), and an entry is only
+    used if its height (saved with it) matches its text.
+
+    Only the entries of the cells of the notebook are saved, up to max_size bytes,
+    and past max_total_size bytes for all the notebooks, the files of the least
+    recently opened ones are evicted.
+    """
+
+    directory: Path
+    path: Path
+    context: Dict[str, Any]
+    entries: Dict[str, str]
+    width: int
+    max_size: int
+    max_total_size: int
+
+    def __init__(
+        self,
+        nb_path: Path,
+        color_system: Optional[str] = None,
+        width: int = 80,
+        directory: Optional[Path] = None,
+        max_size: int = 16 << 20,
+        max_total_size: int = 256 << 20,
+    ):
+        self.directory = directory or get_saved_renders_directory()
+        path_hash = hashlib.sha1(str(nb_path).encode()).hexdigest()
+        self.path = self.directory / f"{path_hash}.json"
+        self.context = get_render_context(color_system)
+        self.entries = {}
+        # the width the inputs are rendered at
+        self.width = width
+        self.max_size = max_size
+        self.max_total_size = max_total_size
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def load(self) -> int:
+        """Load the saved renders, return how many are valid."""
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+            # for the eviction
+            os.utime(self.path)
+        except (OSError, ValueError):
+            return 0
+        if not isinstance(saved, dict) or saved.get("context") != self.context:
+            return 0
+        for key, entry in saved.get("entries", {}).items():
+            if (
+                isinstance(entry, list)
+                and len(entry) == 2
+                and isinstance(entry[0], str)
+                and entry[0].count("\n") + 1 == entry[1]
+            ):
+                self.entries[key] = entry[0]
+        return len(self.entries)
+
+    def get(self, key: Tuple[str, str, str, int]) -> Optional[str]:
+        return self.entries.get(get_saved_key(key))
+
+    def set(self, key: Tuple[str, str, str, int], text: str) -> None:
+        self.entries[get_saved_key(key)] = text
+
+    def save(self, keys: Iterable[Tuple[str, str, str, int]]) -> int:
+        """Save the renders of keys (the ones of the cells), return how many."""
+        entries = {}
+        size = 0
+        for key in keys:
+            saved_key = get_saved_key(key)
+            text = self.entries.get(saved_key)
+            if text is None or saved_key in entries:
+                continue
+            size += len(saved_key) + len(text)
+            if size > self.max_size:
+                break
+            entries[saved_key] = [text, text.count("\n") + 1]
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # never leave the file half-written
+        fd, tmp_path = tempfile.mkstemp(
+            dir=self.directory, prefix=f".{self.path.name}."
+        )
+        try:
+            with os.fdopen(fd, "wt") as f:
+                json.dump({"context": self.context, "entries": entries}, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.evict()
+        return len(entries)
+
+    def evict(self) -> int:
+        """Evict the renders of the least recently opened notebooks, return how many."""
+        files = []
+        size = 0
+        for path in self.directory.glob("*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            size += stat.st_size
+        files.sort()
+        evicted = 0
+        for _, file_size, path in files:
+            if size <= self.max_total_size:
+                break
+            if path != self.path:
+                path.unlink()
+                size -= file_size
+                evicted += 1
+        return evicted
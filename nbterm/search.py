@@ -0,0 +1,276 @@
+import re
+from bisect import bisect_left, bisect_right
+from typing import Callable, Dict, FrozenSet, List, Optional, Pattern, Set, Tuple
+
+from prompt_toolkit.buffer import Buffer
+from prompt_toolkit.layout.containers import Window
+from prompt_toolkit.layout.controls import BufferControl
+from prompt_toolkit.layout.processors import BeforeInput
+
+from .cell import ANSI_ESCAPE, Cell
+from .height_index import HeightIndex
+from .output_buffer import get_raw_output_text
+
+WORD = re.compile(r"\w+")
+# the parts of a regular expression which may not be in a matching text as is:
+# escapes, sets, and optional or repeated characters
+REGEX_NOISE = re.compile(r"\\.|\[(?:\\.|[^\]])*\]|.?\{[\d,]*\}|.[?*]")
+
+
+def get_words(text: str) -> FrozenSet[str]:
+    return frozenset(WORD.findall(text.lower()))
+
+
+def get_source_text(cell: Cell) -> str:
+    return "".join(cell.json["source"])
+
+
+def get_output_text(cell: Cell) -> str:
+    texts = []
+    for output in cell.json.get("outputs", []):
+        text = get_raw_output_text(output)
+        if text is not None:
+            texts.append(ANSI_ESCAPE.sub("", text))
+    return "\n".join(texts)
+
+
+def get_required_words(query: str, regex: bool) -> List[Tuple[str, bool]]:
+    """
+    The words (in lower case) a text must have to match a query, and if they are
+    whole words of the text, or may only be parts of them. A regular expression
+    with an alternative or a group has none.
+    """
+    if regex:
+        query = REGEX_NOISE.sub(" ", query)
+        if re.search(r"[|()]", query):
+            return []
+        return [(word, False) for word in WORD.findall(query.lower())]
+    words = []
+    for match in WORD.finditer(query.lower()):
+        # the words at the edges of the query may continue in the text
+        whole = match.start() > 0 and match.end() < len(query)
+        words.append((match.group(), whole))
+    return words
+
+
+def compile_query(query: str, regex: bool) -> Pattern:
+    """Case-insensitive, unless the query has upper case letters."""
+    flags = 0 if query != query.lower() else re.IGNORECASE
+    return re.compile(query if regex else re.escape(query), flags)
+
+
+class WordIndex:
+    """
+    An inverted index of the words of a text of the cells (their source or their
+    outputs), from which the cells that may match a query are found without going
+    through all of them.
+
+    The cells are indexed lazily: the ones added or changed are only (re)indexed
+    when the index is next used, so that keeping it up to date costs nothing while
+    editing. Their texts are kept, to check the candidates quickly.
+    """
+
+    get_text: Callable[[Cell], str]
+    cells: Dict[str, Set[Cell]]
+    words: Dict[Cell, FrozenSet[str]]
+    texts: Dict[Cell, str]
+    stale: Set[Cell]
+
+    def __init__(self, get_text: Callable[[Cell], str]):
+        self.get_text = get_text
+        self.reset([])
+
+    def reset(self, cells: List[Cell]) -> None:
+        self.cells = {}
+        self.words = {}
+        self.texts = {}
+        self.stale = set(cells)
+
+    def add(self, cell: Cell) -> None:
+        """Take into account that a cell was added, or that its text changed."""
+        self.stale.add(cell)
+
+    def remove(self, cell: Cell) -> None:
+        self.stale.discard(cell)
+        self._remove_words(cell)
+
+    def _remove_words(self, cell: Cell) -> None:
+        self.texts.pop(cell, None)
+        for word in self.words.pop(cell, ()):
+            cells = self.cells[word]
+            cells.discard(cell)
+            if not cells:
+                del self.cells[word]
+
+    def refresh(self) -> None:
+        for cell in self.stale:
+            self._remove_words(cell)
+            text = self.texts[cell] = self.get_text(cell)
+            words = get_words(text)
+            self.words[cell] = words
+            for word in words:
+                self.cells.setdefault(word, set()).add(cell)
+        self.stale.clear()
+
+    def get_candidates(self, words: List[Tuple[str, bool]]) -> Optional[Set[Cell]]:
+        """The cells having all the words (None if there is no word)."""
+        self.refresh()
+        candidates: Optional[Set[Cell]] = None
+        # the most selective words first
+        for word, whole in sorted(words, key=lambda item: (not item[1], -len(item[0]))):
+            if whole:
+                cells = self.cells.get(word, set())
+            else:
+                cells = set()
+                for indexed_word, word_cells in self.cells.items():
+                    if word in indexed_word:
+                        cells |= word_cells
+            candidates = cells if candidates is None else candidates & cells
+            if not candidates:
+                break
+        return candidates
+
+
+class SearchIndex:
+    """The words of the sources of the cells, and of their outputs."""
+
+    sources: WordIndex
+    outputs: WordIndex
+
+    def __init__(self):
+        self.sources = WordIndex(get_source_text)
+        self.outputs = WordIndex(get_output_text)
+
+    def reset(self, cells: List[Cell]) -> None:
+        self.sources.reset(cells)
+        self.outputs.reset(cells)
+
+    def add(self, cell: Cell) -> None:
+        self.sources.add(cell)
+        self.outputs.add(cell)
+
+    def remove(self, cell: Cell) -> None:
+        self.sources.remove(cell)
+        self.outputs.remove(cell)
+
+    def find(
+        self,
+        cells: List[Cell],
+        positions: Dict[Cell, int],
+        query: str,
+        regex: bool = False,
+        outputs: bool = False,
+    ) -> List[int]:
+        """The sorted indices of the cells matching a query."""
+        pattern = compile_query(query, regex)
+        words = get_required_words(query, regex)
+        indexes = [self.sources, self.outputs] if outputs else [self.sources]
+        indices = []
+        for index in indexes:
+            candidates = index.get_candidates(words)
+            texts = index.texts
+            if candidates is None:
+                indices += [
+                    i
+                    for i, cell in enumerate(cells)
+                    if pattern.search(texts.get(cell, ""))
+                ]
+            else:
+                indices += [
+                    positions[cell]
+                    for cell in candidates
+                    if cell in positions and pattern.search(texts[cell])
+                ]
+        return sorted(set(indices))
+
+
+def get_next_match(matches: List[int], idx: int, backwards: bool = False) -> int:
+    """The match after (or before) the cell at index idx, wrapping around."""
+    if backwards:
+        i = bisect_left(matches, idx) - 1
+    else:
+        i = bisect_right(matches, idx) % len(matches)
+    return matches[i]
+
+
+class Search:
+    """Searching the cells, from a prompt replacing the bottom bar."""
+
+    cells: List[Cell]
+    heights: HeightIndex
+    current_cell_idx: int
+    search_index: SearchIndex
+    search_mode: bool
+    search_regex: bool
+    search_outputs: bool
+    search_query: str
+    search_message: str
+    search_buffer: Buffer
+    search_bar: Window
+
+    def create_search_bar(self) -> Window:
+        def get_prompt():
+            options = [
+                option
+                for option, enabled in (
+                    ("regex", self.search_regex),
+                    ("outputs", self.search_outputs),
+                )
+                if enabled
+            ]
+            return f"/({', '.join(options)}) " if options else "/"
+
+        self.search_buffer = Buffer(multiline=False)
+        self.search_bar = Window(
+            BufferControl(
+                self.search_buffer, input_processors=[BeforeInput(get_prompt)]
+            ),
+            height=1,
+            style="#ffffff bg:#444444",
+        )
+        return self.search_bar
+
+    def show_search(self):
+        self.search_mode = True
+        self.search_buffer.text = ""
+        self.app.layout.focus(self.search_bar)
+
+    def quit_search(self):
+        self.search_mode = False
+        self.focus(self.current_cell_idx)
+
+    def toggle_search_regex(self):
+        self.search_regex = not self.search_regex
+
+    def toggle_search_outputs(self):
+        self.search_outputs = not self.search_outputs
+
+    def search(self, query: Optional[str] = None, backwards: bool = False) -> bool:
+        """
+        Go to the next (or previous) cell matching a query (the last one if None),
+        return True if there is one.
+        """
+        if query is not None:
+            self.search_query = query
+        if not self.search_query:
+            return False
+        try:
+            matches = self.search_index.find(
+                self.cells,
+                self.heights.positions,
+                self.search_query,
+                self.search_regex,
+                self.search_outputs,
+            )
+        except re.error as e:
+            self.search_message = f"invalid regex: {e}"
+            return False
+        if not matches:
+            self.search_message = f"not found: {self.search_query}"
+            return False
+        idx = get_next_match(matches, self.current_cell_idx, backwards)
+        self.search_message = (
+            f"{self.search_query}: {matches.index(idx) + 1}/{len(matches)}"
+        )
+        self.focus(idx)  # type: ignore
+        return True
@@ -1,8 +1,13 @@
 import os
+import json
 import shutil
+from contextlib import contextmanager
 from pathlib import Path
 
 import pytest
+from prompt_toolkit.application.current import set_app
+from prompt_toolkit.input import create_pipe_input
+from prompt_toolkit.output import DummyOutput
 
 
 HERE = Path(__file__).resolve().parent
@@ -21,3 +26,68 @@ def tmp_dir():
 
 shutil.rmtree(TMP_DIR, ignore_errors=True)
 os.makedirs(TMP_DIR, exist_ok=True)
+
+
+@pytest.fixture
+def make_nb(tmp_dir):
+    def _make_nb(name, cell_nb, outputs=True):
+        cells = []
+        for i in range(cell_nb):
+            if i % 3 == 1:
+                cells.append(
+                    {
+                        "cell_type": "markdown",
+                        "metadata": {},
+                        "source": [f"## Section {i}\n", "Some *text*."],
+                    }
+                )
+            else:
+                cells.append(
+                    {
+                        "cell_type": "code",
+                        "execution_count": i if outputs else None,
+                        "metadata": {},
+                        "outputs": [
+                            {
+                                "name": "stdout",
+                                "output_type": "stream",
+                                "text": [f"{i}\n", f"{i + 1}\n"],
+                            }
+                        ]
+                        if outputs
+                        else [],
+                        "source": [f"x = {i}\n", "print(x)\n", "print(x + 1)"],
+                    }
+                )
+        nb_json = {
+            "cells": cells,
+            "metadata": {
+                "kernelspec": {
+                    "display_name": "Python 3",
+                    "language": "python",
+                    "name": "python3",
+                }
+            },
+            "nbformat": 4,
+            "nbformat_minor": 4,
+        }
+        nb_path = tmp_dir / name
+        with open(nb_path, "wt") as f:
+            json.dump(nb_json, f, indent=1)
+            f.write("\n")
+        return nb_path
+
+    return _make_nb
+
+
+@pytest.fixture
+def headless():
+    @contextmanager
+    def _headless(nb):
+        with create_pipe_input() as pipe_input:
+            nb.create_app(input=pipe_input, output=DummyOutput())
+            with set_app(nb.app):
+                yield nb.app
+            nb.app = None
+
+    return _headless
@@ -0,0 +1,91 @@
+import json
+
+from nbterm import Notebook
+from nbterm.autosave import dumps_records, get_autosave_path, read_autosave
+
+
+def get_cells(nb):
+    cells = []
+    for cell in nb.cells:
+        cell_json = dict(cell.json, source="".join(cell.json["source"]))
+        if cell.built:
+            cell_json["source"] = cell.source
+        cells.append(json.dumps(cell_json, sort_keys=True))
+    return cells
+
+
+def stream(text):
+    return {"name": "stdout", "output_type": "stream", "text": [text]}
+
+
+def test_autosave_recover(make_nb):
+    nb_path = make_nb("autosave.ipynb", 6)
+    nb = Notebook(nb_path, no_kernel=True, autosave_interval=5)
+    nb.flush_autosave()
+    # nothing to journal
+    assert not get_autosave_path(nb_path).exists()
+    nb.insert_cell(below=True)
+    nb.enter_cell()
+    nb.current_cell.input_buffer.text = "print(1)\nprint(2)"
+    nb.exit_cell()
+    nb.flush_autosave()
+    nb.cut_cell(3)
+    nb.focus(2)
+    nb.move_down()
+    nb.markdown_cell()
+    nb.focus(4)
+    nb.clear_output()
+    nb.flush_autosave()
+    # outputs appended while a cell runs
+    cell = nb.cells[0]
+    cell.json["outputs"] = outputs = [stream("a\n")]
+    cell.set_dirty()
+    nb.flush_autosave()
+    outputs[0]["text"].append("b\n")
+    outputs.append(stream("c\n"))
+    cell.set_dirty()
+    records = nb.get_autosave_records()
+    # only the output which grew and the new one
+    grown = {"name": "stdout", "output_type": "stream", "text": ["a\n", "b\n"]}
+    assert records == [{"op": "cell", "id": 0, "outputs": [0, [grown, stream("c\n")]]}]
+    nb.autosave_journal.write(dumps_records(records))
+    # being edited
+    nb.focus(5)
+    nb.enter_cell()
+    nb.current_cell.input_buffer.text = "x = 1"
+    nb.flush_autosave()
+    nb_recovered = Notebook(nb_path, no_kernel=True, recover=True)
+    assert get_cells(nb_recovered) == get_cells(nb)
+    assert nb_recovered.dirty
+    # the journal is continued
+    nb_recovered.insert_cell(0)
+    nb_recovered.cells[2].set_as_raw()
+    nb_recovered.flush_autosave()
+    nb_recovered2 = Notebook(nb_path, no_kernel=True, recover=True)
+    assert get_cells(nb_recovered2) == get_cells(nb_recovered)
+
+
+def test_autosave_compact(make_nb):
+    nb_path = make_nb("autosave_compact.ipynb", 3)
+    nb = Notebook(nb_path, no_kernel=True, autosave_interval=5)
+    nb.cut_cell()
+    nb.flush_autosave()
+    assert read_autosave(nb_path) is not None
+    # saved elsewhere, the journal is kept
+    nb.save(nb_path.with_name("autosave_compact_copy.ipynb"))
+    assert read_autosave(nb_path) is not None
+    nb.save()
+    assert not get_autosave_path(nb_path).exists()
+    nb.insert_cell()
+    nb.flush_autosave()
+    records = read_autosave(nb_path)
+    assert records[0] == {"op": "splice", "start": 0, "end": 0, "ids": [2]}
+    nb_recovered = Notebook(nb_path, no_kernel=True, recover=True)
+    assert get_cells(nb_recovered) == get_cells(nb)
+    # a record being written is ignored
+    with open(get_autosave_path(nb_path), "at") as f:
+        f.write('{"op": "splice", "sta')
+    assert read_autosave(nb_path) == records
+    # the notebook changed since the journal was started
+    nb_path.write_text(nb_path.read_text() + "\n")
+    assert read_autosave(nb_path) is None
@@ -0,0 +1,34 @@
+import asyncio
+import json
+import shutil
+
+from nbterm.batch import expand_paths, run_notebooks
+
+
+def test_run_notebooks(files, tmp_dir):
+    batch_dir = tmp_dir / "batch"
+    save_dir = batch_dir / "run"
+    save_dir.mkdir(parents=True)
+    for name in ("a", "b"):
+        shutil.copy(files / "original" / "nb0.ipynb", batch_dir / f"{name}.ipynb")
+    nb_json = json.loads((files / "original" / "nb0.ipynb").read_text())
+    nb_json["cells"][0]["source"] = ["1 / 0"]
+    (batch_dir / "c.ipynb").write_text(json.dumps(nb_json))
+    (batch_dir / "d.ipynb").write_text("not a notebook")
+
+    nb_paths = expand_paths([str(batch_dir / "*.ipynb")])
+    assert [nb_path.name for nb_path in nb_paths] == [
+        "a.ipynb",
+        "b.ipynb",
+        "c.ipynb",
+        "d.ipynb",
+    ]
+    reported = []
+    results = asyncio.run(
+        run_notebooks(nb_paths, 2, save_dir=save_dir, on_result=reported.append)
+    )
+    assert sorted(reported, key=lambda result: result.nb_path) == results
+    assert [result.status for result in results] == ["ok", "ok", "failed", "error"]
+    nb_ref = (files / "run" / "nb0.ipynb").read_text()
+    for name in ("a", "b"):
+        assert (save_dir / f"{name}_run.ipynb").read_text() == nb_ref
@@ -0,0 +1,71 @@
+import asyncio
+
+from nbterm import Notebook
+from nbterm.dag import get_names, schedule
+
+
+def code_cell(source, tags=None):
+    return {
+        "cell_type": "code",
+        "metadata": {"tags": tags} if tags else {},
+        "source": [source],
+    }
+
+
+def test_get_names():
+    source = (
+        "import numpy as np\n"
+        "df = load(path)\n"
+        "print(df)\n"
+        "data['a'] += 1\n"
+        "def f(x):\n"
+        "    global g\n"
+        "    g = [x + i for i in range(n)]\n"
+    )
+    uses, defines = get_names(source)
+    assert uses == {"load", "path", "print", "data", "range", "n"}
+    assert defines == {"np", "df", "data", "f", "g"}
+    assert get_names("%time x = 1") is None
+    assert get_names("from os import *") is None
+
+
+def test_schedule():
+    cells = [
+        code_cell("import math"),
+        {"cell_type": "markdown", "metadata": {}, "source": []},
+        code_cell("a = math.sqrt(2)"),
+        code_cell("b = math.sqrt(3)"),
+        code_cell("print(a)"),
+        code_cell("print(b)"),
+    ]
+    # the shared cells are run by each kernel, and the branches in parallel
+    assert schedule(cells, 2) == [[0, 2, 4], [0, 3, 5]]
+    assert schedule(cells, 1) == [[0, 2, 3, 4, 5]]
+    # a cell with magics depends on all the previous cells
+    assert schedule(cells + [code_cell("%time a + b")], 2) == [[0, 2, 3, 4, 5, 6]]
+    assert schedule(cells, 2, "cpp") == [[0, 2, 3, 4, 5]]
+    tagged = [
+        code_cell("x = 1"),
+        code_cell("a = x", ["branch:a"]),
+        code_cell("a += 1"),
+        code_cell("b = x", ["branch:b"]),
+        code_cell("print(b, a)"),
+    ]
+    assert schedule(tagged, 2) == [[0, 1, 2], [0, 3, 4]]
+
+
+def test_run_parallel(files, tmp_dir):
+    nb_path = files / "original" / "nb0.ipynb"
+    nb = Notebook(nb_path, kernel_cwd=nb_path.parent)
+
+    async def run_all():
+        try:
+            await nb.run_all(2)
+        finally:
+            await nb.stop_kernel()
+
+    asyncio.run(run_all())
+    nb_save_path = tmp_dir / "run_parallel.ipynb"
+    nb.save(nb_save_path)
+    # as if run on one kernel
+    assert nb_save_path.read_text() == (files / "run" / "nb0.ipynb").read_text()
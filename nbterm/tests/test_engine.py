@@ -0,0 +1,108 @@
+import asyncio
+
+from nbterm import Notebook
+from nbterm.engine import Engine
+from nbterm.kernel import dispatch_output
+from nbterm.profile import Profile, get_run_time, iter_profile_report
+
+
+def msg(msg_id, msg_type, content):
+    return {
+        "parent_header": {"msg_id": msg_id},
+        "header": {"msg_type": msg_type},
+        "content": content,
+    }
+
+
+class EchoKernelDriver:
+    """Prints the code, and returns it as a result."""
+
+    async def execute(self, code, msg_id=""):
+        await asyncio.sleep(0)
+        dispatch_output(msg(msg_id, "stream", {"name": "stdout", "text": code}))
+        dispatch_output(msg(msg_id, "status", {"execution_state": "idle"}))
+        dispatch_output(msg(msg_id, "execute_result", {"data": {"text/plain": code}}))
+
+
+def test_engine():
+    engine = Engine(EchoKernelDriver())
+    events = []
+    engine.subscribe(lambda event, execution: events.append((event, execution)))
+    cell_jsons = [{"cell_type": "code", "outputs": [1]} for _ in range(2)]
+
+    async def execute():
+        return await asyncio.gather(
+            *(
+                engine.execute(cell_json, f"x = {i}\n")
+                for i, cell_json in enumerate(cell_jsons)
+            )
+        )
+
+    executions = asyncio.run(execute())
+    for i, (cell_json, execution) in enumerate(zip(cell_jsons, executions)):
+        assert execution.cell_json is cell_json
+        assert cell_json["execution_count"] == execution.execution_count == i + 1
+        assert cell_json["outputs"] == [
+            {"name": "stdout", "output_type": "stream", "text": [f"x = {i}\n"]},
+            {
+                "data": {"text/plain": [f"x = {i}\n"]},
+                "execution_count": i + 1,
+                "metadata": {},
+                "output_type": "execute_result",
+            },
+        ]
+        assert [event for event, e in events if e is execution] == [
+            "start",
+            "output",
+            "output",
+            "done",
+        ]
+    assert engine.executions == {}
+
+
+def test_headless_run(files, make_nb, headless):
+    nb_path = make_nb("headless_run.ipynb", 3)
+    nb = Notebook(nb_path, kernel_cwd=nb_path.parent)
+    nb.kd = EchoKernelDriver()
+    asyncio.run(nb.run_cell(0))
+    # no UI to notify
+    assert nb.engine.subscribers == []
+    assert nb.cells[0].json["execution_count"] == 1
+    assert nb.cells[0].output_buffer.outputs == nb.cells[0].json["outputs"]
+    assert nb.cells[0].json_parts is None
+    with headless(nb):
+        assert nb.engine.subscribers == [nb.on_execution_event]
+        cell = nb.cells[0]
+        assert cell.built
+        asyncio.run(nb.run_cell(0))
+        # the final output is rendered without waiting for the next frame
+        assert "x = 0" in cell.output.content.text.value
+        # the unterminated last line is counted
+        assert cell.output_height == 5
+        assert "In [2]:" in cell.input_prefix.content.text.value
+        assert "Out[2]:" in cell.output_prefix.content.text.value
+
+
+def test_timing():
+    engine = Engine(EchoKernelDriver(), record_timing=True)
+    cell_json = {"cell_type": "code", "metadata": {"tags": ["a"]}, "outputs": []}
+    execution = asyncio.run(engine.execute(cell_json, "x = 1\n", queued=1))
+    timing = execution.timing
+    assert timing.queued == 1
+    assert timing.message_nb == 3
+    assert timing.message_bytes == 12
+    assert timing.busy is None and timing.idle is not None
+    assert timing.reply >= timing.idle
+    metadata = cell_json["metadata"]
+    assert metadata["tags"] == ["a"]
+    assert list(metadata["execution"]) == ["iopub.status.idle", "shell.execute_reply"]
+    # no busy status
+    assert get_run_time(cell_json) is None
+    metadata["execution"]["iopub.status.busy"] = "2021-01-01T00:00:00.000000Z"
+    metadata["execution"]["iopub.status.idle"] = "2021-01-01T00:00:01.500000Z"
+    assert get_run_time(cell_json) == 1.5
+    timing.busy = timing.idle - 2
+    report = list(iter_profile_report(Profile(), [(4, timing)]))
+    assert report[0] == "Slowest cells (1 of 1):"
+    assert report[2].split()[:2] == ["5", "2.00s"]
+    assert report[3] == "Kernel execution: 2.00s"
@@ -0,0 +1,63 @@
+import asyncio
+import json
+
+from nbterm import Notebook
+from nbterm.exec_cache import ExecutionCache
+
+
+def write_nb(nb_path, sources, files):
+    nb_json = json.loads((files / "original" / "nb0.ipynb").read_text())
+    nb_json["cells"] = [
+        {
+            "cell_type": "code",
+            "execution_count": None,
+            "metadata": {},
+            "outputs": [],
+            "source": [source],
+        }
+        for source in sources
+    ]
+    nb_path.write_text(json.dumps(nb_json))
+
+
+def run(nb_path, cache, **kwargs):
+    nb = Notebook(nb_path, kernel_cwd=nb_path.parent, execution_cache=cache, **kwargs)
+
+    async def run_all():
+        try:
+            await nb.run_all()
+        finally:
+            await nb.stop_kernel()
+
+    asyncio.run(run_all())
+    return nb
+
+
+def test_exec_cache(files, tmp_dir):
+    cache = ExecutionCache(tmp_dir / "cache")
+    nb_path = files / "original" / "nb0.ipynb"
+    nb_ref = (files / "run" / "nb0.ipynb").read_text()
+    for no_kernel in (False, True):
+        # the second time, the outputs are replayed without a kernel
+        nb = run(nb_path, cache, no_kernel=no_kernel)
+        nb.save(tmp_dir / "exec_cache.ipynb")
+        assert (tmp_dir / "exec_cache.ipynb").read_text() == nb_ref
+    assert cache.evict() == 0
+    assert ExecutionCache(cache.directory, max_size=0).evict() == 2
+    assert cache.clear() == 0
+
+
+def test_exec_cache_changed(files, tmp_dir):
+    cache = ExecutionCache(tmp_dir / "cache_changed")
+    nb_path = tmp_dir / "cache_changed.ipynb"
+    write_nb(nb_path, ["x = 1", "y = 2", "print(x)", "3"], files)
+    run(nb_path, cache)
+    write_nb(nb_path, ["x = 1", "y = 2", "print(x + 1)", "3"], files)
+    nb = run(nb_path, cache)
+    # only the changed cell, the next ones and the ones they depend on were run
+    assert nb.engine.execution_count == 3
+    assert nb.cells[1].json["outputs"] == []
+    assert nb.cells[2].json["outputs"][0]["text"] == ["2\n"]
+    assert [cell.json["execution_count"] for cell in nb.cells] == [1, 2, 3, 4]
+    assert nb.cells[3].json["outputs"][0]["execution_count"] == 4
+    assert cache.clear() == 6
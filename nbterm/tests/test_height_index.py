@@ -0,0 +1,35 @@
+import random
+
+from nbterm.height_index import HeightIndex
+
+
+class FakeCell:
+    def __init__(self, height):
+        self.height = height
+
+    def get_height(self):
+        return self.height
+
+
+def test_height_index():
+    random.seed(0)
+    cells = [FakeCell(random.randint(3, 20)) for _ in range(150)]
+    heights = HeightIndex(cells)
+    for _ in range(50):
+        cells.append(FakeCell(random.randint(3, 20)))
+        heights.append(cells[-1])
+    for _ in range(100):
+        cell = random.choice(cells)
+        cell.height = random.randint(3, 20)
+        heights.update(cell)
+    idx0, idx1 = 10, 150
+    cells[idx0], cells[idx1] = cells[idx1], cells[idx0]
+    heights.swap(idx0, idx1)
+    prefix_sums = [0]
+    for cell in cells:
+        prefix_sums.append(prefix_sums[-1] + cell.height)
+    for idx, prefix_sum in enumerate(prefix_sums):
+        assert heights.prefix_sum(idx) == prefix_sum
+    for total in range(-1, prefix_sums[-1] + 2):
+        expected = max([i for i, s in enumerate(prefix_sums) if s <= total] or [0])
+        assert heights.find(total) == expected
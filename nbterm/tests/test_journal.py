@@ -0,0 +1,115 @@
+import json
+
+from nbterm import Notebook
+
+
+def get_state(nb):
+    return [json.dumps(cell.json, sort_keys=True) for cell in nb.cells]
+
+
+def edit(nb, text):
+    nb.enter_cell()
+    nb.current_cell.input_buffer.text = text
+    nb.exit_cell()
+
+
+def test_undo_redo(make_nb):
+    nb = Notebook(make_nb("journal.ipynb", 6), no_kernel=True)
+    states = [get_state(nb)]
+    for change in (
+        lambda: nb.move_down(),
+        lambda: nb.cut_cell(),
+        lambda: nb.paste_cell(below=True),
+        lambda: nb.insert_cell(),
+        lambda: edit(nb, "a\nb\nc"),
+        lambda: edit(nb, "a\nB\nc\nd"),
+        lambda: nb.focus(3),
+        lambda: nb.markdown_cell(),
+        lambda: nb.focus(4),
+        lambda: nb.clear_output(),
+        lambda: nb.code_cell(),
+    ):
+        change()
+        if get_state(nb) != states[-1]:
+            states.append(get_state(nb))
+    assert len(nb.journal) == len(states) - 1
+    for state in reversed(states[:-1]):
+        assert nb.undo()
+        assert get_state(nb) == state
+    assert not nb.undo()
+    for state in states[1:]:
+        assert nb.redo()
+        assert get_state(nb) == state
+    assert not nb.redo()
+    # a new change drops what could be redone
+    nb.undo()
+    nb.insert_cell()
+    assert not nb.redo()
+
+
+def test_cut_last_cell(make_nb):
+    nb = Notebook(make_nb("journal_last.ipynb", 1), no_kernel=True)
+    state = get_state(nb)
+    nb.cut_cell()
+    assert nb.cells[0].json["source"] == []
+    nb.undo()
+    assert get_state(nb) == state
+    assert len(nb.cells) == 1
+
+
+def test_shared_outputs(make_nb):
+    nb = Notebook(make_nb("journal_outputs.ipynb", 3), no_kernel=True)
+    cell = nb.current_cell
+    outputs = cell.json["outputs"]
+    nb.copy_cell()
+    nb.paste_cell(below=True)
+    # the outputs are shared by the copy, but not their keys
+    copied_outputs = nb.cells[1].json["outputs"]
+    assert copied_outputs[0]["text"] is outputs[0]["text"]
+    assert copied_outputs[0] is not outputs[0]
+    nb.focus(0)
+    nb.clear_output()
+    # the cleared outputs are kept by reference
+    assert nb.journal.undo_steps[-1][0].changes["outputs"][0] is outputs
+    # the outputs replaced since (e.g. by running the cell) are not undone
+    cell.json["outputs"] = new_outputs = []
+    nb.undo()
+    assert cell.json["outputs"] is new_outputs
+
+
+def test_journal_size(make_nb):
+    nb = Notebook(make_nb("journal_size.ipynb", 3), no_kernel=True)
+    nb.journal.max_size = 2000
+    for i in range(100):
+        edit(nb, f"x = {i}\n" * 10)
+    # only the source lines which changed are kept
+    assert nb.journal.undo_steps[-1][0].old_lines == ["x = 98\n"] * 9 + ["x = 98"]
+    assert nb.journal.size <= nb.journal.max_size
+    assert nb.journal.peak_size <= nb.journal.max_size
+    assert nb.journal.dropped_nb + len(nb.journal) == 100
+    assert nb.journal.dropped_nb > 0
+    while nb.undo():
+        pass
+    i = nb.journal.dropped_nb - 1
+    assert nb.current_cell.source == (f"x = {i}\n" * 10)[:-1]
+
+
+def test_undo_layout(make_nb, headless):
+    nb = Notebook(make_nb("journal_layout.ipynb", 6), no_kernel=True)
+    with headless(nb) as app:
+        cell = nb.cells[1]
+        nb.focus(1)
+        nb.raw_cell()
+        nb.cut_cell()
+        assert cell not in nb.visible_cells
+        nb.undo()
+        assert cell in nb.visible_cells
+        assert app.layout.has_focus(cell.input_window)
+        nb.undo()
+        assert cell.json["cell_type"] == "markdown"
+        # rendered again as a markdown cell
+        assert cell.built
+        assert "Section 1" in cell.input_window.content.text.value
+        assert cell.input_window.content.text.value.count("\n") + 1 == (
+            cell.input_height
+        )
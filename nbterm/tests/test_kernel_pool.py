@@ -0,0 +1,32 @@
+import asyncio
+
+from nbterm import Notebook
+from nbterm.kernel_pool import KernelPool
+
+
+def test_kernel_pool(files, tmp_dir):
+    nb_path = files / "original" / "nb0.ipynb"
+    kernel_cwd = nb_path.parent
+    pool = KernelPool(1, tmp_dir / "kernels")
+
+    async def run_all(nb):
+        try:
+            await nb.run_all()
+            return nb.kd.connection_file_path
+        finally:
+            await nb.stop_kernel()
+
+    try:
+        pool.refill("python3", kernel_cwd)
+        assert len(pool.get_pid_paths("python3", kernel_cwd)) == 1
+        nb = Notebook(nb_path, kernel_cwd=kernel_cwd, kernel_pool=pool)
+        connection_file_path = asyncio.run(run_all(nb))
+        # the kernel was checked out from the pool, and replaced
+        assert connection_file_path.startswith(str(pool.directory))
+        assert len(pool.get_pid_paths("python3", kernel_cwd)) == 1
+    finally:
+        assert pool.stop_all() == 1
+    assert pool.get_pid_paths("python3", kernel_cwd) == []
+    nb_save_path = tmp_dir / "kernel_pool.ipynb"
+    nb.save(nb_save_path)
+    assert nb_save_path.read_text() == (files / "run" / "nb0.ipynb").read_text()
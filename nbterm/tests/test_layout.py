@@ -0,0 +1,107 @@
+from prompt_toolkit.clipboard import ClipboardData
+from prompt_toolkit.data_structures import Size
+
+from nbterm import Notebook
+
+
+def test_cells_built_lazily(make_nb, headless):
+    nb = Notebook(make_nb("lazy.ipynb", 200), no_kernel=True)
+    assert not any(cell.built for cell in nb.cells)
+    with headless(nb):
+        assert all(cell.built for cell in nb.visible_cells)
+        # a cell right below may also be built while measuring what fits
+        assert sum(cell.built for cell in nb.cells) <= len(nb.visible_cells) + 1
+        for _ in range(len(nb.cells)):
+            nb.go_down()
+        assert nb.current_cell_idx == len(nb.cells) - 1
+        assert all(cell.built for cell in nb.visible_cells)
+        assert len(nb.built_cells) <= nb.max_built_cells
+        assert sum(cell.built for cell in nb.cells) == len(nb.built_cells)
+
+
+def test_released_cell_keeps_edits(make_nb, headless):
+    nb = Notebook(make_nb("release.ipynb", 200), no_kernel=True)
+    with headless(nb):
+        nb.enter_cell()
+        nb.current_cell.input_buffer.text = "y = 1"
+        nb.exit_cell()
+        for _ in range(len(nb.cells)):
+            nb.go_down()
+        assert not nb.cells[0].built
+        assert nb.cells[0].json["source"] == ["y = 1"]
+        assert nb.dirty
+
+
+def test_layout_patched_in_place(make_nb, headless):
+    nb = Notebook(make_nb("patch.ipynb", 50), no_kernel=True)
+    with headless(nb):
+        layout, cells_container = nb.layout, nb.cells_container
+        nb.insert_cell(below=True)
+        nb.move_down()
+        nb.cut_cell()
+        nb.paste_cell(below=True)
+        nb.markdown_cell()
+        for _ in range(20):
+            nb.go_down()
+        assert nb.layout is layout
+        assert nb.cells_container is cells_container
+        children = [c for cell in nb.visible_cells for c in cell.get_containers()]
+        assert nb.cells_container.children == children
+
+
+def test_height_index(make_nb, headless):
+    nb = Notebook(make_nb("heights.ipynb", 100), no_kernel=True)
+    with headless(nb):
+        nb.insert_cell(below=True)
+        nb.current_cell.input_buffer.text = "a\nb\nc"
+        nb.move_up()
+        nb.cut_cell(5)
+        nb.paste_cell(80)
+        nb.focus(80)
+        nb.clear_output()
+        heights = [cell.get_height() for cell in nb.cells]
+        assert nb.heights.heights == heights
+        for idx in range(len(heights) + 1):
+            assert nb.heights.prefix_sum(idx) == sum(heights[:idx])
+        top = nb.top_cell_idx
+        available_height = nb.app.renderer.output.get_size().rows - 2
+        assert sum(heights[top : nb.bottom_cell_idx]) < available_height  # noqa
+        assert sum(heights[top : nb.bottom_cell_idx + 1]) >= available_height  # noqa
+
+
+def test_resize(make_nb, headless):
+    nb = Notebook(make_nb("resize.ipynb", 10), no_kernel=True)
+    nb.cells[0].json["outputs"][0]["text"] = ["x" * 100 + "\n"]
+    with headless(nb):
+        output = nb.app.renderer.output
+        assert nb.cells[0].output_height == 2  # 80 columns, 68 for the outputs
+        output.get_size = lambda: Size(rows=40, columns=40)
+        nb.check_width()
+        assert nb.cells[0].output_height == 4
+        assert nb.heights.heights == [cell.get_height() for cell in nb.cells]
+
+
+def test_edit_large_cell(make_nb, headless):
+    nb = Notebook(make_nb("large_cell.ipynb", 10), no_kernel=True)
+    nb.cells[0].json["source"] = [f"x_{i} = {i}\n" for i in range(1000)]
+    with headless(nb):
+        nb.enter_cell()
+        cell = nb.current_cell
+        buffer = cell.input_buffer
+        assert buffer.line_nb == 1001
+        # taller than the screen, scrolled in its window
+        assert cell.input_height == nb.app.renderer.output.get_size().rows - 4
+        buffer.cursor_position = 100
+        for edit in (
+            lambda: buffer.insert_text("a\nb\n"),
+            lambda: buffer.delete_before_cursor(3),
+            lambda: buffer.delete(10),
+            lambda: buffer.newline(),
+            lambda: buffer.undo(),
+            lambda: buffer.paste_clipboard_data(ClipboardData("c\nd\n")),
+        ):
+            edit()
+            assert buffer.line_nb == buffer.text.count("\n") + 1
+        nb.exit_cell()
+        assert cell.input_height == buffer.line_nb
+        assert nb.heights.heights == [cell.get_height() for cell in nb.cells]
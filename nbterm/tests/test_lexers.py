@@ -0,0 +1,72 @@
+from prompt_toolkit.document import Document
+from prompt_toolkit.lexers import PygmentsLexer
+from pygments.lexers import PythonLexer  # type: ignore
+from rich.console import Console
+from rich.syntax import Syntax
+
+from nbterm import lexers
+from nbterm.lexers import get_lexer, get_lexer_language, get_syntax_lexer
+
+
+def test_get_lexer():
+    lexer = get_lexer("python")
+    assert lexer.pygments_lexer_cls.__name__ == "PythonLexer"
+    assert get_lexer("python") is lexer
+    assert get_lexer("unknown") is None
+    assert get_lexer("c++").pygments_lexer_cls.__name__ == "CppLexer"
+
+
+def test_get_lexer_language():
+    metadata = {"kernelspec": {"language": "R"}}
+    assert get_lexer_language(metadata) == "r"
+    metadata["language_info"] = {"name": "unknown", "pygments_lexer": "julia"}
+    assert get_lexer_language(metadata) == "r"
+    assert get_lexer_language({"kernelspec": {"language": "unknown"}}) == "text"
+
+
+def test_shared_tokens():
+    lexers._tokens.clear()
+    source = 'import math\n# comment\ndef f(x):\n    return "x"'
+    console = Console(width=80, force_terminal=True)
+    with console.capture() as capture:
+        console.print(Syntax(source, get_syntax_lexer("python")))
+    with console.capture() as reference:
+        console.print(Syntax(source, "python"))
+    assert capture.get() == reference.get()
+    get_line = get_lexer("python").lex_document(Document(source))
+    lines = [get_line(i) for i in range(4)]
+    # lexed once for both
+    assert len(lexers._tokens) == 1
+    assert "".join(text for _, text in lines[3]) == '    return "x"'
+
+
+def test_line_lexer():
+    lines = []
+    for i in range(300):
+        if i == 190:
+            lines.append('query = """')
+        elif i == 210:
+            lines.append('"""')
+        elif 190 < i < 210:
+            # a multi-line string across resync points
+            lines.append(f"select {i} from table")
+        elif i % 10 == 0:
+            lines.append("def f(x):")
+        else:
+            lines.append(f"    x_{i} = {{'id': {i}}}  # {i}")
+    document = Document("\n".join(lines))
+    get_line = get_lexer("python").lex_document(document)
+    get_ref_line = PygmentsLexer(PythonLexer).lex_document(document)
+    for i in range(len(lines)):
+        assert get_line(i) == [fragment for fragment in get_ref_line(i) if fragment[1]]
+    # only the block of the edited line is lexed again
+    lexers._tokens.clear()
+    get_line = get_lexer("python").lex_document(document)
+    for i in range(240, 260):
+        get_line(i)
+    tokens = set(lexers._tokens)
+    lines[255] = "    x = 0"
+    get_line = get_lexer("python").lex_document(Document("\n".join(lines)))
+    for i in range(240, 260):
+        get_line(i)
+    assert len(set(lexers._tokens) - tokens) == 1
@@ -0,0 +1,51 @@
+import asyncio
+import json
+
+from nbterm import Notebook
+from nbterm.nb_reader import NotebookReader
+
+
+def test_notebook_reader(files, tmp_dir):
+    nb_json = {
+        "metadata": {"kernelspec": {"language": "python", "name": "python3"}},
+        "cells": [
+            {"cell_type": "code", "source": ["x = 1\n", "é" * i], "outputs": []}
+            for i in range(20)
+        ],
+        "nbformat": 4,
+        "nbformat_minor": 12345,
+    }
+    nb_path = tmp_dir / "reader.ipynb"
+    with open(nb_path, "wt") as f:
+        json.dump(nb_json, f, indent=1)
+    paths = [nb_path] + list((files / "original").glob("*.ipynb"))
+    for path in paths:
+        with open(path) as f:
+            expected = json.load(f)
+        for chunk_size in (1, 7, 1 << 20):
+            reader = NotebookReader(path)
+            reader.chunk_size = chunk_size
+            cells = list(reader.read_cells(2))
+            assert not reader.done
+            cells += list(reader.read_cells())
+            assert reader.done
+            assert reader.progress == 1
+            assert dict(reader.json, cells=cells) == expected
+
+
+def test_progressive_load(make_nb, headless):
+    nb_path = make_nb("progressive.ipynb", 500)
+    nb = Notebook(nb_path, no_kernel=True, progressive=True)
+    assert 0 < len(nb.cells) < 500
+    with headless(nb):
+        asyncio.run(nb.load_remaining_cells())
+        assert len(nb.cells) == 500
+        heights = [cell.get_height() for cell in nb.cells]
+        assert nb.heights.prefix_sum(len(heights)) == sum(heights)
+    save_path = nb_path.with_name("progressive_saved.ipynb")
+    nb.save(save_path)
+    assert save_path.read_text() == nb_path.read_text()
+    # saving loads the remaining cells first
+    nb = Notebook(nb_path, no_kernel=True, progressive=True)
+    nb.save(save_path)
+    assert save_path.read_text() == nb_path.read_text()
@@ -0,0 +1,134 @@
+import json
+import random
+
+from rich.console import Console
+
+from nbterm import Notebook
+from nbterm.cell import (
+    RESET_STYLE,
+    STDERR_STYLE,
+    OutputRenderer,
+    get_output_height,
+    get_output_text_and_height,
+    render_stderr,
+    set_console,
+)
+from nbterm.output_buffer import OutputBuffer, get_raw_output_text
+
+
+def test_incremental_output_rendering():
+    set_console(Console())
+    random.seed(0)
+    outputs = []
+    renderer = OutputRenderer()
+    for i in range(60):
+        if i % 20 == 19:
+            outputs.append(
+                {
+                    "data": {"text/plain": [str(i)]},
+                    "execution_count": 1,
+                    "metadata": {},
+                    "output_type": "execute_result",
+                }
+            )
+        else:
+            name = random.choice(["stdout", "stderr"])
+            if not outputs or outputs[-1].get("name") != name:
+                outputs.append({"name": name, "output_type": "stream", "text": []})
+            outputs[-1]["text"].append(random.choice(["a", "bc\n", "d\ne", "\n"]))
+        text, height = renderer.render(outputs)
+        ref_text, ref_height = get_output_text_and_height(outputs)
+        assert text.value == ref_text.value
+        assert height == ref_height
+
+
+def get_text(outputs):
+    return "".join(get_raw_output_text(output) or "" for output in outputs)
+
+
+def test_output_buffer_truncation():
+    cell_json = {"outputs": []}
+    outputs = OutputBuffer(cell_json, max_lines=100, max_bytes=10_000)
+    set_console(Console())
+    renderer = OutputRenderer()
+    for i in range(1000):
+        outputs.append_stream("stderr" if i % 7 == 0 else "stdout", f"{i}\n")
+        if i % 50 == 0:
+            # elided outputs are rendered again, not the first ones
+            text, height = renderer.render(cell_json["outputs"])
+            ref_text, ref_height = get_output_text_and_height(cell_json["outputs"])
+            assert text.value == ref_text.value
+            assert height == ref_height
+    text = get_text(cell_json["outputs"])
+    assert text.count("\n") <= 100 * 3 // 2 + 1
+    head, elided, tail = text.partition(f"... {outputs.elided_line_nb} lines")
+    assert elided
+    assert head == "".join(f"{i}\n" for i in range(50))
+    tail_lines = tail.splitlines()[1:]
+    assert tail_lines == [str(i) for i in range(1000 - len(tail_lines), 1000)]
+    assert 50 + outputs.elided_line_nb + len(tail_lines) == 1000
+    # a line too long for the limit is cut
+    outputs.append_stream("stdout", "x" * 100_000)
+    assert len(get_text(cell_json["outputs"])) < 20_000
+
+
+def test_output_buffer_spill(tmp_dir):
+    cell_json = {"outputs": []}
+    outputs = OutputBuffer(cell_json, max_lines=100, max_bytes=10_000, spill=True)
+    full_text = ""
+    for i in range(1000):
+        text = f"{i}\n" if i % 10 else f"{i}"
+        outputs.append_stream("stderr" if i % 7 == 0 else "stdout", text)
+        full_text += text
+    assert outputs.spill_path in get_text(cell_json["outputs"])
+    assert get_text(outputs.get_full_outputs()) == full_text
+
+
+def test_save_full_outputs(make_nb, tmp_dir):
+    for save_full_outputs in (False, True):
+        nb = Notebook(
+            make_nb("outputs.ipynb", 1),
+            no_kernel=True,
+            max_output_lines=10,
+            save_full_outputs=save_full_outputs,
+        )
+        cell = nb.cells[0]
+        cell.json["outputs"] = []
+        cell.output_buffer = OutputBuffer(cell.json, 10, 1000, spill=nb.spill_outputs)
+        for i in range(100):
+            cell.output_buffer.append_stream("stdout", f"{i}\n")
+        save_path = tmp_dir / "outputs_saved.ipynb"
+        nb.save(save_path)
+        with open(save_path) as f:
+            saved_outputs = json.load(f)["cells"][0]["outputs"]
+        if save_full_outputs:
+            assert get_text(saved_outputs) == "".join(f"{i}\n" for i in range(100))
+        else:
+            assert saved_outputs == cell.json["outputs"]
+
+
+def test_wrapped_output():
+    set_console(Console())
+    outputs = [
+        {
+            "name": "stdout",
+            "output_type": "stream",
+            "text": ["x" * 25 + "\n", "é" * 12],
+        },
+        {"name": "stderr", "output_type": "stream", "text": ["\nerr\n", "\n"]},
+    ]
+    assert get_output_height(outputs) == 4
+    # 3 + 2 rows of stdout, 1 + 1 of stderr
+    assert get_output_height(outputs, 10) == 7
+    # stderr lines are padded to full rows
+    assert render_stderr("err\n\n", 10) == (
+        f"{STDERR_STYLE}err{' ' * 7}{RESET_STYLE}\n{STDERR_STYLE}{' ' * 10}"
+        f"{RESET_STYLE}\n"
+    )
+    renderer = OutputRenderer()
+    for width in (10, 10, 20, 0):
+        # rendered again when the width changes
+        text, height = renderer.render(outputs, width)
+        ref_text, ref_height = get_output_text_and_height(outputs, width)
+        assert text.value == ref_text.value
+        assert height == ref_height == get_output_height(outputs, width)
@@ -0,0 +1,41 @@
+import json
+
+from nbterm import Notebook
+from nbterm.payload import LazyPayload
+
+
+def test_large_payloads_out_of_line(make_nb):
+    nb_path = make_nb("payload.ipynb", 3)
+    with open(nb_path) as f:
+        nb_json = json.load(f)
+    image = "iVBORw0KGgo" * 10000
+    nb_json["cells"][0]["outputs"].append(
+        {
+            "data": {
+                "image/png": image,
+                "text/html": ["<p>é</p>\n"] * 10000,
+                "text/plain": ["<Figure>"],
+            },
+            "metadata": {},
+            "output_type": "display_data",
+        }
+    )
+    with open(nb_path, "wt") as f:
+        json.dump(nb_json, f, indent=1)
+        f.write("\n")
+    nb = Notebook(nb_path, no_kernel=True)
+    data = nb.cells[0].json["outputs"][1]["data"]
+    assert isinstance(data["image/png"], LazyPayload)
+    assert isinstance(data["text/html"], LazyPayload)
+    assert data["text/plain"] == ["<Figure>"]
+    assert data["image/png"].load() == image
+    # copies share the payload
+    assert nb.cells[0].copy().json["outputs"][1]["data"]["image/png"] is (
+        data["image/png"]
+    )
+    save_path = nb_path.with_name("payload_saved.ipynb")
+    for _ in range(2):
+        # the second time with the cells serialization kept, without the payloads
+        nb.save(save_path)
+        assert save_path.read_text() == nb_path.read_text()
+    assert (data["image/png"], 6) in nb.cells[0].json_parts
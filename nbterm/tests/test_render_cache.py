@@ -0,0 +1,94 @@
+import json
+
+from nbterm import Notebook
+from nbterm.cell import INPUT_CACHE
+from nbterm.render_cache import RenderCache, SavedRenders, get_input_key
+
+
+def test_render_cache_lru():
+    cache = RenderCache(maxsize=2)
+    cache.set("a", "A")
+    cache.set("b", "B")
+    assert cache.get("a") == "A"
+    cache.set("c", "C")
+    # "b" was the least recently used
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_input_rendering_cached(make_nb, headless):
+    nb = Notebook(make_nb("cache.ipynb", 10), no_kernel=True)
+    INPUT_CACHE.clear()
+    with headless(nb):
+        misses = INPUT_CACHE.misses
+        nb.copy_cell()
+        nb.paste_cell(below=True)
+        nb.focus(1)
+        assert INPUT_CACHE.misses == misses
+        assert INPUT_CACHE.hits >= 1
+        text = nb.cells[0].input_window.content.text.value
+        assert nb.cells[1].input_window.content.text.value == text
+
+
+def test_saved_renders(make_nb, headless, tmp_dir, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_dir / "xdg_cache"))
+    nb_path = make_nb("saved_renders.ipynb", 30)
+    nb = Notebook(nb_path, no_kernel=True, save_renders=True)
+    with headless(nb):
+        texts = [
+            cell.input_window.content.text.value for cell in nb.cells if cell.built
+        ]
+        heights = [cell.input_height for cell in nb.cells]
+    assert nb.save_renders() == len(texts) < len(nb.cells)
+    INPUT_CACHE.clear()
+    nb = Notebook(nb_path, no_kernel=True, save_renders=True)
+    assert len(nb.saved_renders) == len(texts)
+    # the markdown cells have the height of their render before being built
+    assert [cell.input_height for cell in nb.cells] == heights
+    assert heights[1] != nb.cells[1].source.count("\n") + 1
+    with headless(nb):
+        built_texts = [
+            cell.input_window.content.text.value for cell in nb.cells if cell.built
+        ]
+        assert built_texts == texts[: len(built_texts)]
+        # nothing rendered
+        assert len(nb.saved_renders) == len(texts)
+
+
+def test_saved_renders_valid(make_nb, tmp_dir):
+    nb_path = make_nb("saved_renders_valid.ipynb", 1)
+    directory = tmp_dir / "saved_renders"
+    saved_renders = SavedRenders(nb_path, "truecolor", 80, directory)
+    key = get_input_key("x = 1", "code", "python", 80)
+    saved_renders.set(key, "x = 1\n")
+    saved_renders.set(get_input_key("y", "code", "python", 80), "y")
+    # only the renders of the cells are saved
+    assert saved_renders.save([key]) == 1
+    assert SavedRenders(nb_path, "truecolor", 80, directory).load() == 1
+    # rendered for other colors
+    assert SavedRenders(nb_path, "256", 80, directory).load() == 0
+    # an entry which does not match its height
+    saved = json.loads(saved_renders.path.read_text())
+    saved["entries"]["x"] = ["x\n", 1]
+    saved_renders.path.write_text(json.dumps(saved))
+    assert SavedRenders(nb_path, "truecolor", 80, directory).load() == 1
+    saved_renders.path.write_text(saved_renders.path.read_text()[:-10])
+    assert SavedRenders(nb_path, "truecolor", 80, directory).load() == 0
+
+
+def test_saved_renders_evict(make_nb, tmp_dir):
+    directory = tmp_dir / "saved_renders_evict"
+    key = get_input_key("x = 1", "code", "python", 80)
+    for i in range(3):
+        saved_renders = SavedRenders(
+            make_nb(f"saved_renders_{i}.ipynb", 1), directory=directory
+        )
+        saved_renders.set(key, "x" * 1000)
+        saved_renders.max_total_size = 2500
+        saved_renders.save([key])
+    # the renders of the first notebook were evicted
+    assert len(list(directory.glob("*.json"))) == 2
+    assert saved_renders.path.exists()
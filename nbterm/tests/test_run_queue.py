@@ -0,0 +1,80 @@
+import asyncio
+import signal
+
+from nbterm import Notebook
+from nbterm.kernel import dispatch_output
+
+
+def msg(msg_id, msg_type, content):
+    return {
+        "parent_header": {"msg_id": msg_id},
+        "header": {"msg_type": msg_type},
+        "content": content,
+    }
+
+
+class FakeProcess:
+    def __init__(self):
+        self.signals = []
+
+    def send_signal(self, sig):
+        self.signals.append(sig)
+
+
+class FakeKernelDriver:
+    """Raises an error if the code does, waits if it sleeps."""
+
+    def __init__(self):
+        self.kernel_process = FakeProcess()
+        self.codes = []
+        self.resume = asyncio.Event()
+
+    async def execute(self, code, msg_id=""):
+        self.codes.append(code)
+        if "sleep" in code:
+            await self.resume.wait()
+        await asyncio.sleep(0)
+        if "raise" in code:
+            content = {"ename": "ValueError", "evalue": "", "traceback": []}
+            dispatch_output(msg(msg_id, "error", content))
+
+
+def test_run_queue(make_nb, headless):
+    nb_path = make_nb("run_queue.ipynb", 6, outputs=False)
+    nb = Notebook(nb_path, kernel_cwd=nb_path.parent)
+
+    async def run():
+        nb.kd = FakeKernelDriver()
+        with headless(nb):
+            nb.cells[0].input_buffer.text = "sleep"
+            nb.focus(2)
+            nb.queue_run_above()
+            nb.queue_run_below()
+            # nothing waited for
+            assert nb.kd.codes == []
+            assert len(nb.run_queue) == 4
+            assert "In [*]:" in nb.cells[5].input_prefix.content.text.value
+            await asyncio.sleep(0.01)
+            # the first cell is executing, the others are queued
+            assert nb.kd.codes == ["sleep"]
+            assert list(nb.run_queue) == [nb.cells[2], nb.cells[3], nb.cells[5]]
+            nb.interrupt_kernel()
+            assert nb.kd.kernel_process.signals == [signal.SIGINT]
+            assert not nb.run_queue
+            assert "In [ ]:" in nb.cells[5].input_prefix.content.text.value
+            nb.kd.resume.set()
+            await nb.run_task
+            # the queue is cleared on error
+            nb.cells[3].input_buffer.text = "raise"
+            nb.queue_run_all()
+            await nb.run_task
+            assert nb.kd.codes == [
+                "sleep",
+                "sleep",
+                "x = 2\nprint(x)\nprint(x + 1)",
+                "raise",
+            ]
+            assert "In [*]" not in nb.cells[5].input_prefix.content.text.value
+            assert nb.run_task is None
+
+    asyncio.run(run())
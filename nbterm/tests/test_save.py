@@ -0,0 +1,63 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+from nbterm import Notebook
+from nbterm.format import write_atomic
+
+
+def test_save_as_json_dump(make_nb, tmp_dir):
+    nb = Notebook(make_nb("save.ipynb", 10), no_kernel=True)
+    nb.cells[0].json["metadata"] = {"tags": [], "nested": {"a": [{}, [], "é\n"]}}
+    nb.json["metadata"]["empty"] = {}
+    for cells in (nb.cells, []):
+        nb.cells = cells
+        nb_json = {"cells": [cell.json for cell in nb.cells]}
+        nb_json.update(nb.json)
+        assert "".join(nb.iter_json()) == json.dumps(nb_json, indent=1) + "\n"
+
+
+def test_save_async(make_nb, tmp_dir):
+    nb_path = make_nb("save_async.ipynb", 300)
+    nb = Notebook(nb_path, no_kernel=True)
+    save_path = tmp_dir / "save_async_saved.ipynb"
+    asyncio.run(nb.save_async(save_path))
+    assert save_path.read_text() == nb_path.read_text()
+
+
+def test_write_atomic(tmp_dir):
+    path = tmp_dir / "atomic.ipynb"
+    path.write_text("original")
+    os.chmod(path, 0o640)
+    with pytest.raises(UnicodeEncodeError):
+        write_atomic(path, "\ud800")
+    assert path.read_text() == "original"
+    assert not [p for p in os.listdir(tmp_dir) if p.startswith(".atomic.ipynb")]
+    write_atomic(path, "new")
+    assert path.read_text() == "new"
+    assert os.stat(path).st_mode & 0o777 == 0o640
+
+
+def test_save_reuses_cell_serialization(make_nb, tmp_dir):
+    nb = Notebook(make_nb("save_reuse.ipynb", 20), no_kernel=True)
+    save_path = tmp_dir / "save_reuse_saved.ipynb"
+    nb.save(save_path)
+    parts = [cell.json_parts for cell in nb.cells]
+    assert all(parts)
+    nb.focus(3)
+    nb.enter_cell()
+    nb.current_cell.input_buffer.text = "y = 1"
+    nb.exit_cell()
+    nb.cells[5].set_as_markdown()
+    nb.cut_cell(8)
+    nb.save(save_path)
+    for i, cell in enumerate(nb.cells):
+        if i in (3, 5):
+            assert cell.json_parts is not parts[i]
+        else:
+            assert cell.json_parts is parts[i if i < 8 else i + 1]
+    nb_json = {"cells": [cell.json for cell in nb.cells]}
+    nb_json.update(nb.json)
+    assert save_path.read_text() == json.dumps(nb_json, indent=1) + "\n"
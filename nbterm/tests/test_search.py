@@ -0,0 +1,91 @@
+import re
+
+from nbterm import Notebook
+from nbterm.search import get_output_text, get_required_words, get_source_text
+
+
+def find(nb, query, **kwargs):
+    return nb.search_index.find(nb.cells, nb.heights.positions, query, **kwargs)
+
+
+def test_required_words():
+    assert get_required_words("import math", False) == [
+        ("import", False),
+        ("math", False),
+    ]
+    assert get_required_words("x = math.sqrt(", False) == [
+        ("x", False),
+        ("math", True),
+        ("sqrt", True),
+    ]
+    assert get_required_words(r"colou?r\d+ [a-z]{2} x{2,}", True) == [
+        ("colo", False),
+        ("r", False),
+    ]
+    assert get_required_words(r"sqrt\(x\)", True) == [("sqrt", False), ("x", False)]
+    assert get_required_words("a|b", True) == []
+    assert get_required_words("(ab)+c", True) == []
+
+
+def test_search_index(make_nb):
+    nb = Notebook(make_nb("search.ipynb", 30), no_kernel=True)
+
+    def scan(pattern, outputs=False, **kwargs):
+        texts = [get_source_text(cell) for cell in nb.cells]
+        if outputs:
+            texts = [
+                text + get_output_text(cell) for text, cell in zip(texts, nb.cells)
+            ]
+        return [i for i, text in enumerate(texts) if re.search(pattern, text)]
+
+    for query, pattern, kwargs in (
+        ("x = 1", "x = 1", {}),
+        ("X = 1", "X = 1", {}),
+        ("section", "(?i)section", {}),
+        ("t(x + 1", r"t\(x \+ 1", {}),
+        (r"x = [12]\b", r"x = [12]\b", {"regex": True}),
+        ("29", "29", {}),
+        ("30", "30", {}),
+        ("30", "30", {"outputs": True}),
+    ):
+        assert find(nb, query, **kwargs) == scan(pattern, **kwargs)
+    assert find(nb, "30", outputs=True) == [29]
+    # kept up to date
+    nb.focus(3)
+    nb.enter_cell()
+    nb.current_cell.input_buffer.text = "y = 29"
+    nb.exit_cell()
+    nb.cut_cell(0)
+    nb.focus(0)
+    nb.paste_cell()
+    nb.insert_cell()
+    nb.current_cell.json["source"] = ["29"]
+    nb.current_cell.update_json()
+    nb.cells[29].clear_output()
+    assert find(nb, "29", outputs=True) == scan("29", outputs=True) == [0, 4, 30]
+
+
+def test_search_keys(make_nb, headless):
+    nb = Notebook(make_nb("search_keys.ipynb", 30), no_kernel=True)
+    with headless(nb) as app:
+        nb.show_search()
+        assert app.layout.has_focus(nb.search_bar)
+        nb.search_buffer.text = "print(x)"
+        nb.quit_search()
+        nb.search(nb.search_buffer.text)
+        assert nb.current_cell_idx == 2
+        assert nb.search_message == "print(x): 2/20"
+        nb.search()
+        assert nb.current_cell_idx == 3
+        nb.search(backwards=True)
+        nb.search(backwards=True)
+        assert nb.current_cell_idx == 0
+        nb.search(backwards=True)
+        # wrapped around
+        assert nb.current_cell_idx == 29
+        assert app.layout.has_focus(nb.cells[29].input_window)
+        # the cells in between weren't built
+        assert not nb.cells[15].built
+        nb.search_regex = True
+        assert not nb.search("x = (")
+        assert nb.search_message.startswith("invalid regex")
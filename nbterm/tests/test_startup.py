@@ -0,0 +1,21 @@
+import subprocess
+import sys
+
+# slow to import, and not needed for e.g. "nbterm --version"
+HEAVY_PACKAGES = {"prompt_toolkit", "rich", "pygments", "kernel_driver", "zmq"}
+
+
+def imported_packages(code):
+    code += "\nimport sys\nprint(' '.join({m.split('.')[0] for m in sys.modules}))"
+    stdout = subprocess.run(
+        [sys.executable, "-c", code], stdout=subprocess.PIPE, check=True, text=True
+    ).stdout
+    return set(stdout.split())
+
+
+def test_lazy_imports():
+    assert not imported_packages("import nbterm.nbterm") & HEAVY_PACKAGES
+    packages = imported_packages("from nbterm import Notebook")
+    assert {"prompt_toolkit", "rich"} <= packages
+    # only needed to edit cells, and to run them
+    assert not packages & {"pygments", "kernel_driver"}